@@ -0,0 +1,188 @@
+""" Adaptive limit on the number of questions posted at the same time """
+
+# Standard imports
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+import logging
+import math
+import threading
+import time
+from typing import List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Status codes of the responses telling us to slow down
+THROTTLE_STATUS = (429, 503)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Computes a percentile with the nearest rank method
+
+    Args:
+        values (Sequence[float]): The values
+        q (float): The percentile, between 0 and 100
+
+    Returns:
+        The percentile of the values, or 0.0 if there are none
+    """
+
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+# end percentile()
+
+
+@dataclass
+class LimitChange:
+    """A change of the concurrency limit"""
+
+    limit: int
+    reason: str
+    time: float  # From time.monotonic()
+
+
+class AdaptiveConcurrency:
+    """Additive increase, multiplicative decrease of the concurrency limit
+
+    The limit is raised by one after every limit responses received without
+    trouble, and cut by the backoff factor when the server throttles us with
+    429 or 503 responses, or when the rolling p95 latency goes above
+    latency_factor times the lowest p50 latency seen so far. After a change,
+    the next decision waits for the limit responses that were already in
+    flight, so one burst of throttled responses only cuts the limit once.
+
+    Workers take a slot with slot() before posting, and report the outcome
+    with record().
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 64,
+        backoff: float = 0.5,
+        latency_factor: float = 3.0,
+        window: int = 100,
+    ):
+        """Constructor
+
+        Args:
+            initial (int): The limit to start with
+            minimum (int): The lowest limit
+            maximum (int): The highest limit
+            backoff (float): Factor applied to the limit when it is cut
+            latency_factor (float): How much slower than the best p50
+                latency the p95 latency may get before the limit is cut
+            window (int): Number of recent latencies the percentiles are
+                computed over
+        """
+
+        if not 1 <= minimum <= initial <= maximum:
+            raise ValueError(
+                f"Expected 1 <= minimum <= initial <= maximum, got {minimum}, {initial}, {maximum}"
+            )
+        self.minimum = minimum
+        self.maximum = maximum
+        self.backoff = backoff
+        self.latency_factor = latency_factor
+        self.latencies = deque(maxlen=window)
+        self.baseline: Optional[float] = None  # Lowest p50 latency seen
+        self.history: List[LimitChange] = [LimitChange(initial, "initial", time.monotonic())]
+
+        self._limit = initial
+        self._in_flight = 0
+        self._responses = 0  # Since the last decision
+        self._throttled = 0  # Since the last decision
+        self._condition = threading.Condition()
+
+    # end __init__()
+
+    @property
+    def limit(self) -> int:
+        """The current number of questions that can be posted at the same time"""
+        return self._limit
+
+    @contextmanager
+    def slot(self):
+        """Waits until there is room under the limit for one more request"""
+
+        with self._condition:
+            while self._in_flight >= self._limit:
+                self._condition.wait()
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._in_flight -= 1
+                self._condition.notify()
+
+    # end slot()
+
+    def record(self, latency: float, status_code: Optional[int]):
+        """Records the outcome of a request and adjusts the limit
+
+        Args:
+            latency (float): Time taken by the request in seconds
+            status_code (int): Status code of the response, or None if no
+                response was received
+        """
+
+        with self._condition:
+            self._responses += 1
+            if status_code in THROTTLE_STATUS:
+                self._throttled += 1
+            elif status_code is not None:
+                # Throttled responses come back quickly and would hide
+                # the latency of the server
+                self.latencies.append(latency)
+
+            # Waits for the requests sent under the previous limit
+            if self._responses < self._limit:
+                return
+            if self._throttled:
+                self._change(
+                    int(self._limit * self.backoff),
+                    f"{self._throttled}/{self._responses} responses throttled",
+                )
+                return
+
+            p50 = percentile(self.latencies, 50)
+            p95 = percentile(self.latencies, 95)
+            if self.latencies and (self.baseline is None or p50 < self.baseline):
+                self.baseline = p50
+            if self.baseline and p95 > self.latency_factor * self.baseline:
+                self._change(
+                    int(self._limit * self.backoff),
+                    f"p95 latency {p95:.3f}s above {self.latency_factor} x p50 {self.baseline:.3f}s",
+                )
+            else:
+                self._change(self._limit + 1, f"p95 latency {p95:.3f}s")
+
+    # end record()
+
+    def _change(self, limit: int, reason: str):
+        """Sets the limit and starts a new round of decisions"""
+
+        limit = min(max(limit, self.minimum), self.maximum)
+        self._responses = 0
+        self._throttled = 0
+        if limit == self._limit:
+            return
+        if limit < self._limit:
+            # The latencies measured under the higher limit no longer apply
+            self.latencies.clear()
+        logger.info("Concurrency limit %s -> %s: %s", self._limit, limit, reason)
+        self._limit = limit
+        self.history.append(LimitChange(limit, reason, time.monotonic()))
+        self._condition.notify_all()
+
+    # end _change()
+
+
+# end class AdaptiveConcurrency
@@ -0,0 +1,383 @@
+""" Uploads questions on an asyncio event loop """
+
+# Standard imports
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlsplit
+
+# Third party imports
+# aiohttp is an optional dependency, only imported when an upload is run.
+
+# Application import
+from alfred.action.base import UploadJob, UploadResult, body_response_id
+from alfred.action.serialize import JSON_HEADERS
+from alfred.net.driver.base import DriverBase
+
+logger = logging.getLogger(__name__)
+
+# Requests per second allowed for each site when no rates are given, so
+# that a large upload does not flood the servers
+DEFAULT_RATES = {
+    "mysa.rp.edu.sg": 10.0,
+    "myleo.rp.edu.sg": 10.0,
+}
+
+
+class TokenBucket:
+    """Token bucket limiting the rate of requests
+
+    The bucket holds up to capacity tokens and is refilled at rate tokens
+    per second. Each request takes a token. When the bucket is empty the
+    token is borrowed against the refill, so concurrent requests wait their
+    turn without polling.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        capacity: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Constructor
+
+        Args:
+            rate (float): Number of requests per second
+            capacity (float): Number of requests that can be sent in a burst.
+                Defaults to one second worth of requests.
+            clock (Callable): Returns the current time in seconds
+        """
+
+        if rate <= 0:
+            raise ValueError(f"Rate must be positive, got {rate}")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    # end __init__()
+
+    def reserve(self) -> float:
+        """Takes a token
+
+        Returns:
+            The number of seconds to wait before the token can be used
+        """
+
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+    # end reserve()
+
+    async def acquire(self):
+        """Waits until a token is available"""
+
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    # end acquire()
+
+
+# end class TokenBucket
+
+
+class HostRateLimiter:
+    """Keeps a token bucket for every host"""
+
+    def __init__(
+        self,
+        rates: Optional[Dict[str, float]] = None,
+        default_rate: Optional[float] = None,
+        capacity: Optional[float] = None,
+    ):
+        """Constructor
+
+        Args:
+            rates (Dict[str, float]): Requests per second allowed for each
+                host, e.g. {"mysa.rp.edu.sg": 20}
+            default_rate (float): Requests per second for the other hosts.
+                If None, the other hosts are not limited.
+            capacity (float): Number of requests that can be sent in a burst
+        """
+
+        self.rates = dict(rates or {})
+        self.default_rate = default_rate
+        self.capacity = capacity
+        self.buckets: Dict[str, Optional[TokenBucket]] = {}
+
+    # end __init__()
+
+    def bucket(self, url: str) -> Optional[TokenBucket]:
+        """Returns the bucket of the host of a url, if it is limited"""
+
+        host = urlsplit(url).hostname or ""
+        if host not in self.buckets:
+            rate = self.rates.get(host, self.default_rate)
+            self.buckets[host] = (
+                TokenBucket(rate, capacity=self.capacity) if rate is not None else None
+            )
+        return self.buckets[host]
+
+    # end bucket()
+
+    async def acquire(self, url: str):
+        """Waits until a request can be sent to the host of a url"""
+
+        bucket = self.bucket(url)
+        if bucket is not None:
+            await bucket.acquire()
+
+    # end acquire()
+
+
+# end class HostRateLimiter
+
+
+def session_cookie_jar(session):
+    """Copies the cookies of a requests session into an aiohttp cookie jar
+
+    Args:
+        session (requests.Session): The session set up by the driver
+
+    Returns:
+        aiohttp.CookieJar with the same cookies, each kept for its domain
+    """
+
+    from http.cookies import SimpleCookie
+
+    import aiohttp
+    from yarl import URL
+
+    # The cookies come from the browser we logged in with, so cookies for
+    # IP addresses are accepted as well
+    jar = aiohttp.CookieJar(unsafe=True)
+    for cookie in session.cookies:
+        morsel = SimpleCookie()
+        morsel[cookie.name] = cookie.value
+        morsel[cookie.name]["path"] = cookie.path or "/"
+        host = (cookie.domain or "").lstrip(".")
+        if cookie.domain_specified:
+            morsel[cookie.name]["domain"] = cookie.domain
+        jar.update_cookies(morsel, response_url=URL(f"https://{host}/") if host else URL())
+    return jar
+
+
+# end session_cookie_jar()
+
+
+class AsyncUploader:
+    """Posts questions concurrently from a single event loop
+
+    The cookies, user agent and Authorization header are taken from the
+    requests session of the driver, so a driver that has connected can be
+    used as it is. Every host has its own rate limit.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 100,
+        rate_limiter: Optional[HostRateLimiter] = None,
+        timeout: float = 60.0,
+    ):
+        """Constructor
+
+        Args:
+            max_in_flight (int): Number of questions posted at the same time
+            rate_limiter (HostRateLimiter): Limits the requests sent to each
+                host. Defaults to DEFAULT_RATES for MySA and MyLEO, and no
+                limit for the other hosts.
+            timeout (float): Timeout of each request in seconds
+        """
+
+        self.max_in_flight = max_in_flight
+        self.rate_limiter = rate_limiter or HostRateLimiter(DEFAULT_RATES)
+        self.timeout = timeout
+
+    # end __init__()
+
+    def upload(
+        self,
+        action,
+        driver: DriverBase,
+        jobs: Iterable[UploadJob],
+        on_result: Optional[Callable[[UploadResult], None]] = None,
+    ) -> List[UploadResult]:
+        """Posts the questions and waits for all of them
+
+        Args:
+            action (ActionUploadBase): The action with the API to post to
+            driver (DriverBase): The driver with the authenticated session
+            jobs (Iterable[UploadJob]): The questions and their payloads
+            on_result (Callable): If given, called with each result as soon
+                as its question completes, e.g. to journal it
+
+        Returns:
+            The results, in the order of the jobs
+        """
+
+        return asyncio.run(self.upload_async(action, driver, jobs, on_result))
+
+    # end upload()
+
+    async def upload_async(
+        self,
+        action,
+        driver: DriverBase,
+        jobs: Iterable[UploadJob],
+        on_result: Optional[Callable[[UploadResult], None]] = None,
+    ) -> List[UploadResult]:
+        """Posts the questions, max_in_flight at a time
+
+        Args:
+            action (ActionUploadBase): The action with the API to post to
+            driver (DriverBase): The driver with the authenticated session
+            jobs (Iterable[UploadJob]): The questions and their payloads
+            on_result (Callable): If given, called with each result as soon
+                as its question completes
+
+        Returns:
+            The results, in the order of the jobs
+        """
+
+        import aiohttp
+
+        connector = aiohttp.TCPConnector(limit=self.max_in_flight)
+        async with aiohttp.ClientSession(
+            connector=connector,
+            headers=dict(driver.session.headers),
+            cookie_jar=session_cookie_jar(driver.session),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        ) as session:
+            # Jobs are only taken when there is room for them, so a
+            # generator of jobs is never read into memory all at once
+            slots = asyncio.Semaphore(self.max_in_flight)
+
+            async def post(job: UploadJob) -> UploadResult:
+                try:
+                    result = await self.post_payload(session, action, driver, job)
+                    if on_result is not None:
+                        on_result(result)
+                    return result
+                finally:
+                    slots.release()
+
+            tasks = []
+            for job in jobs:
+                await slots.acquire()
+                tasks.append(asyncio.ensure_future(post(job)))
+            return list(await asyncio.gather(*tasks))
+
+    # end upload_async()
+
+    async def post_payload(
+        self, session, action, driver: DriverBase, job: UploadJob
+    ) -> UploadResult:
+        """Posts the payload of a question, retrying transient failures
+
+        Whether and when to post again is decided by action.retry_step(),
+        as in ActionUploadBase.post_payload(). The lookups go through the
+        requests session of the driver, in the default executor.
+
+        Args:
+            session (aiohttp.ClientSession): The session of the upload
+            action (ActionUploadBase): The action with the API to post to
+            driver (DriverBase): The driver with the authenticated session,
+                used for the lookups
+            job (UploadJob): The question and its payload
+
+        Returns:
+            The outcome of the last post
+        """
+
+        loop = asyncio.get_running_loop()
+        if job.in_doubt:
+            result = await loop.run_in_executor(None, action.check_in_doubt, driver, job)
+            if result is not None:
+                return result
+
+        attempt = 1
+        while True:
+            result = await self.post_once(session, action, job)
+            result.attempts = attempt
+
+            step = action.retry_step(job, result, attempt)
+            if step is None:
+                return result
+            await asyncio.sleep(step.delay)
+            if step.lookup and await loop.run_in_executor(
+                None, action.check_created, driver, job, result
+            ):
+                return result
+            attempt += 1
+
+    # end post_payload()
+
+    async def post_once(self, session, action, job: UploadJob) -> UploadResult:
+        """Posts the payload of a question once
+
+        Args:
+            session (aiohttp.ClientSession): The session of the upload
+            action (ActionUploadBase): The action with the API to post to
+            job (UploadJob): The question and its payload
+
+        Returns:
+            The outcome of the post
+        """
+
+        import aiohttp
+
+        result = UploadResult(index=job.index, title=job.question.title, fingerprint=job.fingerprint)
+        await self.rate_limiter.acquire(action.create_api)
+        # The bodies are only logged for a sample of the questions, or at DEBUG
+        level = logging.INFO if action.telemetry.sampled() else logging.DEBUG
+        logger.log(level, "Posting question: %s", job.payload)
+        sent = len(job.body) if job.body is not None else 0
+        start = time.perf_counter()
+        try:
+            if job.body is not None:
+                request = session.post(action.create_api, data=job.body, headers=JSON_HEADERS)
+            else:
+                request = session.post(action.create_api, json=job.payload)
+            async with request as response:
+                content = await response.read()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            result.latency = time.perf_counter() - start
+            result.error = str(exc) or type(exc).__name__
+            # The connection could not be opened, so nothing was sent
+            result.sent = not isinstance(exc, aiohttp.ClientConnectorError)
+            action.telemetry.record(result.latency, None, sent)
+            logger.error("Error uploading question %s", job.question.title)
+            logger.error(result.error)
+            return result
+        result.latency = time.perf_counter() - start
+        result.status_code = response.status
+        action.telemetry.record(result.latency, response.status, sent, len(content))
+        logger.log(level, "Response %s: %s", response.status, content)
+
+        # If response is not successful, we print out an error message
+        if response.status != action.success_status:
+            logger.error("Error uploading question %s", job.question.title)
+            logger.error(content)
+            result.error = f"Status {response.status}"
+            return result
+
+        result.success = True
+        try:
+            result.response_id = body_response_id(json.loads(content))
+        except ValueError:
+            pass
+        return result
+
+    # end post_once()
+
+
+# end class AsyncUploader
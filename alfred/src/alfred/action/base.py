@@ -0,0 +1,582 @@
+""" Base module for the actions uploading questions """
+
+# Standard imports
+from dataclasses import dataclass
+import json
+import logging
+import time
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional
+
+# Application import
+from alfred.action.adaptive import AdaptiveConcurrency
+from alfred.action.concurrent import configure_session_pool, map_as_completed
+from alfred.action.manifest import UploadManifest
+from alfred.action.retry import RetryPolicy, never_sent
+from alfred.action.serialize import JSON_HEADERS
+from alfred.action.telemetry import UploadTelemetry
+from alfred.io.question import MultipleChoiceQuestion
+from alfred.net.driver.base import DriverBase
+
+if TYPE_CHECKING:
+    from alfred.action.async_upload import AsyncUploader
+    from alfred.action.journal import UploadJournal
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class UploadJob:
+    """A question together with the payload to post for it"""
+
+    index: int  # Position of the question in the bank
+    question: MultipleChoiceQuestion
+    # The fields of the payload set for the question, which are logged and
+    # used to look the question up. The serializers only give these fields,
+    # as the others are the same for every question and are in body. If
+    # body is None, payload is the whole payload and is posted as it is.
+    payload: Dict
+    fingerprint: Optional[str] = None
+    # The question was in flight when an earlier upload stopped, so it is
+    # looked up before it is posted
+    in_doubt: bool = False
+    body: Optional[bytes] = None  # The payload serialized already
+
+
+@dataclass
+class UploadResult:
+    """The outcome of posting a question"""
+
+    index: int  # Position of the question in the bank
+    title: str
+    success: bool = False
+    status_code: Optional[int] = None
+    latency: float = 0.0  # In seconds
+    response_id: Optional[str] = None
+    fingerprint: Optional[str] = None
+    error: Optional[str] = None
+    attempts: int = 1
+    # False if the post failed before the request was sent, so the question
+    # cannot have been created
+    sent: bool = True
+    # The post failed, but the question may have been created all the same
+    in_doubt: bool = False
+
+
+@dataclass
+class RetryStep:
+    """What to do before a question is posted again"""
+
+    delay: float  # Seconds to wait
+    # The question may have been created, so it is looked up with
+    # check_created() before it is posted again
+    lookup: bool = False
+
+
+def response_id(response) -> Optional[str]:
+    """Extracts the id of the created question from the response, if any"""
+
+    try:
+        body = response.json()
+    except ValueError:
+        return None
+    return body_response_id(body)
+
+
+# end response_id()
+
+
+def body_response_id(body) -> Optional[str]:
+    """Extracts the id of the created question from the decoded response body"""
+
+    if isinstance(body, dict):
+        data = body.get("data")
+        if isinstance(data, dict) and "id" in data:
+            return str(data["id"])
+        if "id" in body:
+            return str(body["id"])
+    return None
+
+
+# end body_response_id()
+
+
+class ActionUploadBase:
+    """Base class for the actions that post questions to an API
+
+    Subclasses build the payload of each question, and this class posts
+    them, optionally with several workers sharing the session of the driver.
+    """
+
+    # The status code of the response when a question is created
+    success_status = 200
+
+    # The payload fields used to look up a question that may have been
+    # created already, before it is posted again
+    lookup_fields = ("title",)
+    # Whether the lookup API is known to filter on the lookup fields and to
+    # answer with every match at once. Until it is, a question missing from
+    # the response may still exist, so it is left in doubt and not posted
+    # again.
+    lookup_filtered = False
+
+    def __init__(self):
+        """Constructor"""
+        self.create_api = None
+        # API listing the questions created, used by find_existing(). If
+        # None, questions are only posted again when they were turned away,
+        # e.g. with a 429, and never after a timeout or a server error.
+        self.lookup_api = None
+        self.retry: Optional[RetryPolicy] = RetryPolicy()
+        self.timeout = 60.0  # In seconds
+        self.telemetry = UploadTelemetry()
+        self.results: List[UploadResult] = []
+
+    # end __init__()
+
+    def post_payload(
+        self,
+        driver: DriverBase,
+        job: UploadJob,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+    ) -> UploadResult:
+        """Posts the payload of a question, retrying transient failures
+
+        After a failure that may have created the question anyway, such as
+        a timeout or a server error, the question is looked up with
+        find_existing() before it is posted again. If the lookup cannot
+        tell, the question is not posted again so that it is never created
+        twice.
+
+        Args:
+            driver (DriverBase): The driver with the authenticated session
+            job (UploadJob): The question and its payload
+            concurrency (AdaptiveConcurrency): If given, each post waits for
+                a slot and its outcome is recorded
+
+        Returns:
+            The outcome of the last post
+        """
+
+        if job.in_doubt:
+            result = self.check_in_doubt(driver, job)
+            if result is not None:
+                return result
+
+        attempt = 1
+        while True:
+            if concurrency is None:
+                result = self.post_once(driver, job)
+            else:
+                with concurrency.slot():
+                    result = self.post_once(driver, job)
+                concurrency.record(result.latency, result.status_code)
+            result.attempts = attempt
+
+            step = self.retry_step(job, result, attempt)
+            if step is None:
+                return result
+            time.sleep(step.delay)
+            if step.lookup and self.check_created(driver, job, result):
+                return result
+            attempt += 1
+
+    # end post_payload()
+
+    def retry_step(self, job: UploadJob, result: UploadResult, attempt: int) -> Optional[RetryStep]:
+        """Decides whether a question is posted again after a post
+
+        The transports, i.e. post_payload() and AsyncUploader, only make
+        the posts and the waits, so that they retry the same way.
+
+        Args:
+            job (UploadJob): The question and its payload
+            result (UploadResult): The outcome of the last post
+            attempt (int): Number of posts made so far
+
+        Returns:
+            The step before the next post, or None if result is final
+        """
+
+        if result.success:
+            return None
+        ambiguous = RetryPolicy.is_ambiguous(result.status_code, result.sent)
+        # Kept in doubt unless it is posted again
+        result.in_doubt = ambiguous
+        if self.retry is None or not self.retry.should_retry(result.status_code, attempt):
+            return None
+        if self.lookup_api is None and ambiguous:
+            logger.error(
+                "Question %s may have been created despite the error. Not posting it again",
+                job.question.title
+            )
+            return None
+
+        self.telemetry.count("retries")
+        delay = self.retry.delay(attempt)
+        logger.warning(
+            "Posting question %s again in %.1fs after: %s", job.question.title, delay, result.error
+        )
+        return RetryStep(delay=delay, lookup=ambiguous)
+
+    # end retry_step()
+
+    def check_created(self, driver: DriverBase, job: UploadJob, result: UploadResult) -> bool:
+        """Looks up a question that may have been created despite a failed post
+
+        Args:
+            driver (DriverBase): The driver with the authenticated session
+            job (UploadJob): The question and its payload
+            result (UploadResult): The outcome of the last post, updated if
+                the question was created
+
+        Returns:
+            Whether result is final, i.e. the question was created or it
+            cannot be told. False if the question can be posted again.
+        """
+
+        try:
+            existing = self.find_existing(driver, job)
+        except LookupError as exc:
+            logger.error(
+                "Unable to check if question %s was created (%s). Not posting it again",
+                job.question.title, exc
+            )
+            return True
+        if existing is None:
+            result.in_doubt = False
+            return False
+        logger.info("Question %s was created despite the error", job.question.title)
+        result.success = True
+        result.response_id = existing or None
+        result.error = None
+        result.in_doubt = False
+        return True
+
+    # end check_created()
+
+    def check_in_doubt(self, driver: DriverBase, job: UploadJob) -> Optional[UploadResult]:
+        """Looks up a question that was in flight when an earlier upload stopped
+
+        Returns:
+            The outcome if the question is not to be posted, or None if it
+            was not created and can be posted
+        """
+
+        result = UploadResult(index=job.index, title=job.question.title, fingerprint=job.fingerprint)
+        try:
+            existing = self.find_existing(driver, job)
+        except LookupError as exc:
+            logger.error(
+                "Unable to check if question %s was created by the interrupted upload (%s). "
+                "Not posting it again", job.question.title, exc
+            )
+            result.error = f"In doubt: {exc}"
+            result.in_doubt = True
+            return result
+        if existing is None:
+            return None
+        logger.info("Question %s was created by the interrupted upload", job.question.title)
+        result.success = True
+        result.response_id = existing or None
+        return result
+
+    # end check_in_doubt()
+
+    def post_once(self, driver: DriverBase, job: UploadJob) -> UploadResult:
+        """Posts the payload of a question once
+
+        Args:
+            driver (DriverBase): The driver with the authenticated session
+            job (UploadJob): The question and its payload
+
+        Returns:
+            The outcome of the post
+        """
+
+        result = UploadResult(index=job.index, title=job.question.title, fingerprint=job.fingerprint)
+        # The bodies are only logged for a sample of the questions, or at DEBUG
+        level = logging.INFO if self.telemetry.sampled() else logging.DEBUG
+        logger.log(level, "Posting question: %s", job.payload)
+        sent = len(job.body) if job.body is not None else 0
+        start = time.perf_counter()
+        try:
+            if job.body is not None:
+                response = driver.session.post(
+                    self.create_api, data=job.body, headers=JSON_HEADERS, timeout=self.timeout
+                )
+            else:
+                response = driver.session.post(self.create_api, json=job.payload, timeout=self.timeout)
+        except OSError as exc:
+            # requests raises subclasses of OSError for timeouts and
+            # connection problems
+            result.latency = time.perf_counter() - start
+            result.error = str(exc)
+            result.sent = not never_sent(exc)
+            self.telemetry.record(result.latency, None, sent)
+            logger.error('Error uploading question %s', job.question.title)
+            logger.error(exc)
+            return result
+        result.latency = time.perf_counter() - start
+        result.status_code = response.status_code
+        self.telemetry.record(result.latency, response.status_code, sent, len(response.content))
+        logger.log(level, "Response %s: %s", response.status_code, response.content)
+
+        # If response is not successful, we print out an error message
+        if response.status_code != self.success_status:
+            logger.error('Error uploading question %s', job.question.title)
+            logger.error(response.content)
+            result.error = f"Status {response.status_code}"
+            return result
+
+        result.success = True
+        result.response_id = response_id(response)
+        return result
+
+    # end post_once()
+
+    def lookup_params(self, job: UploadJob) -> Dict:
+        """The query parameters to look up the question of a job"""
+        return {field: job.payload[field] for field in self.lookup_fields if field in job.payload}
+
+    def find_existing(self, driver: DriverBase, job: UploadJob) -> Optional[str]:
+        """Looks up a question that may have been created already
+
+        The lookup API is queried with the lookup fields of the payload, and
+        answers with a list of questions, either as it is or under "data"
+        or "items". A question found is certain, but a question not found
+        is only taken as not created if lookup_filtered is set and the
+        response shows that the filters were applied and nothing was left
+        on another page. Subclasses can override this for other APIs.
+
+        Args:
+            driver (DriverBase): The driver with the authenticated session
+            job (UploadJob): The question and its payload
+
+        Returns:
+            The id of the question if it exists, "" if it exists but has no
+            id, or None if it does not exist
+
+        Raises:
+            LookupError: If it cannot be told whether the question exists
+        """
+
+        if self.lookup_api is None:
+            raise LookupError("No API to look up questions")
+        params = self.lookup_params(job)
+        try:
+            response = driver.session.get(self.lookup_api, params=params, timeout=self.timeout)
+        except OSError as exc:
+            raise LookupError(str(exc)) from exc
+        if response.status_code != 200:
+            raise LookupError(f"Status {response.status_code}")
+        try:
+            items = response.json()
+        except ValueError as exc:
+            raise LookupError("Response is not JSON") from exc
+
+        total = None
+        while isinstance(items, dict):
+            total = items.get("totalCount", items.get("total", total))
+            if "data" in items:
+                items = items["data"]
+            elif "items" in items:
+                items = items["items"]
+            else:
+                break
+        if not isinstance(items, list):
+            raise LookupError("Response is not a list of questions")
+
+        matches = [
+            isinstance(item, dict) and all(item.get(field) == value for field, value in params.items())
+            for item in items
+        ]
+        for item, match in zip(items, matches):
+            if match:
+                return str(item.get("id", ""))
+
+        # Not found. This is only certain if the response holds every
+        # question matching the filters, and nothing else.
+        if not all(matches):
+            raise LookupError("The lookup API ignored the filters")
+        if isinstance(total, int) and total > len(items):
+            raise LookupError("The lookup API answered with one page of the questions")
+        if not self.lookup_filtered:
+            raise LookupError("The lookup API is not known to filter the questions")
+        return None
+
+    # end find_existing()
+
+    def upload(
+        self,
+        driver: DriverBase,
+        jobs: Iterable[UploadJob],
+        max_workers: int = 1,
+        manifest: Optional[UploadManifest] = None,
+        uploader: Optional["AsyncUploader"] = None,
+        concurrency: Optional[AdaptiveConcurrency] = None,
+        journal: Optional["UploadJournal"] = None,
+        resume: bool = False,
+        dry_run: Optional[str] = None,
+    ) -> List[UploadResult]:
+        """Posts the questions, max_workers at a time
+
+        Args:
+            driver (DriverBase): The driver with the authenticated session
+            jobs (Iterable[UploadJob]): The questions and their payloads
+            max_workers (int): Number of questions posted at the same time
+            manifest (UploadManifest): If given, the questions created are
+                added to it and it is saved at the end.
+            uploader (AsyncUploader): If given, the questions are posted from
+                an event loop by the uploader instead, and max_workers is
+                not used.
+            concurrency (AdaptiveConcurrency): If given, the number of
+                questions posted at the same time is adjusted by it while
+                the upload runs, up to its maximum, instead of max_workers.
+            journal (UploadJournal): If given, each question is recorded in
+                it as it is posted and as soon as it completes, so a crash
+                only leaves the questions in flight in doubt. The journal
+                is finished once every question has completed.
+            resume (bool): Whether to skip the questions the journal has
+                confirmed as created by an upload that was cut short. The
+                questions that may have been created are looked up first.
+            dry_run (str): If given, nothing is posted, and the request
+                bodies are written to this JSON Lines file instead. The
+                driver is not used. See write_dry_run().
+
+        Returns:
+            The results, in the order of the jobs
+        """
+
+        if dry_run is not None:
+            self.results = self.write_dry_run(jobs, dry_run)
+            return self.results
+
+        if journal is not None:
+            jobs = self.journal_jobs(jobs, journal, resume)
+
+        self.results = []
+
+        def completed(result: UploadResult):
+            # Recorded as soon as the question completes, whatever the
+            # order of the questions
+            self.results.append(result)
+            self.telemetry.count("created" if result.success else "failed")
+            if journal is not None:
+                journal.record(result)
+            if result.success and manifest is not None:
+                manifest.add(result.fingerprint)
+
+        self.telemetry.reset()
+        self.telemetry.start()
+        try:
+            if uploader is not None:
+                uploader.upload(self, driver, jobs, on_result=completed)
+            elif concurrency is not None:
+                configure_session_pool(driver.session, concurrency.maximum)
+                for result in map_as_completed(
+                    lambda job: self.post_payload(driver, job, concurrency), jobs, concurrency.maximum
+                ):
+                    completed(result)
+            else:
+                configure_session_pool(driver.session, max_workers)
+                for result in map_as_completed(
+                    lambda job: self.post_payload(driver, job), jobs, max_workers
+                ):
+                    completed(result)
+            if journal is not None:
+                journal.finish()
+        finally:
+            # The jobs come in the order of the bank
+            self.results.sort(key=lambda result: result.index)
+            self.telemetry.finish()
+            self.telemetry.log_summary()
+            if manifest is not None:
+                manifest.save()
+            if concurrency is not None:
+                logger.info(
+                    "Concurrency limit ended at %s after %s changes",
+                    concurrency.limit, len(concurrency.history) - 1
+                )
+        return self.results
+
+    # end upload()
+
+    def journal_jobs(
+        self, jobs: Iterable[UploadJob], journal: "UploadJournal", resume: bool = False
+    ) -> Iterator[UploadJob]:
+        """Records each job in the journal before it is posted
+
+        Args:
+            jobs (Iterable[UploadJob]): The questions and their payloads
+            journal (UploadJournal): The journal of the target
+            resume (bool): Whether to skip the questions confirmed as created
+
+        Returns:
+            The jobs left to post
+        """
+
+        confirmed = journal.confirmed() if resume else set()
+        in_doubt = journal.in_doubt() if resume else set()
+        skipped = 0
+        for job in jobs:
+            if job.fingerprint in confirmed:
+                skipped += 1
+                self.telemetry.count("resumed")
+                continue
+            job.in_doubt = job.fingerprint in in_doubt
+            journal.start(job)
+            yield job
+        if resume:
+            logger.info(
+                "Resumed upload: %s Questions already created were skipped, "
+                "%s Questions that may have been created were checked", skipped, len(in_doubt)
+            )
+
+    # end journal_jobs()
+
+    def write_dry_run(self, jobs: Iterable[UploadJob], filename: str) -> List[UploadResult]:
+        """Writes the request bodies of the jobs to a JSON Lines file
+
+        Each line holds the index, title and fingerprint of a question, the
+        url it is posted to, the fields used to look it up, which include
+        the resolved module and assessment ids for MySA, and the body as
+        it would be sent. The file can be posted later with
+        alfred.cli.replay.
+
+        Args:
+            jobs (Iterable[UploadJob]): The questions and their payloads
+            filename (str): The file to write
+
+        Returns:
+            The results, none of them posted
+        """
+
+        results = []
+        start = time.perf_counter()
+        with open(filename, "w", encoding="utf-8") as file:
+            for job in jobs:
+                body = job.body if job.body is not None else json.dumps(job.payload).encode("utf-8")
+                record = {
+                    "index": job.index,
+                    "title": job.question.title,
+                    "fingerprint": job.fingerprint,
+                    "url": self.create_api,
+                    "fields": self.lookup_params(job),
+                    "body": body.decode("utf-8"),
+                }
+                file.write(json.dumps(record) + "\n")
+                results.append(UploadResult(
+                    index=job.index, title=job.question.title, fingerprint=job.fingerprint,
+                    error="Dry run",
+                ))
+        elapsed = time.perf_counter() - start
+        logger.info(
+            "Dry run: wrote %s request bodies to %s in %.2fs (%.0f us per question)",
+            len(results), filename, elapsed, elapsed / max(len(results), 1) * 1e6
+        )
+        return results
+
+    # end write_dry_run()
+
+
+# end class ActionUploadBase
@@ -0,0 +1,73 @@
+""" Helpers to run uploads concurrently """
+
+# Standard imports
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+import logging
+from typing import Callable, Iterable, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def configure_session_pool(session, max_workers: int):
+    """Sizes the connection pool of a requests session for the workers
+
+    requests keeps 10 connections per host by default, so with more workers
+    than that the extra connections would be opened and thrown away on every
+    request.
+
+    Args:
+        session (requests.Session): The session shared by the workers
+        max_workers (int): The number of workers
+    """
+
+    from requests.adapters import HTTPAdapter
+
+    if max_workers <= 10:
+        return
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=max_workers)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+
+# end configure_session_pool()
+
+
+def map_as_completed(func: Callable[[T], R], items: Iterable[T], max_workers: int = 1) -> Iterator[R]:
+    """Applies a function to the items in a thread pool, yielding each result as it completes
+
+    The results come in the order they complete, so a slow item never holds
+    back the results of the items after it. Only a bounded number of items
+    are taken from the iterable ahead of the results being consumed, so a
+    generator of items is never read into memory all at once.
+
+    Args:
+        func (Callable): The function to apply
+        items (Iterable): The items
+        max_workers (int): Number of threads. With 1 the function is called
+            in the current thread.
+
+    Returns:
+        An iterator over the results, in the order they complete
+    """
+
+    if max_workers <= 1:
+        yield from map(func, items)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = set()
+        for item in items:
+            pending.add(executor.submit(func, item))
+            # Keeps every worker busy while waiting for the next result
+            if len(pending) >= 2 * max_workers:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        for future in as_completed(pending):
+            yield future.result()
+
+
+# end map_as_completed()
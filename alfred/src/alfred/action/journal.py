@@ -0,0 +1,176 @@
+""" Journal of the questions posted, kept as they complete """
+
+# Standard imports
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional, Set
+
+# Application import
+from alfred.action.base import UploadJob, UploadResult
+from alfred.io.storage import alfred_home, user_digest
+
+logger = logging.getLogger(__name__)
+
+# Status of the entries
+POSTING = "posting"  # The question is about to be posted
+CREATED = "created"
+FAILED = "failed"
+# The post failed, but the question may have been created all the same
+DOUBT = "doubt"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    target TEXT NOT NULL,
+    user TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    title TEXT,
+    status TEXT NOT NULL,
+    status_code INTEGER,
+    response_id TEXT,
+    error TEXT,
+    recorded REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_user ON entries (target, user, fingerprint, seq);
+"""
+
+
+class UploadJournal:
+    """Append-only journal of the questions posted to a target
+
+    An entry is added when a question is about to be posted, and another
+    one when it completes, so after a crash the journal tells which
+    questions were created, which failed and which were in flight. The
+    journal is a SQLite database in WAL mode, and every entry is committed
+    on its own.
+
+    Each user has their own entries, like their UploadManifest. When an
+    upload finishes, its entries are cleared by finish(), so only an
+    upload that was cut short is resumed. The questions that may have been
+    created are kept until they are settled, so that they are never posted
+    again without being looked up.
+    """
+
+    def __init__(self, target: str, path: Optional[str] = None, username: Optional[str] = None):
+        """Constructor
+
+        Args:
+            target (str): Name of the target, e.g. 'mysa' or 'myleo'
+            path (str): The database file. Defaults to ~/.alfred/journal.sqlite3
+            username (str): The user uploading. The username is hashed so
+                that it is not on disk.
+        """
+
+        self.target = target
+        self.user = user_digest(username) if username else ""
+        self.path = path or alfred_home("journal.sqlite3")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL survives the app crashing, and only the last
+        # entries can be lost if the machine loses power
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+
+    # end __init__()
+
+    def _append(self, fingerprint: str, title, status: str, status_code=None, response_id=None, error=None):
+        """Appends an entry and commits it"""
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO entries (target, user, fingerprint, title, status, status_code, "
+                "response_id, error, recorded) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    self.target, self.user, fingerprint, str(title), status, status_code,
+                    response_id, error, time.time(),
+                ),
+            )
+
+    # end _append()
+
+    def start(self, job: UploadJob):
+        """Records that a question is about to be posted"""
+
+        if job.fingerprint is not None:
+            self._append(job.fingerprint, job.question.title, POSTING)
+
+    # end start()
+
+    def record(self, result: UploadResult):
+        """Records the outcome of a question"""
+
+        if result.success:
+            status = CREATED
+        elif result.in_doubt:
+            status = DOUBT
+        else:
+            status = FAILED
+        if result.fingerprint is not None:
+            self._append(
+                result.fingerprint,
+                result.title,
+                status,
+                status_code=result.status_code,
+                response_id=result.response_id,
+                error=result.error,
+            )
+
+    # end record()
+
+    def confirmed(self) -> Set[str]:
+        """Fingerprints of the questions created since the journal was last finished"""
+
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT DISTINCT fingerprint FROM entries WHERE target = ? AND user = ? AND status = ?",
+                (self.target, self.user, CREATED),
+            ).fetchall()
+        return {fingerprint for fingerprint, in rows}
+
+    # end confirmed()
+
+    def in_doubt(self) -> Set[str]:
+        """Fingerprints of the questions that may or may not have been created
+
+        They were in flight when an upload stopped, or their post failed in
+        a way that may have created them.
+        """
+
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT fingerprint, status FROM entries WHERE seq IN "
+                "(SELECT MAX(seq) FROM entries WHERE target = ? AND user = ? GROUP BY fingerprint)",
+                (self.target, self.user),
+            ).fetchall()
+        return {fingerprint for fingerprint, status in rows if status in (POSTING, DOUBT)}
+
+    # end in_doubt()
+
+    def finish(self):
+        """Clears the entries of an upload that ran to the end
+
+        The questions in doubt are kept, so the next upload looks them up.
+        """
+
+        with self.lock, self.connection:
+            self.connection.execute(
+                "DELETE FROM entries WHERE target = ? AND user = ? AND fingerprint NOT IN "
+                "(SELECT fingerprint FROM entries WHERE status IN (?, ?) AND seq IN "
+                "(SELECT MAX(seq) FROM entries WHERE target = ? AND user = ? GROUP BY fingerprint))",
+                (self.target, self.user, POSTING, DOUBT, self.target, self.user),
+            )
+
+    # end finish()
+
+    def close(self):
+        """Closes the database"""
+        with self.lock:
+            self.connection.close()
+
+
+# end class UploadJournal
@@ -0,0 +1,76 @@
+""" Manifest of the questions already uploaded to a target """
+
+# Standard imports
+import json
+import logging
+import os
+from typing import Optional
+
+# Application import
+from alfred.io.storage import alfred_home, atomic_write, user_digest
+
+logger = logging.getLogger(__name__)
+
+
+class UploadManifest:
+    """Set of fingerprints of the questions uploaded to a target by a user
+
+    The fingerprints are kept in a set so that checking a question is O(1),
+    and saved as json so that a later run can skip the questions that have
+    not changed since they were last uploaded. Each user has their own
+    manifest, as a question uploaded by one user is not in the modules of
+    another.
+    """
+
+    def __init__(self, target: str, directory: Optional[str] = None, username: Optional[str] = None):
+        """Constructor
+
+        Args:
+            target (str): Name of the target, e.g. 'mysa' or 'myleo'
+            directory (str): Folder of the manifests. Defaults to ~/.alfred/manifests
+            username (str): The user uploading. The username is hashed so
+                that it is not on disk.
+        """
+
+        self.target = target
+        name = target
+        if username:
+            name = f"{target}-{user_digest(username)}"
+        self.filename = os.path.join(directory or alfred_home("manifests"), f"{name}.json")
+        self.fingerprints = set()
+        if os.path.exists(self.filename):
+            with open(self.filename, encoding="utf-8") as file:
+                self.fingerprints = set(json.load(file).get("fingerprints", []))
+            logger.info(
+                "Loaded %s uploaded questions for %s from %s",
+                len(self.fingerprints), target, self.filename
+            )
+
+    # end __init__()
+
+    def __contains__(self, fingerprint: str) -> bool:
+        return fingerprint in self.fingerprints
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def add(self, fingerprint: str):
+        """Records that a question has been uploaded"""
+        self.fingerprints.add(fingerprint)
+
+    def clear(self):
+        """Forgets every uploaded question, so they are all uploaded again"""
+        self.fingerprints.clear()
+
+    def save(self):
+        """Saves the manifest"""
+
+        atomic_write(
+            self.filename,
+            json.dumps({"target": self.target, "fingerprints": sorted(self.fingerprints)}),
+        )
+
+    # end save()
+
+
+# end class UploadManifest
@@ -0,0 +1,253 @@
+""" Pre-flight checks of a question bank before it is uploaded """
+
+# Standard imports
+from dataclasses import dataclass, field
+import logging
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# Application import
+from alfred.io.question import MultipleChoiceQuestion
+from alfred.net.driver.mysa import AssessmentData
+
+logger = logging.getLogger(__name__)
+
+
+class AssessmentIndex:
+    """Resolves the module and assessment ids of questions
+
+    Every (module, assessment, qualification type) combination is resolved
+    once when the index is built, including the combination without a
+    qualification type, so resolving a question is a single lookup.
+    """
+
+    def __init__(self, assessment_data: AssessmentData):
+        """Constructor
+
+        Args:
+            assessment_data (AssessmentData): The parsed assessment filter
+        """
+
+        self.module_assessment_map = assessment_data.module_assessment_map
+        self.index: Dict[Tuple[str, str, Optional[str]], Tuple[str, str]] = {}
+        for (module, assessment), entries in self.module_assessment_map.items():
+            for qtype, mod_assess_pair in entries.items():
+                self.index[(module, assessment, qtype)] = mod_assess_pair
+            # If the qtype is empty, and there is only one module-assessment
+            # entry, then we still add it in.
+            if len(entries) == 1:
+                self.index[(module, assessment, None)] = next(iter(entries.values()))
+
+    # end __init__()
+
+    def resolve(self, question: MultipleChoiceQuestion) -> Tuple[str, str]:
+        """Resolves the module id and assessment id of a question
+
+        Raises:
+            ValueError: If the question cannot be resolved to exactly one
+                module and assessment.
+        """
+
+        qtype = question.qtype or None
+        mod_assess_pair = self.index.get((question.module, question.assessment, qtype))
+        if mod_assess_pair is not None:
+            return mod_assess_pair
+
+        entries = self.module_assessment_map.get((question.module, question.assessment))
+        if not entries:
+            raise ValueError(
+                f"Module {question.module} Assessment {question.assessment} "
+                "with correct rights cannot be found"
+            )
+        if qtype is None:
+            raise ValueError(
+                f"Module {question.module} Assessment {question.assessment} has more "
+                "than 1 entry. Please provide qualification type in question"
+            )
+        raise ValueError(
+            f"Module {question.module} Assessment {question.assessment} "
+            f"QType {qtype} not found"
+        )
+
+    # end resolve()
+
+
+# end class AssessmentIndex
+
+
+@dataclass
+class PreflightIssue:
+    """A problem found with a question"""
+
+    index: int  # Position of the question in the bank
+    title: str
+    message: str
+
+
+@dataclass
+class PlannedQuestion:
+    """A question that is ready to be uploaded"""
+
+    index: int  # Position of the question in the bank
+    question: MultipleChoiceQuestion
+    mod_assess_pair: Optional[Tuple[str, str]] = None  # (module id, assessment id)
+
+
+@dataclass
+class PreflightReport:
+    """Result of the pre-flight checks"""
+
+    total: int = 0
+    plan: List[PlannedQuestion] = field(default_factory=list)
+    issues: List[PreflightIssue] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        """Whether every question can be uploaded"""
+        return not self.issues
+
+    def log(self):
+        """Logs the outcome of the checks"""
+
+        for issue in self.issues:
+            logger.error("Skipping question %s: %s", issue.title, issue.message)
+        logger.info("%s/%s Questions ready to upload", len(self.plan), self.total)
+
+
+# end class PreflightReport
+
+
+def _is_number(value: Any) -> bool:
+    """Checks if a value can be used as a number"""
+
+    try:
+        return not math.isnan(float(value))
+    except (TypeError, ValueError):
+        return False
+
+
+# end _is_number()
+
+
+def check_question(question: MultipleChoiceQuestion) -> List[str]:
+    """Checks the content of a question
+
+    Returns:
+        The problems found, if any
+    """
+
+    problems = []
+    if not _is_number(question.score):
+        problems.append(f"Score {question.score!r} is not a number")
+    if not _is_number(question.est_time_min):
+        problems.append(f"Estimated time {question.est_time_min!r} is not a number")
+    if not question.options:
+        problems.append("There are no options")
+    elif question.answer not in question.options:
+        problems.append(f"Answer {question.answer!r} is not one of the options")
+    return problems
+
+
+# end check_question()
+
+
+def preflight(
+    questions: Iterable[MultipleChoiceQuestion],
+    index: Optional[AssessmentIndex] = None,
+) -> PreflightReport:
+    """Checks every question of a bank before anything is uploaded
+
+    Args:
+        questions (Iterable[MultipleChoiceQuestion]): The questions to check
+        index (AssessmentIndex): If given, the module and assessment ids
+            of each question are resolved as well
+
+    Returns:
+        A report with the questions ready to upload and the problems found
+    """
+
+    report = PreflightReport()
+    for position, question in enumerate(questions):
+        report.total += 1
+        problems = check_question(question)
+        mod_assess_pair = None
+        if index is not None:
+            try:
+                mod_assess_pair = index.resolve(question)
+            except ValueError as exc:
+                problems.append(str(exc))
+
+        if problems:
+            report.issues.append(
+                PreflightIssue(index=position, title=question.title, message="; ".join(problems))
+            )
+        else:
+            report.plan.append(
+                PlannedQuestion(index=position, question=question, mod_assess_pair=mod_assess_pair)
+            )
+    return report
+
+
+# end preflight()
+
+
+def resolve_pages(
+    report: PreflightReport,
+    pages: Iterable[AssessmentData],
+    assessment_data: Optional[AssessmentData] = None,
+) -> Iterator[PlannedQuestion]:
+    """Resolves the questions checked by preflight() as the assessments arrive
+
+    A question with a qualification type is yielded as soon as a page has its
+    assessment, so that it can be uploaded before the last page. The others
+    are only resolved once every page has arrived, as a later page could add
+    another qualification type to their assessment.
+
+    Args:
+        report (PreflightReport): The report of preflight() without an index.
+            The questions that cannot be resolved are added to its issues,
+            and its plan keeps the questions yielded.
+        pages (Iterable[AssessmentData]): The parts of the assessment filter
+        assessment_data (AssessmentData): If given, the pages are merged into it
+
+    Returns:
+        An iterator over the questions resolved, in the order they are resolved
+    """
+
+    if assessment_data is None:
+        assessment_data = AssessmentData()
+    waiting: Dict[Tuple[str, str, Optional[str]], List[PlannedQuestion]] = {}
+    for planned in report.plan:
+        question = planned.question
+        key = (question.module, question.assessment, question.qtype or None)
+        waiting.setdefault(key, []).append(planned)
+    report.plan = []
+
+    for page in pages:
+        assessment_data.merge(page)
+        for (module, assessment), entries in page.module_assessment_map.items():
+            for qtype, mod_assess_pair in entries.items():
+                for planned in waiting.pop((module, assessment, qtype), []):
+                    planned.mod_assess_pair = mod_assess_pair
+                    report.plan.append(planned)
+                    yield planned
+
+    index = AssessmentIndex(assessment_data)
+    for planned in sorted(
+        (planned for group in waiting.values() for planned in group),
+        key=lambda planned: planned.index,
+    ):
+        try:
+            planned.mod_assess_pair = index.resolve(planned.question)
+        except ValueError as exc:
+            report.issues.append(
+                PreflightIssue(index=planned.index, title=planned.question.title, message=str(exc))
+            )
+            continue
+        report.plan.append(planned)
+        yield planned
+    report.issues.sort(key=lambda issue: issue.index)
+    report.log()
+
+
+# end resolve_pages()
@@ -0,0 +1,87 @@
+""" Retries of the questions that failed to upload """
+
+# Standard imports
+from dataclasses import dataclass
+import logging
+import random
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetryPolicy:
+    """When and how long to wait before posting a question again
+
+    Questions are posted again after a timeout or a connection error, and
+    after the status codes in retry_status. The waits grow exponentially
+    from base_delay up to max_delay, with full jitter so that the workers
+    do not all come back at the same moment.
+    """
+
+    max_attempts: int = 4  # Including the first post
+    base_delay: float = 0.5  # In seconds
+    max_delay: float = 30.0  # In seconds
+    retry_status: Tuple[int, ...] = (429, 500, 502, 503, 504)
+
+    def should_retry(self, status_code, attempt: int) -> bool:
+        """Whether a question should be posted again
+
+        Args:
+            status_code (int): Status code of the response, or None if no
+                response was received
+            attempt (int): Number of posts made so far
+        """
+
+        if attempt >= self.max_attempts:
+            return False
+        return status_code is None or status_code in self.retry_status
+
+    # end should_retry()
+
+    def delay(self, attempt: int) -> float:
+        """Seconds to wait after the given number of posts"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    @staticmethod
+    def is_ambiguous(status_code, sent: bool = True) -> bool:
+        """Whether the question may have been created despite the failure
+
+        Without a response, or with a server error, the question may have
+        been created before the failure, so it must be looked up before it
+        is posted again. A 429 means the request was turned away, and a
+        request that was never sent, e.g. as the connection could not be
+        opened, cannot have created anything.
+
+        Args:
+            status_code (int): Status code of the response, or None
+            sent (bool): Whether the request may have reached the server
+        """
+        return sent and (status_code is None or status_code >= 500)
+
+
+# end class RetryPolicy
+
+
+def never_sent(exc: BaseException) -> bool:
+    """Whether requests failed to open the connection, so nothing was sent
+
+    requests raises ConnectTimeout, or a ConnectionError caused by the
+    NewConnectionError of urllib3 when the connection is refused or the
+    host cannot be resolved. A connection that is reset, or a read that
+    times out, may come after the request was received.
+    """
+
+    from requests.exceptions import ConnectTimeout
+    from urllib3.exceptions import ConnectTimeoutError  # Base of NewConnectionError
+
+    while isinstance(exc, BaseException):
+        if isinstance(exc, (ConnectTimeout, ConnectTimeoutError)):
+            return True
+        # requests wraps the MaxRetryError of urllib3, which has the cause
+        # as its reason
+        exc = getattr(exc, "reason", None) or (exc.args[0] if exc.args else None)
+    return False
+
+
+# end never_sent()
@@ -0,0 +1,135 @@
+""" Fast serialization of the payloads posted to the APIs """
+
+# Standard imports
+from dataclasses import asdict
+import functools
+import json
+from json.encoder import encode_basestring_ascii
+import logging
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+logger = logging.getLogger(__name__)
+
+# The JSON backend encodes the values that are not strings, as text or as
+# UTF-8 bytes, e.g. orjson.dumps. requests encodes payloads with
+# json.dumps(payload, allow_nan=False), so only the default backend gives
+# the same body as requests byte for byte. Other backends give valid JSON
+# that may be spaced differently.
+JSONBackend = Callable[[Any], Union[str, bytes]]
+STDLIB_BACKEND: JSONBackend = functools.partial(json.dumps, allow_nan=False)
+
+# Headers of a request whose body was serialized here, as set by requests
+# for json=payload
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+
+class RawJSON(str):
+    """JSON text rendered already, inserted in a payload as it is"""
+
+
+def encode_value(value: Any, dumps: JSONBackend = STDLIB_BACKEND) -> str:
+    """Encodes a value as json.dumps does
+
+    Strings, which are most of the values, go straight to the C string
+    encoder of the json module.
+    """
+
+    if type(value) is str:
+        return encode_basestring_ascii(value)
+    if type(value) is RawJSON:
+        return value
+    return dumps(value)
+
+
+# end encode_value()
+
+
+def text_backend(dumps: JSONBackend) -> Callable[[Any], str]:
+    """Wraps a backend so that it always gives text"""
+
+    if dumps is STDLIB_BACKEND:
+        return dumps
+
+    def encode(value: Any) -> str:
+        text = dumps(value)
+        return text.decode("utf-8") if isinstance(text, bytes) else text
+
+    return encode
+
+
+# end text_backend()
+
+
+class PayloadTemplate:
+    """A payload dataclass compiled into fragments of JSON text
+
+    The fields that are the same for every question are encoded once, from
+    the defaults of the dataclass, and only the fields set for each question
+    are encoded when a payload is rendered. With the default backend, the
+    text is the same as json.dumps(asdict(payload)) gives, field order and
+    spacing included.
+    """
+
+    def __init__(
+        self,
+        cls,
+        fields: Sequence[str],
+        dumps: JSONBackend = STDLIB_BACKEND,
+        constants: Optional[Dict[str, Any]] = None,
+    ):
+        """Constructor
+
+        Args:
+            cls: The payload dataclass. It must be constructible without arguments.
+            fields (Sequence[str]): The fields set for each question
+            dumps (JSONBackend): Encodes the values that are not strings
+            constants (Dict[str, Any]): Fields set to the same value for
+                every question, in place of their defaults
+        """
+
+        dumps = text_backend(dumps)
+        self.dumps = dumps
+        self.fields: List[str] = []
+        self.fragments: List[str] = []
+        defaults = asdict(cls())
+        defaults.update(constants or {})
+        text = "{"
+        for position, (name, value) in enumerate(defaults.items()):
+            text += (", " if position else "") + encode_basestring_ascii(name) + ": "
+            if name in fields:
+                self.fragments.append(text)
+                self.fields.append(name)
+                text = ""
+            else:
+                text += dumps(value)
+        self.tail = text + "}"
+
+        missing = set(fields) - set(self.fields)
+        if missing:
+            raise ValueError(f"{cls.__name__} has no fields {sorted(missing)}")
+
+    # end __init__()
+
+    def render(self, values: Dict[str, Any]) -> str:
+        """Renders the JSON text of a payload
+
+        Args:
+            values (Dict[str, Any]): The value of every field set for the
+                question. RawJSON values are inserted as they are.
+
+        Returns:
+            The JSON text
+        """
+
+        dumps = self.dumps
+        parts = []
+        for fragment, name in zip(self.fragments, self.fields):
+            parts.append(fragment)
+            parts.append(encode_value(values[name], dumps))
+        parts.append(self.tail)
+        return "".join(parts)
+
+    # end render()
+
+
+# end class PayloadTemplate
@@ -0,0 +1,201 @@
+""" Counters and latency histograms of the uploads """
+
+# Standard imports
+from bisect import bisect_left
+import logging
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Histogram:
+    """Latency histogram with exponential buckets
+
+    Recording a value is a binary search over the bounds of the buckets,
+    and the percentiles are estimated from the counts, within the width of
+    a bucket (about 19%).
+    """
+
+    def __init__(self, smallest: float = 0.001, largest: float = 300.0, factor: float = 2 ** 0.25):
+        """Constructor
+
+        Args:
+            smallest (float): Upper bound of the first bucket, in seconds
+            largest (float): Values above this go to the last bucket
+            factor (float): Ratio between the bounds of consecutive buckets
+        """
+
+        self.bounds: List[float] = [smallest]
+        while self.bounds[-1] < largest:
+            self.bounds.append(self.bounds[-1] * factor)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    # end __init__()
+
+    def record(self, value: float):
+        """Adds a value"""
+
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+
+    # end record()
+
+    def percentile(self, q: float) -> float:
+        """Estimates a percentile, between 0 and 100, as the upper bound of its bucket"""
+
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for position, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                if position == len(self.bounds):
+                    return self.maximum
+                return min(self.bounds[position], self.maximum)
+        return self.maximum
+
+    # end percentile()
+
+
+# end class Histogram
+
+
+class UploadTelemetry:
+    """Counters, latency histogram and byte totals of an upload
+
+    When disabled, recording returns straight away. The bodies of the
+    requests and responses are only logged at DEBUG, or at INFO for a
+    sample of sample_rate of the questions.
+    """
+
+    def __init__(self, enabled: bool = True, sample_rate: float = 0.0):
+        """Constructor
+
+        Args:
+            enabled (bool): Whether to record anything
+            sample_rate (float): Fraction of the questions whose request and
+                response bodies are logged at INFO
+        """
+
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.lock = threading.Lock()
+        self.reset()
+
+    # end __init__()
+
+    def reset(self):
+        """Clears everything recorded"""
+
+        self.counters: Dict[str, int] = {}
+        self.latency = Histogram()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    # end reset()
+
+    def start(self):
+        """Starts timing the upload"""
+        if self.enabled:
+            self.started = time.perf_counter()
+            self.finished = None
+
+    def finish(self):
+        """Stops timing the upload"""
+        if self.enabled:
+            self.finished = time.perf_counter()
+
+    def count(self, name: str, value: int = 1):
+        """Adds to a counter"""
+
+        if not self.enabled:
+            return
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # end count()
+
+    def record(self, latency: float, status_code: Optional[int], sent: int = 0, received: int = 0):
+        """Records a request
+
+        Args:
+            latency (float): Time taken by the request in seconds
+            status_code (int): Status code of the response, or None if no
+                response was received
+            sent (int): Size of the request body in bytes
+            received (int): Size of the response body in bytes
+        """
+
+        if not self.enabled:
+            return
+        name = f"status_{status_code}" if status_code is not None else "no_response"
+        with self.lock:
+            self.counters["requests"] = self.counters.get("requests", 0) + 1
+            self.counters[name] = self.counters.get(name, 0) + 1
+            self.latency.record(latency)
+            self.bytes_sent += sent
+            self.bytes_received += received
+
+    # end record()
+
+    def sampled(self) -> bool:
+        """Whether the bodies of the current question are to be logged at INFO"""
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def summary(self) -> Dict:
+        """The totals, throughput and latency percentiles of the upload"""
+
+        with self.lock:
+            end = self.finished if self.finished is not None else time.perf_counter()
+            elapsed = end - self.started if self.started is not None else 0.0
+            created = self.counters.get("created", 0)
+            return {
+                "counters": dict(self.counters),
+                "elapsed": elapsed,
+                "throughput": created / elapsed if elapsed > 0 else 0.0,
+                "p50": self.latency.percentile(50),
+                "p95": self.latency.percentile(95),
+                "p99": self.latency.percentile(99),
+                "max": self.latency.maximum,
+                "bytes_sent": self.bytes_sent,
+                "bytes_received": self.bytes_received,
+            }
+
+    # end summary()
+
+    def log_summary(self):
+        """Logs the summary of the upload"""
+
+        if not self.enabled:
+            return
+        summary = self.summary()
+        counters = summary["counters"]
+        logger.info(
+            "%s Questions created, %s failed in %.1fs (%.1f questions/s). "
+            "%s requests, %s retries, %s throttled",
+            counters.get("created", 0), counters.get("failed", 0), summary["elapsed"],
+            summary["throughput"], counters.get("requests", 0), counters.get("retries", 0),
+            counters.get("status_429", 0) + counters.get("status_503", 0),
+        )
+        logger.info(
+            "Latency p50 %.3fs, p95 %.3fs, p99 %.3fs, max %.3fs. Sent %.1f kB, received %.1f kB",
+            summary["p50"], summary["p95"], summary["p99"], summary["max"],
+            summary["bytes_sent"] / 1e3, summary["bytes_received"] / 1e3,
+        )
+
+    # end log_summary()
+
+
+# end class UploadTelemetry
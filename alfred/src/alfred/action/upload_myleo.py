@@ -1,15 +1,18 @@
 """ Action for uploading questions """
 
 # Standard import
-from dataclasses import asdict, dataclass, field
+from dataclasses import dataclass, field
 from html import escape
-import json
+from json.encoder import encode_basestring_ascii
 import logging
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Union
 
 # Application import
+from alfred.action.base import ActionUploadBase, UploadJob
+from alfred.action.manifest import UploadManifest
+from alfred.action.serialize import STDLIB_BACKEND, JSONBackend, PayloadTemplate, RawJSON
 from alfred.net.driver.base import DriverBase
-from alfred.io.question import QuestionBank, MultipleChoiceQuestion
+from alfred.io.question import QuestionBank, MultipleChoiceQuestion, question_fingerprint
 
 logger = logging.getLogger(__name__)
 
@@ -55,36 +58,152 @@ class PayloadContent:
     choiceItems: List = field(default_factory=list)
 
 
-@dataclass
-class ChoiceItem:
-    """Choice items"""
+# The type of the questions, the same for every multiple choice question
+SELECTED_TYPE = {"name": "Multiple Choice", "value": 0, "isChecked": True}
+
+
+class PayloadSerializer:
+    """Serializes the payloads of MyLEO questions
+
+    The Payload and PayloadContent dataclasses give the fields, defaults and
+    order of the payload, and are compiled into templates once. Each choice
+    item is rendered with the fields id, answer and isCorrect. With the
+    default backend, the request body is the same as posting the filled
+    dataclasses with requests, byte for byte.
+    """
+
+    def __init__(self, dumps: JSONBackend = STDLIB_BACKEND):
+        """Constructor
+
+        Args:
+            dumps (JSONBackend): Encodes the values that are not strings
+        """
+
+        self.dumps = dumps
+        self.payload = PayloadTemplate(
+            Payload,
+            ("title", "question", "score", "content"),
+            dumps,
+            constants={"selectedType": SELECTED_TYPE},
+        )
+        self.content = PayloadTemplate(PayloadContent, ("choiceItems",), dumps)
+
+    # end __init__()
+
+    def values(self, question: MultipleChoiceQuestion) -> Dict:
+        """The fields of the payload set for a question
+
+        Returns:
+            The fields, with content rendered as JSON text already. The
+            other fields keep their defaults.
+        """
 
-    id: str = None
-    answer: str = None
-    isCorrect: bool = False
+        choice_items = []
+        for counter, (option, option_desc) in enumerate(question.options.items(), start=1):
+            choice_items.append(
+                f'{{"id": "choice_{counter}", "answer": {encode_basestring_ascii(escape(option_desc))}, '
+                f'"isCorrect": {"true" if option == question.answer else "false"}}}'
+            )
+        return {
+            "title": escape(question.title),
+            "question": escape(question.content),
+            "score": int(question.score),
+            "content": self.content.render({"choiceItems": RawJSON("[" + ", ".join(choice_items) + "]")}),
+        }
+
+    # end values()
+
+    def serialize(self, values: Dict) -> bytes:
+        """The request body of a payload"""
+        return self.payload.render(values).encode("utf-8")
+
+
+# end class PayloadSerializer
 
 
-class ActionUpload_MCQ2MyLEO:
+class ActionUpload_MCQ2MyLEO(ActionUploadBase):
     """Action class for uploading question"""
 
+    success_status = 200
+    lookup_fields = ("title", "question")
+
     def __init__(self):
         """Constructor"""
+        super().__init__()
         self.url = "https://myleo.rp.edu.sg/Quiz/QuestionBank/QuestionList"
         # self.create_api = "https://myleo.rp.edu.sg/Quiz/api/Question/CreateQuestion"
         self.create_api = "https://myleo.rp.edu.sg/industrystandard/api/v1/quiz/question/createquestion"
+        # There is no known API to list the questions of the personal bank,
+        # so a question is only posted again when it was turned away, e.g.
+        # with a 429. After a timeout or a server error it may have been
+        # created, so it is reported as failed instead of posted again.
+        self.lookup_api = None
+        self.serializer = PayloadSerializer()
 
     # end __init__()
 
-    def run(self, driver: DriverBase, bank: QuestionBank):
-        """Runs this particular action"""
+    def run(
+        self,
+        driver: DriverBase,
+        bank: Union[QuestionBank, Iterable[MultipleChoiceQuestion]],
+        manifest: Optional[UploadManifest] = None,
+        max_workers: int = 1,
+        **options,
+    ):
+        """Runs this particular action
+
+        Args:
+            driver (DriverBase): The driver for the connection to MyLEO
+            bank (QuestionBank): The question bank, or any iterable of questions
+                such as the one returned by iter_questions()
+            manifest (UploadManifest): If given, questions that are unchanged
+                since they were last uploaded are skipped, and the questions
+                created are added to it.
+            max_workers (int): Number of questions posted at the same time.
+                The results are kept in self.results in the order of the bank.
+            options: Passed on to upload(), e.g. uploader to post the
+                questions from an event loop, or dry_run to write the request
+                bodies to a file instead.
+        """
 
         logger.info("Creating questions")
-        counter = 0
-        for question in bank.questions:
-            if self.create_question(driver=driver, question=question):
-                counter += 1
-        logger.info("%s/%s Questions created", counter, len(bank.questions))
-        driver.navigate(self.url)
+        total = 0
+        skipped = 0
+        questions = bank.questions if hasattr(bank, "questions") else bank
+
+        def create_jobs():
+            nonlocal total, skipped
+            for index, question in enumerate(questions):
+                total += 1
+                fingerprint = question_fingerprint(question)
+                if manifest is not None and fingerprint in manifest:
+                    skipped += 1
+                    continue
+                logger.debug("Creating question: %s", question.title)
+                payload = self.serializer.values(question)
+                yield UploadJob(
+                    index=index,
+                    question=question,
+                    payload=payload,
+                    fingerprint=fingerprint,
+                    body=self.serializer.serialize(payload),
+                )
+
+        results = self.upload(
+            driver, create_jobs(), max_workers=max_workers, manifest=manifest, **options
+        )
+        counter = sum(result.success for result in results)
+        if skipped:
+            logger.info(
+                "%s Questions unchanged since the last upload were skipped. "
+                "Delete %s to upload them again", skipped, manifest.filename
+            )
+        if options.get("dry_run") is not None:
+            logger.info("%s request bodies written", len(results))
+        else:
+            logger.info("%s/%s Questions created", counter, total)
+        if driver is not None:
+            driver.navigate(self.url)
 
     # end run()
 
@@ -92,42 +211,11 @@ class ActionUpload_MCQ2MyLEO:
         """Creates a multiple choice question"""
 
         logger.info("Creating question: %s", question.title)
-
-        payload = Payload()
-        payload.title = escape(question.title)
-        payload.question = escape(question.content)
-        payload.selectedType = {
-            "name": "Multiple Choice",
-            "value": 0,
-            "isChecked": True,
-        }
-        payload.score = int(question.score)
-
-        counter = 1
-        payload_content = PayloadContent()
-        for option, option_desc in question.options.items():
-            item = ChoiceItem(
-                id=f"choice_{counter}",
-                answer=escape(option_desc),
-                isCorrect=option == question.answer,
-            )
-            payload_content.choiceItems.append(asdict(item))
-            counter += 1
-
-        payload.content = json.dumps(asdict(payload_content))
-
-        logger.info("Posting question: %s", asdict(payload))
-        response = driver.session.post(self.create_api, json=asdict(payload))
-        logger.info("Response %s", response)
-        logger.info(response.content)
-
-        # If response is not 200, we print out an error message
-        if response.status_code != 200:
-            logger.error('Error uploading question %s', question.title)
-            logger.error(response.content)
-            return False
-        
-        return True
+        payload = self.serializer.values(question)
+        job = UploadJob(
+            index=0, question=question, payload=payload, body=self.serializer.serialize(payload)
+        )
+        return self.post_payload(driver, job).success
 
     # end create_question()
 
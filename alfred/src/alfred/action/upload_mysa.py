@@ -1,18 +1,23 @@
 """ Action for uploading questions to RP MySA 2.0 """
 
 # Standard import
-from dataclasses import asdict, dataclass, field
+from dataclasses import dataclass, field
 from html import escape
-import json
+from json.encoder import encode_basestring_ascii
 import logging
 import pprint
 import traceback
-from typing import Dict, List
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
 
 # Application import
+from alfred.action.base import ActionUploadBase, UploadJob
+from alfred.action.manifest import UploadManifest
+from alfred.action.preflight import AssessmentIndex, PreflightReport, preflight, resolve_pages
+from alfred.action.serialize import STDLIB_BACKEND, JSONBackend, PayloadTemplate, RawJSON
+from alfred.net.driver.assessment_cache import AssessmentCache
 from alfred.net.driver.base import DriverBase
-from alfred.net.driver.mysa import parse_assessment_filter
-from alfred.io.question import QuestionBank, MultipleChoiceQuestion
+from alfred.net.driver.mysa import AssessmentData, parse_assessment_filter
+from alfred.io.question import QuestionBank, MultipleChoiceQuestion, question_fingerprint
 
 logger = logging.getLogger(__name__)
 
@@ -62,24 +67,23 @@ class PayloadContent:
     question: str = None
 
 
+# The span wrapping the text of the questions and options
+SPAN_STYLE = (
+    'data-default-style="{&quot;fontFamily&quot;:&quot;Arial&quot;,&quot;fontSize&quot;:&quot;12pt&quot;}" '
+)
+QUESTION_PREFIX = f'<span {SPAN_STYLE}style="font-family: Arial; font-size: 12pt;">'
+OPTION_PREFIX = f'<span {SPAN_STYLE}style="font-family: Arial; font-size:12pt;">'
+SPAN_SUFFIX = "</span>"
+
+
 def render_question(question: str) -> str:
     """Renders the question to be input"""
-    content = (
-        "<span "
-        'data-default-style="{&quot;fontFamily&quot;:&quot;Arial&quot;,&quot;fontSize&quot;:&quot;12pt&quot;}" '
-        f'style="font-family: Arial; font-size: 12pt;">{escape(question)}</span>'
-    )
-    return content
+    return f"{QUESTION_PREFIX}{escape(question)}{SPAN_SUFFIX}"
 
 
 def render_options(option: str) -> str:
     """Renders the option for input"""
-    content = (
-        "<span "
-        'data-default-style="{&quot;fontFamily&quot;:&quot;Arial&quot;,&quot;fontSize&quot;:&quot;12pt&quot;}" '
-        f'style="font-family: Arial; font-size:12pt;">{escape(option)}</span>'
-    )
-    return content
+    return f"{OPTION_PREFIX}{escape(option)}{SPAN_SUFFIX}"
 
 
 @dataclass
@@ -96,147 +100,356 @@ class PayloadMarkingScheme:
 # end class PayloadMarkingScheme
 
 
-class ActionUpload_MCQ2MySA:
+class PayloadSerializer:
+    """Serializes the payloads of MySA 2.0 questions
+
+    The Payload, PayloadContent and PayloadMarkingScheme dataclasses give
+    the fields, defaults and order of the payload, and are compiled into
+    templates once. With the default backend, the request body is the same
+    as posting the filled dataclasses with requests, byte for byte.
+    """
+
+    def __init__(self, dumps: JSONBackend = STDLIB_BACKEND):
+        """Constructor
+
+        Args:
+            dumps (JSONBackend): Encodes the values that are not strings
+        """
+
+        self.dumps = dumps
+        self.payload = PayloadTemplate(
+            Payload,
+            ("title", "score", "estimatedTime", "proficiencyLevel", "assessmentId",
+             "moduleCode", "content", "markingScheme"),
+            dumps,
+        )
+        self.content = PayloadTemplate(PayloadContent, ("difficultyScores", "options", "question"), dumps)
+        self.scheme = PayloadTemplate(PayloadMarkingScheme, ("correctAnswers",), dumps)
+        # The option span is encoded once. The text of each option is
+        # escaped on its own, which gives the same JSON string.
+        self.option_prefix = '{"content": "' + encode_basestring_ascii(OPTION_PREFIX)[1:-1]
+        self.option_suffix = encode_basestring_ascii(SPAN_SUFFIX)[1:-1] + '", "id": "choice_'
+
+    # end __init__()
+
+    def values(self, question: MultipleChoiceQuestion, mod_assess_pair: Tuple[str, str]) -> Dict:
+        """The fields of the payload set for a question
+
+        Returns:
+            The fields, with content and markingScheme rendered as JSON
+            text already. The other fields keep their defaults.
+        """
+
+        difficulty_scores = []
+        competency_list = []
+        if question.a_score:
+            competency_list.append("Advanced")
+            difficulty_scores.append({"displayName": "Advanced", "score": question.a_score})
+        if question.c_score:
+            competency_list.append("Competent")
+            difficulty_scores.append({"displayName": "Competent", "score": question.c_score})
+        if question.p_score:
+            competency_list.append("Proficient")
+            difficulty_scores.append({"displayName": "Proficient", "score": question.p_score})
+
+        options = []
+        answer_id = None
+        for index, (key, option) in enumerate(question.options.items()):
+            options.append(
+                f"{self.option_prefix}{encode_basestring_ascii(escape(option))[1:-1]}"
+                f"{self.option_suffix}{index}\"}}"
+            )
+            if question.answer == key:
+                answer_id = f"choice_{index}"
+
+        content = self.content.render({
+            "difficultyScores": difficulty_scores,
+            "options": RawJSON("[" + ", ".join(options) + "]"),
+            "question": render_question(question.content),
+        })
+        scheme = self.scheme.render({"correctAnswers": [{"id": answer_id}]})
+        return {
+            "title": question.title,
+            "score": int(question.score),
+            "estimatedTime": int(question.est_time_min),
+            "proficiencyLevel": ";".join(competency_list),
+            "assessmentId": mod_assess_pair[1],
+            "moduleCode": question.module,
+            "content": content,
+            "markingScheme": scheme,
+        }
+
+    # end values()
+
+    def serialize(self, values: Dict) -> bytes:
+        """The request body of a payload"""
+        return self.payload.render(values).encode("utf-8")
+
+
+# end class PayloadSerializer
+
+
+class ActionUpload_MCQ2MySA(ActionUploadBase):
     """Action to upload MCQ Question to RP MySA 2.0"""
 
+    success_status = 201
+    # Questions are looked up within their assessment
+    lookup_fields = ("title", "moduleCode", "assessmentId")
+    # It has not been confirmed that the questions API filters on these
+    # fields, so a question it does not return is left in doubt rather than
+    # posted again
+    lookup_filtered = False
+
     def __init__(self):
         """Constructor"""
+        super().__init__()
         self.url = "https://mysa.rp.edu.sg/authoring"
         self.create_api = "https://mysa.rp.edu.sg/authoring/api/questions"
+        self.lookup_api = "https://mysa.rp.edu.sg/authoring/api/questions"
         self.assessment_filter = None
+        self.assessment = None
+        self.index = None
+        self.serializer = PayloadSerializer()
+        # Repeated uploads within the TTL do not fetch the assessments again
+        self.assessment_cache = AssessmentCache()
 
     # end __init__()
 
-    def run(self, driver: DriverBase, bank: QuestionBank) -> bool:
-        """Runs this particular action"""
+    def run(
+        self,
+        driver: DriverBase,
+        bank: Union[QuestionBank, Iterable[MultipleChoiceQuestion]],
+        manifest: Optional[UploadManifest] = None,
+        max_workers: int = 1,
+        assessment_filter: Optional[Dict] = None,
+        page_size: Optional[int] = None,
+        **options,
+    ) -> bool:
+        """Runs this particular action
 
-        logger.info("Getting assessment filter")
-        self.assessment = parse_assessment_filter(driver.get_assessments_filter())
-        logger.info("Received assessment filter")
-        logger.info("%s", pprint.pformat(self.assessment.module_assessment_map))
+        Args:
+            driver (DriverBase): The driver for the connection to MySA
+            bank (QuestionBank): The question bank, or any iterable of questions
+                such as the one returned by iter_questions()
+            manifest (UploadManifest): If given, questions that are unchanged
+                since they were last uploaded are skipped, and the questions
+                created are added to it.
+            max_workers (int): Number of questions posted at the same time.
+                The results are kept in self.results in the order of the bank.
+            assessment_filter (Dict): The response of the assessment filter
+                API. If not given, the assessments of the modules in the bank
+                are retrieved with the driver, or from self.assessment_cache.
+                Given, the upload can be prepared without the driver with
+                dry_run.
+            page_size (int): If given, the assessment filter is retrieved in
+                pages of this many entries, several pages at once, and the
+                questions are posted as soon as a page resolves them.
+            options: Passed on to upload(), e.g. uploader to post the
+                questions from an event loop, or dry_run to write the request
+                bodies to a file instead.
+
+        Unlike MyLEO uploads, the bank is read into memory, even from
+        iter_questions(), as every question is checked before any is posted.
+        """
 
-        logger.info("Creating questions")
-        counter = 0
-        for question in bank.questions:
+        # The questions are kept for the pre-flight checks, so the modules
+        # are collected from them at no extra cost
+        questions = list(bank.questions if hasattr(bank, "questions") else bank)
+        # Only the modules of the bank are requested
+        module_codes = {
+            question.module for question in questions if isinstance(question.module, str)
+        }
+        username = getattr(driver, "username", None)
+        cached_modules = self.cached_modules(username, module_codes, assessment_filter)
+        paged = assessment_filter is None and page_size is not None
+        if paged:
+            # The contents are checked before anything is posted, but the
+            # assessments are resolved as the pages arrive
+            logger.info("Checking questions")
+            report = preflight(questions)
+            self.assessment = AssessmentData()
+
+            # Nothing is posted until a page with assessments has arrived,
+            # so that a filter that cannot be retrieved fails the run
+            arrived = driver.iter_assessment_data(
+                module_codes, cache=self.assessment_cache, page_size=page_size
+            )
+            received = []
             try:
-                if self.create_question(driver=driver, question=question):
-                    counter += 1
-            except ValueError as exc:
-                logger.error(traceback.format_exc())
+                for page in arrived:
+                    received.append(page)
+                    if page.module_assessment_map:
+                        break
+            except ConnectionError as exc:
                 logger.error(exc)
-        logger.info("%s/%s Questions created", counter, len(bank.questions))
+                logger.error("Unable to retrieve assessment information. Nothing uploaded")
+                return False
+
+            def pages():
+                yield from received
+                try:
+                    yield from arrived
+                except ConnectionError as exc:
+                    logger.error("%s. The questions not resolved yet are not uploaded", exc)
 
-        driver.navigate(self.url)
+            plan = resolve_pages(report, pages(), self.assessment)
+        else:
+            if assessment_filter is not None:
+                self.assessment = parse_assessment_filter(assessment_filter)
+            else:
+                logger.info("Getting assessment filter")
+                self.assessment = driver.get_assessment_data(
+                    module_codes, cache=self.assessment_cache
+                )
+            if self.assessment is None:
+                logger.error("Unable to retrieve assessment information. Nothing uploaded")
+                return False
+            self.index = AssessmentIndex(self.assessment)
+            logger.info(
+                "Received assessment filter: %s assessments",
+                len(self.assessment.module_assessment_map)
+            )
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("%s", pprint.pformat(self.assessment.module_assessment_map))
+
+            # Checks the whole bank before anything is posted
+            logger.info("Checking questions")
+            report = preflight(questions, self.index)
+
+            # Permissions granted since the modules were cached are fetched
+            # once more before the questions are given up on
+            stale = self.resolve_misses(questions, report, cached_modules)
+            if stale:
+                logger.info("Getting the assessments of %s again", ", ".join(sorted(stale)))
+                self.assessment_cache.invalidate(username, stale)
+                fresh = driver.get_assessment_data(stale, cache=self.assessment_cache)
+                if fresh is not None:
+                    self.assessment.merge(fresh)
+                    self.index = AssessmentIndex(self.assessment)
+                    report = preflight(questions, self.index)
+            report.log()
+            plan = report.plan
+
+        logger.info("Creating questions")
+        skipped = 0
+
+        def create_jobs():
+            nonlocal skipped
+            for planned in plan:
+                fingerprint = question_fingerprint(planned.question)
+                if manifest is not None and fingerprint in manifest:
+                    skipped += 1
+                    continue
+                logger.debug("Creating question: %s", planned.question.title)
+                try:
+                    payload = self.serializer.values(planned.question, planned.mod_assess_pair)
+                    body = self.serializer.serialize(payload)
+                except ValueError as exc:
+                    logger.error(traceback.format_exc())
+                    logger.error(exc)
+                    continue
+                yield UploadJob(
+                    index=planned.index,
+                    question=planned.question,
+                    payload=payload,
+                    fingerprint=fingerprint,
+                    body=body,
+                )
+
+        results = self.upload(
+            driver, create_jobs(), max_workers=max_workers, manifest=manifest, **options
+        )
+        if paged:
+            self.index = AssessmentIndex(self.assessment)
+            # The questions were posted in the order they were resolved
+            results.sort(key=lambda result: result.index)
+            # The questions are not posted again, but the next upload
+            # fetches the modules that may have changed
+            stale = self.resolve_misses(questions, report, cached_modules)
+            if stale:
+                self.assessment_cache.invalidate(username, stale)
+        counter = sum(result.success for result in results)
+        if skipped:
+            logger.info(
+                "%s Questions unchanged since the last upload were skipped. "
+                "Delete %s to upload them again", skipped, manifest.filename
+            )
+        if options.get("dry_run") is not None:
+            logger.info("%s request bodies written", len(results))
+        else:
+            logger.info("%s/%s Questions created", counter, report.total)
+
+        if driver is not None:
+            driver.navigate(self.url)
         return True
 
     # end run()
 
+    def cached_modules(
+        self, username: Optional[str], module_codes: Set[str], assessment_filter: Optional[Dict] = None
+    ) -> Set[str]:
+        """The modules whose assessments will be taken from the cache"""
+
+        if assessment_filter is not None or self.assessment_cache is None or username is None:
+            return set()
+        _, missing = self.assessment_cache.get(username, module_codes)
+        return module_codes - set(missing)
+
+    # end cached_modules()
+
+    def resolve_misses(
+        self, questions: List[MultipleChoiceQuestion], report: PreflightReport, modules: Set[str]
+    ) -> Set[str]:
+        """The modules among the given ones with questions that cannot be resolved"""
+
+        if not modules:
+            return set()
+        index = self.index or AssessmentIndex(self.assessment)
+        misses = set()
+        for issue in report.issues:
+            question = questions[issue.index]
+            if question.module not in modules or question.module in misses:
+                continue
+            try:
+                index.resolve(question)
+            except ValueError:
+                misses.add(question.module)
+        return misses
+
+    # end resolve_misses()
+
     def create_question(
-        self, driver: DriverBase, question: MultipleChoiceQuestion
+        self,
+        driver: DriverBase,
+        question: MultipleChoiceQuestion,
+        mod_assess_pair: Optional[Tuple[str, str]] = None,
     ) -> bool:
         """Creates a multiple choice question
 
         Args:
             driver (DriverBase): The driver for the connection to MySA
             question (MultipleChoiceQuestion): Instance of multiple choice questions.
+            mod_assess_pair (Tuple[str, str]): The module id and assessment id
+                from the pre-flight checks. Resolved here if not given.
 
         """
 
         logger.info("Creating question: %s", question.title)
 
-        payload = Payload()
-        payload.title = question.title
-        payload.score = int(question.score)
-        payload.estimatedTime = int(question.est_time_min)
-
-        # If the qtype is empty, and there is only one module-assessment
-        # entry, then we still add it in.
-        mod_assess_entries = self.assessment.module_assessment_map.get(
-            (question.module, question.assessment)
-        )
-        if not question.qtype:
-            if len(mod_assess_entries) == 0:
-                logger.error(
-                    'Module %s Assessment %s with correct rights cannot be found. '
-                    'Skipping question: %s',
-                    question.module, question.assessment, question.title
-                )
-                return False
-            elif len(mod_assess_entries) > 1:
-                logger.error(
-                    'Module %s Assessment %s has more than 1 entry. '
-                    'Please provide qualification type in question. '
-                    'Skipping question: %s',
-                    question.module, question.assessment, question.title
-                )
-                return False
-            else:
-                mod_assess_pair = list(mod_assess_entries.values())[0]
-        else:
-            if question.qtype not in mod_assess_entries:
-                logger.error(
-                    'Module %s Assessment %s QType %s not found. '
-                    'Skipping question: %s',
-                    question.module, question.assessment, question.qtype, question.title
-                )
+        if mod_assess_pair is None:
+            if self.index is None:
+                self.index = AssessmentIndex(self.assessment)
+            try:
+                mod_assess_pair = self.index.resolve(question)
+            except ValueError as exc:
+                logger.error('%s. Skipping question: %s', exc, question.title)
                 return False
-            else:
-                mod_assess_pair = mod_assess_entries.get(question.qtype)
 
-        payload.assessmentId = mod_assess_pair[1]
-        payload.moduleCode = question.module
-
-        # Checks the competency score
-        competency_list = []
-        competency_display_list = []
-        if question.a_score:
-            competency_list.append("Advanced")
-            competency_display_list.append(
-                {"displayName": "Advanced", "score": question.a_score}
-            )
-        if question.c_score:
-            competency_list.append("Competent")
-            competency_display_list.append(
-                {"displayName": "Competent", "score": question.c_score}
-            )
-        if question.p_score:
-            competency_list.append("Proficient")
-            competency_display_list.append(
-                {"displayName": "Proficient", "score": question.p_score}
-            )
-        payload.proficiencyLevel = ";".join(competency_list)
-
-        content = PayloadContent()
-        content.difficultyScores = competency_display_list
-        index = 0
-        answer_id = None
-        for key, option in question.options.items():
-            content.options.append(
-                {"content": render_options(option), "id": f"choice_{index}"}
-            )
-            if question.answer == key:
-                answer_id = f"choice_{index}"
-            index += 1
-        content.question = render_question(question.content)
-
-        scheme = PayloadMarkingScheme()
-        scheme.correctAnswers.append({"id": answer_id})
-
-        payload.content = json.dumps(asdict(content))
-        payload.markingScheme = json.dumps(asdict(scheme))
-
-        logger.info("Posting question: %s", asdict(payload))
-        response = driver.session.post(self.create_api, json=asdict(payload))
-        logger.info("Response %s", response)
-        logger.info(response.content)
-
-        # If response is not 200, we print out an error message
-        if response.status_code != 201:
-            logger.error('Error uploading question %s', question.title)
-            logger.error(response.content)
-            return False
-
-        return True
+        payload = self.serializer.values(question, mod_assess_pair)
+        job = UploadJob(
+            index=0, question=question, payload=payload, body=self.serializer.serialize(payload)
+        )
+        return self.post_payload(driver, job).success
 
     # end create_question()
 
@@ -0,0 +1,79 @@
+""" Writes the request bodies of a question bank without posting them
+
+The file is posted later with alfred.cli.replay, e.g. from another host.
+
+Usage:
+    python -m alfred.cli.dry_run bank.xlsx --target mysa --output upload.jsonl
+    python -m alfred.cli.dry_run bank.xlsx --target mysa --output upload.jsonl \
+        --assessment-filter filter.json
+"""
+
+# Standard imports
+import argparse
+import json
+import logging
+import sys
+from typing import List, Optional
+
+# Application imports
+from alfred.cli.replay import TARGETS, log_in
+from alfred.io.cache import BankCache
+from alfred.io.dedup import drop_duplicates
+from alfred.io.question import create_from_file
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point of the dry run command"""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("filename", help="Question bank, e.g. a workbook")
+    parser.add_argument("--sheet", default="0", help="Sheet of the workbook, by name or position")
+    parser.add_argument("--target", choices=sorted(TARGETS), required=True)
+    parser.add_argument("--output", required=True, help="JSON Lines file to write the bodies to")
+    parser.add_argument(
+        "--assessment-filter",
+        help="Response of the MySA assessment filter saved as JSON, to write the bodies "
+        "without logging in",
+    )
+    parser.add_argument("--username", help="Username, without @rp.edu.sg")
+    parser.add_argument(
+        "--headless", action="store_true", default=None, help="Log in with a browser without a window"
+    )
+    parser.add_argument(
+        "--profile", help="Chrome profile folder kept between runs, so that the log in is remembered"
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(asctime)s: %(message)s")
+    sheet_name = int(args.sheet) if args.sheet.isdigit() else args.sheet
+    bank = create_from_file(args.filename, sheet_name=sheet_name, cache=BankCache())
+    logger.info("Loaded %s questions from %s", len(bank.questions), args.filename)
+    bank = drop_duplicates(bank)
+
+    action_class, driver_class = TARGETS[args.target]
+    driver = None
+    options = {}
+    if args.target == "mysa":
+        # The assessments of the questions are resolved before the bodies
+        # are written
+        if args.assessment_filter:
+            with open(args.assessment_filter, encoding="utf-8") as file:
+                options["assessment_filter"] = json.load(file)
+        else:
+            username = args.username or input("Enter username (without @rp.edu.sg): ")
+            driver = driver_class(headless=args.headless, user_data_dir=args.profile)
+            if not log_in(driver, username):
+                return 1
+
+    if action_class().run(driver, bank, dry_run=args.output, **options) is False:
+        return 1
+    return 0
+
+
+# end main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
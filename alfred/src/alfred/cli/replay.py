@@ -0,0 +1,185 @@
+""" Posts the request bodies written by a dry run of an upload
+
+Usage:
+    python -m alfred.cli.dry_run bank.xlsx --target mysa --output upload.jsonl
+    python -m alfred.cli.replay upload.jsonl --target mysa --workers 4
+"""
+
+# Standard imports
+import argparse
+from getpass import getpass
+import json
+import logging
+import sys
+from typing import Iterator, List, Optional
+
+# Application imports
+from alfred.action.adaptive import AdaptiveConcurrency
+from alfred.action.async_upload import AsyncUploader
+from alfred.action.base import ActionUploadBase, UploadJob, UploadResult
+from alfred.action.journal import UploadJournal
+from alfred.action.upload_myleo import ActionUpload_MCQ2MyLEO
+from alfred.action.upload_mysa import ActionUpload_MCQ2MySA
+from alfred.io.question import MultipleChoiceQuestion
+from alfred.net.driver.base import DriverBase
+from alfred.net.driver.myleo import MyLeoDriver, myleo_username
+from alfred.net.driver.mysa import MySADriver
+from alfred.net.driver.session_store import SessionStore
+
+logger = logging.getLogger(__name__)
+
+# The action and driver of each target
+TARGETS = {
+    "mysa": (ActionUpload_MCQ2MySA, MySADriver),
+    "myleo": (ActionUpload_MCQ2MyLEO, MyLeoDriver),
+}
+
+
+def read_jobs(filename: str, url: Optional[str] = None) -> Iterator[UploadJob]:
+    """Reads the jobs written by a dry run, one line at a time
+
+    Args:
+        filename (str): The JSON Lines file written by the dry run
+        url (str): If given, the url the bodies must have been written for
+
+    Raises:
+        ValueError: If a body was written for another url
+    """
+
+    with open(filename, encoding="utf-8") as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if url is not None and record["url"] != url:
+                raise ValueError(
+                    f"Question {record['title']} was written for {record['url']}, not {url}"
+                )
+            yield UploadJob(
+                index=record["index"],
+                question=MultipleChoiceQuestion(title=record["title"]),
+                payload=record["fields"],
+                fingerprint=record["fingerprint"],
+                body=record["body"].encode("utf-8"),
+            )
+
+
+# end read_jobs()
+
+
+def replay(action: ActionUploadBase, driver, filename: str, **options) -> List[UploadResult]:
+    """Posts the request bodies of a dry run
+
+    Args:
+        action (ActionUploadBase): The action of the target
+        driver (DriverBase): The driver with the authenticated session
+        filename (str): The JSON Lines file written by the dry run
+        options: Passed on to action.upload(), e.g. max_workers
+
+    Returns:
+        The results, in the order of the file
+    """
+
+    results = action.upload(driver, read_jobs(filename, action.create_api), **options)
+    logger.info(
+        "%s/%s Questions created", sum(result.success for result in results), len(results)
+    )
+    return results
+
+
+# end replay()
+
+
+def log_in(driver: DriverBase, username: str) -> bool:
+    """Logs in with the session saved for the user, else asks for the password
+
+    Returns:
+        Whether the driver is logged in
+    """
+
+    # A saved session does not need the password nor the browser
+    store = SessionStore()
+    if driver.restore_session(username, store):
+        return True
+    password = getpass("Enter Password: ")
+    # The saved session was tried already
+    if not driver.connect(username=username, password=password, store=store, restore=False):
+        logger.error("Cannot log in. Perhaps incorrect username and password")
+        return False
+    return True
+
+
+# end log_in()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Entry point of the replay command"""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("filename", help="JSON Lines file written by a dry run")
+    parser.add_argument("--target", choices=sorted(TARGETS), required=True)
+    parser.add_argument("--username", help="Username, without @rp.edu.sg")
+    parser.add_argument(
+        "--workers", type=int, default=4, help="Number of questions posted at the same time to start with"
+    )
+    parser.add_argument(
+        "--max-workers", type=int, default=32, help="Most questions posted at the same time"
+    )
+    parser.add_argument(
+        "--uploader",
+        choices=("threads", "asyncio"),
+        default="threads",
+        help="Post from a pool of threads that adapts to the server, or from an event loop "
+        "with a rate limit per site, which needs aiohttp",
+    )
+    parser.add_argument(
+        "--headless", action="store_true", default=None, help="Log in with a browser without a window"
+    )
+    parser.add_argument(
+        "--profile", help="Chrome profile folder kept between runs, so that the log in is remembered"
+    )
+    parser.add_argument(
+        "--lean",
+        action="store_true",
+        default=None,
+        help="Start Chrome without images, extensions and background networking",
+    )
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(asctime)s: %(message)s")
+    username = args.username or input("Enter username (without @rp.edu.sg): ")
+
+    if args.target == "myleo":
+        # The same name as the GUI logs in with
+        username = myleo_username(username)
+
+    action_class, driver_class = TARGETS[args.target]
+    driver = driver_class(headless=args.headless, user_data_dir=args.profile, lean=args.lean)
+    if not log_in(driver, username):
+        return 1
+
+    if args.uploader == "asyncio":
+        options = {"uploader": AsyncUploader(max_in_flight=args.max_workers)}
+    else:
+        options = {
+            "concurrency": AdaptiveConcurrency(
+                initial=min(args.workers, args.max_workers), maximum=args.max_workers
+            )
+        }
+
+    # Questions created by a replay that was cut short are skipped
+    journal = UploadJournal(args.target, username=username)
+    try:
+        results = replay(
+            action_class(), driver, args.filename, journal=journal, resume=True, **options
+        )
+    finally:
+        journal.close()
+    return 0 if all(result.success for result in results) else 1
+
+
+# end main()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+""" On disk cache for parsed question banks """
+
+# Standard imports
+import hashlib
+import logging
+import os
+import pickle
+from typing import Any, Optional
+import zlib
+
+# Application imports
+from alfred.io.storage import alfred_home, atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Prefix of every cache entry, followed by the key it was stored under
+MAGIC = b"ALFRED-BANK-CACHE\n"
+
+# Size of the chunks the workbooks are read in for hashing
+CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(filename: str) -> str:
+    """Computes the sha256 hex digest of the content of a file"""
+
+    digest = hashlib.sha256()
+    with open(filename, "rb") as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+# end file_digest()
+
+
+class BankCache:
+    """Size bounded cache of parsed question banks
+
+    Entries are keyed by the content hash of the workbook together with the
+    parser version, so an edited workbook or a new parser never reads an old
+    entry. Each entry is a compressed pickle in its own file. Reading an entry
+    updates its modification time, and the least recently used entries are
+    removed once the cache grows beyond max_bytes.
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = 256 * 1024 * 1024):
+        """Constructor
+
+        Args:
+            directory (str): Folder to keep the entries in. Defaults to ~/.alfred/cache
+            max_bytes (int): The maximum total size of the entries
+        """
+        self.directory = directory or alfred_home("cache")
+        self.max_bytes = max_bytes
+
+    # end __init__()
+
+    def key(self, filename: str, *parts: Any) -> str:
+        """Creates the key for a file
+
+        Args:
+            filename (str): The file whose content is hashed
+            parts: Anything else that changes the parsed result, e.g. the
+                parser version and the sheet name
+
+        Returns:
+            The key as a hex string
+        """
+
+        digest = hashlib.sha256(file_digest(filename).encode())
+        for part in parts:
+            digest.update(b"\0")
+            digest.update(repr(part).encode())
+        return digest.hexdigest()
+
+    # end key()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.bank")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Gets an entry from the cache
+
+        Returns:
+            The cached value, or None if it is not in the cache or unreadable
+        """
+
+        path = self._path(key)
+        try:
+            with open(path, "rb") as file:
+                blob = file.read()
+        except FileNotFoundError:
+            return None
+
+        header = MAGIC + key.encode() + b"\n"
+        try:
+            if not blob.startswith(header):
+                raise ValueError("Entry does not match its key")
+            value = pickle.loads(zlib.decompress(blob[len(header):]))
+        except Exception as exc:
+            logger.warning("Removing unreadable cache entry %s: %s", path, exc)
+            self._remove(path)
+            return None
+
+        # Marks the entry as recently used
+        os.utime(path)
+        logger.info("Loaded from cache %s", path)
+        return value
+
+    # end get()
+
+    def put(self, key: str, value: Any):
+        """Adds an entry into the cache, evicting old entries if required"""
+
+        os.makedirs(self.directory, exist_ok=True)
+        blob = MAGIC + key.encode() + b"\n" + zlib.compress(
+            pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        )
+        if len(blob) > self.max_bytes:
+            logger.info("Not caching entry of %s bytes", len(blob))
+            return
+
+        atomic_write(self._path(key), blob)
+        self.evict()
+
+    # end put()
+
+    def evict(self):
+        """Removes the least recently used entries until within max_bytes"""
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".bank"):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            logger.info("Evicting cache entry %s", path)
+            self._remove(path)
+            total -= size
+
+    # end evict()
+
+    def clear(self):
+        """Removes all the entries"""
+
+        if os.path.isdir(self.directory):
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".bank"):
+                    self._remove(entry.path)
+
+    # end clear()
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# end class BankCache
@@ -0,0 +1,256 @@
+""" Memory efficient representations of the question bank """
+
+# Standard imports
+from array import array
+from collections.abc import Sequence
+from dataclasses import dataclass, field, fields
+import logging
+import math
+import sys
+from typing import Any, Dict, Iterable, List
+
+# Application imports
+from alfred.io.question import MultipleChoiceQuestion, QuestionBank
+
+logger = logging.getLogger(__name__)
+
+
+def _intern(value: Any) -> Any:
+    """Interns strings so that repeated values share a single object"""
+    return sys.intern(value) if type(value) is str else value
+
+
+def _add_slots(cls):
+    """Recreates a dataclass with __slots__ instead of a __dict__
+
+    dataclass(slots=True) is only available from python 3.10. The defaults
+    are kept by the generated __init__, so the class attributes holding them
+    can be dropped.
+    """
+
+    field_names = tuple(item.name for item in fields(cls))
+    cls_dict = dict(cls.__dict__)
+    cls_dict["__slots__"] = field_names
+    for name in field_names:
+        cls_dict.pop(name, None)
+    cls_dict.pop("__dict__", None)
+    cls_dict.pop("__weakref__", None)
+    return type(cls)(cls.__name__, cls.__bases__, cls_dict)
+
+
+# end _add_slots()
+
+
+@_add_slots
+@dataclass
+class CompactMultipleChoiceQuestion:
+    """Slotted multiple choice question
+
+    It has the same attributes as MultipleChoiceQuestion, but without a
+    per instance __dict__. The module, assessment, qualification type and
+    option labels are interned as they repeat across the whole bank.
+    """
+
+    title: str = field(default=None)
+    score: float = field(default=0)
+    est_time_min: int = field(default=0)
+    c_score: int = field(default=0)
+    p_score: int = field(default=0)
+    a_score: int = field(default=0)
+    content: str = field(default=None)
+    answer: str = field(default=None)
+    options: dict = field(default_factory=dict)
+    module: str = None  # The module code, e.g. A3079C
+    assessment: str = None  # Assessment e.g. CW1
+    qtype: str = None  # Qualification type, e.g. PFP (AY2022 Semester 2)
+
+    def __post_init__(self):
+        self.answer = _intern(self.answer)
+        self.module = _intern(self.module)
+        self.assessment = _intern(self.assessment)
+        self.qtype = _intern(self.qtype)
+        self.options = {_intern(key): value for key, value in self.options.items()}
+
+    @classmethod
+    def from_question(cls, question: MultipleChoiceQuestion) -> "CompactMultipleChoiceQuestion":
+        """Creates a compact copy of a question"""
+        return cls(
+            title=question.title,
+            score=question.score,
+            est_time_min=question.est_time_min,
+            c_score=question.c_score,
+            p_score=question.p_score,
+            a_score=question.a_score,
+            content=question.content,
+            answer=question.answer,
+            options=question.options,
+            module=question.module,
+            assessment=question.assessment,
+            qtype=question.qtype,
+        )
+
+
+# end class CompactMultipleChoiceQuestion
+
+
+def compact(bank: QuestionBank) -> QuestionBank:
+    """Creates a copy of the question bank with compact questions"""
+    return QuestionBank(
+        questions=[CompactMultipleChoiceQuestion.from_question(question) for question in bank.questions]
+    )
+
+
+# end compact()
+
+
+class _Categories:
+    """Column of repeated values, stored as codes into a list of categories"""
+
+    def __init__(self):
+        self.codes = array("l")
+        self.categories: List[Any] = []
+        self._lookup: Dict[Any, int] = {}
+
+    def append(self, value: Any):
+        # Blanks read with pandas are nan, which is kept as None like the
+        # other blanks. nan would otherwise be truthy and never equal itself.
+        if isinstance(value, float) and math.isnan(value):
+            value = None
+        code = self._lookup.get(value)
+        if code is None:
+            code = len(self.categories)
+            self._lookup[value] = code
+            self.categories.append(value)
+        self.codes.append(code)
+
+    def __getitem__(self, index: int) -> Any:
+        return self.categories[self.codes[index]]
+
+
+# end class _Categories
+
+
+class _QuestionView(Sequence):
+    """Read only sequence of the questions in a ColumnarQuestionBank"""
+
+    def __init__(self, bank: "ColumnarQuestionBank"):
+        self.bank = bank
+
+    def __len__(self) -> int:
+        return len(self.bank)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.bank.question(position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("question index out of range")
+        return self.bank.question(index)
+
+
+# end class _QuestionView
+
+
+class ColumnarQuestionBank:
+    """Question bank that keeps each field of the questions in its own column
+
+    Numbers are kept in typed arrays, repeated strings as codes into a list
+    of categories, and the options of every question in flat columns with
+    an offset per question. The questions attribute gives a read only
+    sequence of CompactMultipleChoiceQuestion built on access, so code that
+    iterates over bank.questions works unchanged.
+
+    Blank numbers are stored as nan and blank strings as None, and both are
+    read back as None, as in the original questions.
+    """
+
+    def __init__(self, questions: Iterable[MultipleChoiceQuestion] = ()):
+        """Constructor
+
+        Args:
+            questions (Iterable[MultipleChoiceQuestion]): The initial questions
+        """
+        self.titles: List[str] = []
+        self.contents: List[str] = []
+        self.answers = _Categories()
+        self.scores = array("d")
+        self.est_times = array("d")
+        self.c_scores = array("d")
+        self.p_scores = array("d")
+        self.a_scores = array("d")
+        self.modules = _Categories()
+        self.assessments = _Categories()
+        self.qtypes = _Categories()
+        self.option_offsets = array("q", [0])
+        self.option_keys = _Categories()
+        self.option_values: List[str] = []
+        for question in questions:
+            self.append(question)
+
+    # end __init__()
+
+    @staticmethod
+    def _number(value: Any) -> float:
+        return float("nan") if value is None else float(value)
+
+    @staticmethod
+    def _optional(value: float) -> Any:
+        return None if math.isnan(value) else value
+
+    def append(self, question: MultipleChoiceQuestion):
+        """Adds a question to the end of the bank"""
+
+        self.titles.append(question.title)
+        self.contents.append(question.content)
+        self.answers.append(question.answer)
+        self.scores.append(self._number(question.score))
+        self.est_times.append(self._number(question.est_time_min))
+        self.c_scores.append(self._number(question.c_score))
+        self.p_scores.append(self._number(question.p_score))
+        self.a_scores.append(self._number(question.a_score))
+        self.modules.append(question.module)
+        self.assessments.append(question.assessment)
+        self.qtypes.append(question.qtype)
+        for key, value in question.options.items():
+            self.option_keys.append(key)
+            self.option_values.append(value)
+        self.option_offsets.append(len(self.option_values))
+
+    # end append()
+
+    def __len__(self) -> int:
+        return len(self.titles)
+
+    def question(self, index: int) -> CompactMultipleChoiceQuestion:
+        """Builds the question at a position"""
+
+        start = self.option_offsets[index]
+        end = self.option_offsets[index + 1]
+        return CompactMultipleChoiceQuestion(
+            title=self.titles[index],
+            score=self._optional(self.scores[index]),
+            est_time_min=self._optional(self.est_times[index]),
+            c_score=self._optional(self.c_scores[index]),
+            p_score=self._optional(self.p_scores[index]),
+            a_score=self._optional(self.a_scores[index]),
+            content=self.contents[index],
+            answer=self.answers[index],
+            options={
+                self.option_keys[position]: self.option_values[position]
+                for position in range(start, end)
+            },
+            module=self.modules[index],
+            assessment=self.assessments[index],
+            qtype=self.qtypes[index],
+        )
+
+    # end question()
+
+    @property
+    def questions(self) -> Sequence:
+        """The questions in the bank"""
+        return _QuestionView(self)
+
+
+# end class ColumnarQuestionBank
@@ -0,0 +1,273 @@
+""" Detection of duplicated questions in a question bank """
+
+# Standard imports
+from dataclasses import dataclass, field
+import logging
+from typing import Dict, List, Sequence, Tuple
+
+# Application imports
+from alfred.io.question import MultipleChoiceQuestion, QuestionBank
+
+logger = logging.getLogger(__name__)
+
+# MinHash parameters. The signature of each question has NUM_PERMUTATIONS
+# values, split into NUM_BANDS bands for the locality sensitive hashing.
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 32
+NUM_BANDS = 8
+
+
+def normalize_text(text) -> str:
+    """Normalizes text so that whitespace and case differences are ignored"""
+    if type(text) is not str:
+        text = str(text)
+    return " ".join(text.split()).casefold()
+
+
+def _target(question: MultipleChoiceQuestion) -> Tuple:
+    """Questions uploaded to different assessments are never duplicates"""
+    return (question.module, question.assessment, question.qtype)
+
+
+def question_key(question: MultipleChoiceQuestion) -> Tuple:
+    """The normalized content of a question, used to find exact duplicates
+
+    The title is left out, as each author numbers their questions
+    differently, and the options are sorted so that their order does not
+    matter. The text of the answer is kept, so that the same question with a
+    different answer is not taken as a duplicate.
+    """
+
+    options = tuple(sorted(map(normalize_text, question.options.values())))
+    answer = normalize_text(question.options.get(question.answer, question.answer))
+    return _target(question) + (normalize_text(question.content), options, answer)
+
+
+# end question_key()
+
+
+@dataclass
+class DuplicateReport:
+    """Groups of questions that are duplicates of each other
+
+    Each group holds the positions of the questions in the bank. The first
+    question of a group is kept and the rest are duplicates.
+    """
+
+    total: int = 0
+    groups: List[List[int]] = field(default_factory=list)
+
+    @property
+    def duplicates(self) -> List[int]:
+        """Positions of the questions to drop"""
+        return sorted(position for group in self.groups for position in group[1:])
+
+    def log(self, questions: Sequence[MultipleChoiceQuestion]):
+        """Logs each group of duplicates"""
+
+        for group in self.groups:
+            logger.warning(
+                "Question %s is duplicated by %s",
+                questions[group[0]].title,
+                ", ".join(str(questions[position].title) for position in group[1:]),
+            )
+        logger.info("%s/%s Questions are duplicates", len(self.duplicates), self.total)
+
+
+# end class DuplicateReport
+
+
+class _DisjointSet:
+    """Union find over the positions of the questions"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, position: int) -> int:
+        while self.parent[position] != position:
+            self.parent[position] = self.parent[self.parent[position]]
+            position = self.parent[position]
+        return position
+
+    def union(self, first: int, second: int):
+        first, second = self.find(first), self.find(second)
+        # The earliest question is the root so that it is the one kept
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+
+
+# end class _DisjointSet
+
+
+def _minhash_signatures(texts: List[str], seed: int = 0):
+    """Computes the MinHash signature of every text at once
+
+    The texts are laid out in one flat byte array. The character shingles
+    of every text are hashed together with a rolling hash, and each
+    permutation, h -> a * h + b modulo 2**32 for an odd a, is applied to
+    the whole bank with a single numpy call.
+
+    Returns:
+        Array of shape (len(texts), NUM_PERMUTATIONS)
+    """
+
+    import numpy as np
+
+    # Pads short texts so that each has at least one shingle
+    encoded = [text.encode("utf-8").ljust(SHINGLE_SIZE) for text in texts]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8).astype(np.uint32)
+
+    # Rolling hash of the shingle starting at every position
+    num_positions = len(data) - SHINGLE_SIZE + 1
+    hashes = np.zeros(num_positions, dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        for offset in range(SHINGLE_SIZE):
+            hashes = hashes * np.uint32(16777619) ^ data[offset:offset + num_positions]
+
+    # Drops the shingles that run over into the next text
+    ends = np.cumsum(lengths)
+    overlapping = (ends[:, None] - np.arange(1, SHINGLE_SIZE)[None, :]).ravel()
+    valid = np.ones(num_positions, dtype=bool)
+    valid[overlapping[overlapping < num_positions]] = False
+    hashes = hashes[valid]
+    offsets = ends - lengths - np.arange(len(texts)) * (SHINGLE_SIZE - 1)
+
+    generator = np.random.default_rng(seed)
+    coefficients = generator.integers(0, 2 ** 32, size=(NUM_PERMUTATIONS, 2), dtype=np.uint32)
+    signatures = np.empty((len(texts), NUM_PERMUTATIONS), dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        for permutation, (multiplier, increment) in enumerate(coefficients):
+            permuted = hashes * (multiplier | np.uint32(1)) + increment
+            signatures[:, permutation] = np.minimum.reduceat(permuted, offsets)
+    return signatures
+
+
+# end _minhash_signatures()
+
+
+def _candidate_pairs(signatures, targets: List[Tuple], threshold: float) -> List[Tuple[int, int]]:
+    """Finds the pairs of questions whose signatures are similar
+
+    The signatures are split into bands and questions for the same target
+    that share a band land in the same bucket. Each question in a bucket is
+    only compared with the first question of the bucket.
+
+    Returns:
+        The pairs of positions with an estimated similarity above threshold
+    """
+
+    import numpy as np
+
+    target_codes: Dict[Tuple, int] = {}
+    codes = np.array(
+        [target_codes.setdefault(target, len(target_codes)) for target in targets],
+        dtype=np.uint32,
+    )
+    rows = NUM_PERMUTATIONS // NUM_BANDS
+    pairs = []
+    with np.errstate(over="ignore"):
+        for band in range(NUM_BANDS):
+            # Combines the values of the band and the target into one hash
+            bucket = codes.astype(np.uint64)
+            for column in range(band * rows, (band + 1) * rows):
+                bucket = bucket * np.uint64(1000003) ^ signatures[:, column]
+            order = np.argsort(bucket, kind="stable")
+            sorted_bucket = bucket[order]
+            is_first = np.concatenate(([True], sorted_bucket[1:] != sorted_bucket[:-1]))
+            first = order[np.flatnonzero(is_first)[np.cumsum(is_first) - 1]]
+            members = ~is_first
+            pairs.append(np.stack([first[members], order[members]], axis=1))
+
+    # Each pair is encoded as one number so that duplicates are quick to remove
+    pairs = np.concatenate(pairs).astype(np.int64)
+    encoded = np.unique(pairs[:, 0] * len(targets) + pairs[:, 1])
+    if not len(encoded):
+        return []
+    pairs = np.stack([encoded // len(targets), encoded % len(targets)], axis=1)
+    # Buckets can collide, so the targets are checked again
+    same_target = codes[pairs[:, 0]] == codes[pairs[:, 1]]
+    similarity = (signatures[pairs[:, 0]] == signatures[pairs[:, 1]]).mean(axis=1)
+    return [tuple(pair) for pair in pairs[same_target & (similarity >= threshold)].tolist()]
+
+
+# end _candidate_pairs()
+
+
+def find_duplicates(
+    questions: Sequence[MultipleChoiceQuestion],
+    near: bool = False,
+    threshold: float = 0.8,
+) -> DuplicateReport:
+    """Finds the duplicated questions
+
+    Exact duplicates, ignoring whitespace and case, are found with a hash
+    index of the normalized questions. If near is set, near duplicates are
+    also found with MinHash signatures of the character shingles, bucketed with
+    locality sensitive hashing so that only candidates in the same bucket
+    are compared.
+
+    Args:
+        questions (Sequence[MultipleChoiceQuestion]): The questions to check
+        near (bool): Whether to look for near duplicates as well
+        threshold (float): Estimated Jaccard similarity above which two
+            questions are near duplicates
+
+    Returns:
+        The report of the duplicates found
+    """
+
+    keys = [question_key(question) for question in questions]
+    disjoint_set = _DisjointSet(len(questions))
+    first_seen: Dict[Tuple, int] = {}
+    for position, key in enumerate(keys):
+        if key in first_seen:
+            disjoint_set.union(first_seen[key], position)
+        else:
+            first_seen[key] = position
+
+    if near and questions:
+        # Near duplicates are compared on the normalized content, options and answer
+        signatures = _minhash_signatures(
+            [" ".join([content, *options, answer]) for *_, content, options, answer in keys]
+        )
+        # Questions with different answers are never near duplicates either
+        targets = [key[:3] + (key[5],) for key in keys]
+        for first, second in _candidate_pairs(signatures, targets, threshold):
+            disjoint_set.union(first, second)
+
+    groups: Dict[int, List[int]] = {}
+    for position in range(len(questions)):
+        groups.setdefault(disjoint_set.find(position), []).append(position)
+    return DuplicateReport(
+        total=len(questions),
+        groups=[group for group in groups.values() if len(group) > 1],
+    )
+
+
+# end find_duplicates()
+
+
+def drop_duplicates(bank: QuestionBank, near: bool = False, threshold: float = 0.8) -> QuestionBank:
+    """Creates a question bank without the duplicated questions
+
+    Args:
+        bank (QuestionBank): The question bank
+        near (bool): Whether to drop near duplicates as well
+        threshold (float): Estimated Jaccard similarity above which two
+            questions are near duplicates
+
+    Returns:
+        A question bank keeping the first of each group of duplicates
+    """
+
+    questions = list(bank.questions)
+    report = find_duplicates(questions, near=near, threshold=threshold)
+    report.log(questions)
+    duplicates = set(report.duplicates)
+    return QuestionBank(
+        questions=[question for position, question in enumerate(questions) if position not in duplicates]
+    )
+
+
+# end drop_duplicates()
@@ -1,18 +1,55 @@
 # Standard imports
+from concurrent.futures import ProcessPoolExecutor
+import csv
 from dataclasses import dataclass, field
 from enum import Enum
+import hashlib
+import json
 import logging
-from typing import List
+import math
+import os
+from typing import (
+    TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+)
 
 # Third party imports
-import pandas as pd
-import numpy as np
-import openpyxl
+# pandas, numpy, openpyxl and pyarrow are only imported by the readers that
+# need them, so the csv and json lines readers work without them.
+if TYPE_CHECKING:
+    import pandas as pd
 
 # Application imports
+from alfred.io.cache import BankCache
 
 logger = logging.getLogger(__name__)
 
+# Version of the parsed representation. This is part of the key of the
+# cached question banks, so it must be bumped whenever the parsing or the
+# question classes change.
+PARSER_VERSION = 1
+
+# The columns of a question bank, in the order they are written
+COLUMNS = (
+    "Title",
+    "Question",
+    "Score",
+    "Ans",
+    "Est.time (min)",
+    "C marks",
+    "P marks",
+    "A marks",
+    "Module Code",
+    "Assessment Type",
+    "Qualification Type",
+)
+
+# Columns that are converted to numbers when read from text
+NUMERIC_COLUMNS = ("Score", "Est.time (min)")
+
+# Extensions of the files that question banks can be read from
+WORKBOOK_EXTENSIONS = (".xlsx", ".xls")
+EXTENSIONS = WORKBOOK_EXTENSIONS + (".csv", ".jsonl", ".parquet")
+
 
 @dataclass
 class Question:
@@ -51,94 +88,536 @@ class QuestionBank:
     questions: List[Question] = field(default_factory=list)
 
 
+def _canonical(value: Any) -> Any:
+    """Normalizes a value so that it hashes the same whichever reader produced it"""
+
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return None if math.isnan(value) else float(value)
+    if _is_blank(value):
+        return None
+    return value if isinstance(value, str) else str(value)
+
+
+# end _canonical()
+
+
+def question_fingerprint(question: MultipleChoiceQuestion) -> str:
+    """Computes a fingerprint of the content of a question
+
+    Two questions have the same fingerprint when everything that is uploaded
+    for them is the same, i.e. the title, content, options, answer, scores,
+    estimated time, module, assessment and qualification type.
+
+    Returns:
+        The sha256 hex digest of the question
+    """
+
+    values = [
+        question.title,
+        question.content,
+        [[_canonical(key), _canonical(value)] for key, value in question.options.items()],
+        question.answer,
+        question.score,
+        question.est_time_min,
+        question.c_score,
+        question.p_score,
+        question.a_score,
+        question.module,
+        question.assessment,
+        question.qtype,
+    ]
+    canonical = [value if isinstance(value, list) else _canonical(value) for value in values]
+    return hashlib.sha256(json.dumps(canonical).encode("utf-8")).hexdigest()
+
+
+# end question_fingerprint()
+
+
 class ParseState(Enum):
     NOT_QUESTION = "NOT_QUESTION"
     QUESTION = "QUESTION"
     CHOICE = "CHOICE"
 
 
-def create_from_file(filename: str) -> QuestionBank:
+def create_from_file(
+    filename: str,
+    sheet_name: Union[int, str] = 0,
+    cache: Optional[BankCache] = None,
+) -> QuestionBank:
     """Creates a question bank from file
 
+    Besides excel workbooks, question banks can be read from .csv and .jsonl
+    files using the same columns, which are parsed without pandas, and from
+    .parquet files, which are parsed column-wise.
+
     Args:
         filename (str): The filename of the excel spreadsheet
+        sheet_name (int | str): The sheet to read, either by name or by
+            position. Defaults to the first sheet. Only used for workbooks.
+        cache (BankCache): If given, the parsed question bank is looked up
+            in and saved to this cache.
+
+    Returns:
+        A parsed question bank containing all the questions.
+    """
+
+    if cache is not None:
+        key = cache.key(filename, PARSER_VERSION, sheet_name)
+        question_bank = cache.get(key)
+        if question_bank is not None:
+            return question_bank
+
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in (".csv", ".jsonl"):
+        question_bank = QuestionBank(questions=list(iter_questions(filename)))
+    elif extension == ".parquet":
+        import pandas as pd
+
+        question_bank = parse_dataframe(pd.read_parquet(filename))
+    else:
+        import pandas as pd
+
+        # Opens up the file
+        # We read everything in the sheet
+        # into a dataframe first
+        data = pd.read_excel(filename, sheet_name=sheet_name)
+        question_bank = parse_dataframe(data)
+
+    if cache is not None:
+        cache.put(key, question_bank)
+    return question_bank
+
+
+# end create_from_file()
+
+
+def _carry_forward(column: "pd.Series") -> List:
+    """Forward fills a column, leaving leading blanks as None"""
+    filled = column.ffill()
+    return filled.astype(object).where(filled.notna(), None).tolist()
+
+
+# end _carry_forward()
+
+
+def parse_dataframe(data: "pd.DataFrame") -> QuestionBank:
+    """Parses a dataframe of the question spreadsheet into a question bank
+
+    Rather than stepping through the rows one at a time, each row is
+    classified as a QUESTION, CHOICE or NOT_QUESTION row using boolean masks
+    over the columns. The carried over fields (module, assessment and
+    qualification type) are forward filled over the question rows only, and
+    every choice row is assigned to the question above it in a single pass.
+
+    Args:
+        data (pd.DataFrame): The contents of the spreadsheet
 
     Returns:
         A parsed question bank containing all the questions.
     """
 
-    # Opens up the file
-    # We assume that the question is in the first
-    # spread sheet and we read everything
-    # into a dataframe first
-    data = pd.read_excel(filename)
+    import numpy as np
+    import pandas as pd
 
     # Update column names if just A, P, C are found
     # as they should be 'A marks', 'P marks', 'C marks'
     if 'A' in data.columns and 'A marks' not in data.columns:
-        data.rename(columns={"A": "A marks"}, inplace=True)
+        data = data.rename(columns={"A": "A marks"})
     if 'P' in data.columns and 'P marks' not in data.columns:
-        data.rename(columns={"P": "P marks"}, inplace=True)
+        data = data.rename(columns={"P": "P marks"})
     if 'C' in data.columns and 'C marks' not in data.columns:
-        data.rename(columns={"C": "C marks"}, inplace=True)
+        data = data.rename(columns={"C": "C marks"})
 
     logger.info("Creating new question bank")
     question_bank = QuestionBank()
-    question = None
 
-    curr_state = ParseState.NOT_QUESTION
-    curr_module = None
-    curr_assessment = None
-    curr_qtype = None
-    for index, row in data.iterrows():
+    # Determines the state of every row at once
+    has_question = data["Question"].notna().to_numpy()
+    has_score = data["Score"].notna().to_numpy()
+    question_mask = has_question & has_score
+    choice_mask = has_question & ~has_score
+
+    questions = data[question_mask]
+    titles = questions["Title"].tolist()
+    contents = questions["Question"].tolist()
+    scores = questions["Score"].tolist()
+    answers = questions["Ans"].tolist()
+    est_times = questions["Est.time (min)"].tolist()
+    competency = {}
+    for column in ("A marks", "C marks", "P marks"):
+        competency[column] = [
+            float(value) if notnull else 0
+            for value, notnull in zip(
+                questions[column].tolist(), questions[column].notna().tolist()
+            )
+        ]
+
+    # Module, assessment and qualification type carry over from the
+    # previous question when they are left blank
+    carried = {}
+    for column in ("Module Code", "Assessment Type", "Qualification Type"):
+        if column in data:
+            carried[column] = _carry_forward(questions[column])
+        else:
+            carried[column] = [None] * len(questions)
+
+    for index in range(len(questions)):
+        question = MultipleChoiceQuestion()
+        question.title = titles[index]
+        question.content = contents[index]
+        question.score = scores[index]
+        question.answer = answers[index]
+        question.est_time_min = est_times[index]
+        question.a_score = competency["A marks"][index]
+        question.c_score = competency["C marks"][index]
+        question.p_score = competency["P marks"][index]
+        question.module = carried["Module Code"][index]
+        question.assessment = carried["Assessment Type"][index]
+        question.qtype = carried["Qualification Type"][index]
+        question_bank.questions.append(question)
+
+    # Each choice row belongs to the closest question row above it, unless
+    # a NOT_QUESTION row sits in between. Question rows mark their own
+    # position, NOT_QUESTION rows mark -1 and choice rows inherit the mark.
+    question_index = np.cumsum(question_mask) - 1
+    owner = pd.Series(
+        np.where(question_mask, question_index, np.where(choice_mask, np.nan, -1))
+    )
+    owner = owner.ffill().fillna(-1).astype(np.int64).to_numpy()
+
+    choices = data[choice_mask]
+    for owner_index, title, content in zip(
+        owner[choice_mask].tolist(),
+        choices["Title"].tolist(),
+        choices["Question"].tolist(),
+    ):
+        if owner_index < 0:
+            logger.warning("Skipping choice %s without a question", title)
+            continue
+        question_bank.questions[owner_index].options[title] = str(content)
+
+    return question_bank
+
+# end parse_dataframe()
+
+
+def _is_blank(value: Any) -> bool:
+    """Checks if a cell value should be treated as empty"""
+    return value is None or (isinstance(value, float) and math.isnan(value))
+
+
+# end _is_blank()
+
+
+def _column_index(header: Sequence) -> Dict[str, int]:
+    """Maps the column names of the header row to their positions
+
+    The A, P and C columns are renamed to 'A marks', 'P marks' and
+    'C marks' in the same way as for the dataframe.
+    """
+
+    columns = {}
+    for position, name in enumerate(header):
+        if name is not None and name not in columns:
+            columns[name] = position
+    for short_name in ("A", "P", "C"):
+        if short_name in columns and f"{short_name} marks" not in columns:
+            columns[f"{short_name} marks"] = columns.pop(short_name)
+    return columns
+
+
+# end _column_index()
+
+
+def iter_rows(header: Sequence, rows: Iterable[Sequence]) -> Iterator[MultipleChoiceQuestion]:
+    """Parses the rows of a question sheet one row at a time
+
+    A question is only yielded once the row after its last choice has been
+    read, so only the question being parsed is held in memory.
+
+    Args:
+        header (Sequence): The column names
+        rows (Iterable[Sequence]): The cell values of the remaining rows
+
+    Returns:
+        An iterator over the parsed questions.
+    """
+
+    columns = _column_index(header)
+
+    def cell(row: Sequence, name: str) -> Any:
+        position = columns[name]
+        return row[position] if position < len(row) else None
+
+    question = None
+    carried = {"Module Code": None, "Assessment Type": None, "Qualification Type": None}
+    for row in rows:
 
         # Determines the current state.
-        if pd.notnull(row.Question):
-            if pd.notnull(row.Score):
+        if not _is_blank(cell(row, "Question")):
+            if not _is_blank(cell(row, "Score")):
                 curr_state = ParseState.QUESTION
             else:
                 curr_state = ParseState.CHOICE
         else:
             curr_state = ParseState.NOT_QUESTION
 
-        logger.debug("Current state %s", curr_state)
-        # Parses the line depending on the curr state
         if curr_state == ParseState.QUESTION:
+            if question is not None:
+                yield question
             question = MultipleChoiceQuestion()
-            question_bank.questions.append(question)
-            question.title = row.Title
-            question.content = row.Question
-            question.score = row.Score
-            question.answer = row.Ans
-            question.est_time_min = row["Est.time (min)"]
-            question.a_score = float(row["A marks"]) if not pd.isna(row["A marks"]) else 0
-            question.c_score = float(row["C marks"]) if not pd.isna(row["C marks"]) else 0
-            question.p_score = float(row["P marks"]) if not pd.isna(row["P marks"]) else 0
-
-            if "Module Code" in data:
-                if row["Module Code"] is not np.nan:
-                    question.module = row["Module Code"]
-                    curr_module = question.module
-                else:
-                    question.module = curr_module
-            if "Assessment Type" in data:
-                if row["Assessment Type"] is not np.nan:
-                    question.assessment = row["Assessment Type"]
-                    curr_assessment = question.assessment
-                else:
-                    question.assessment = curr_assessment
-            if "Qualification Type" in data:
-                if row["Qualification Type"] is not np.nan:
-                    question.qtype = row["Qualification Type"]
-                    curr_qtype = question.qtype
-                else:
-                    question.qtype = curr_qtype
+            question.title = cell(row, "Title")
+            question.content = cell(row, "Question")
+            question.score = cell(row, "Score")
+            question.answer = cell(row, "Ans")
+            question.est_time_min = cell(row, "Est.time (min)")
+            a_marks = cell(row, "A marks")
+            c_marks = cell(row, "C marks")
+            p_marks = cell(row, "P marks")
+            question.a_score = float(a_marks) if not _is_blank(a_marks) else 0
+            question.c_score = float(c_marks) if not _is_blank(c_marks) else 0
+            question.p_score = float(p_marks) if not _is_blank(p_marks) else 0
+            for name in carried:
+                if name in columns:
+                    value = cell(row, name)
+                    if not _is_blank(value):
+                        carried[name] = value
+            question.module = carried["Module Code"]
+            question.assessment = carried["Assessment Type"]
+            question.qtype = carried["Qualification Type"]
         elif curr_state == ParseState.CHOICE:
-            question.options[row.Title] = str(row.Question)
-        else:
+            if question is None:
+                logger.warning("Skipping choice %s without a question", cell(row, "Title"))
+                continue
+            question.options[cell(row, "Title")] = str(cell(row, "Question"))
+        elif question is not None:
+            yield question
             question = None
 
+    if question is not None:
+        yield question
+
+
+# end iter_rows()
+
+
+def _to_number(value: Optional[str]) -> Any:
+    """Converts text into a float, keeping text that is not a number as is"""
+
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+# end _to_number()
+
+
+def _iter_csv_rows(filename: str) -> Iterator[Sequence]:
+    """Reads the header and rows of a csv file, with blank cells as None"""
+
+    # utf-8-sig drops the byte order mark that excel writes to csv files
+    with open(filename, newline="", encoding="utf-8-sig") as file:
+        reader = csv.reader(file)
+        header = next(reader, [])
+        yield header
+        numeric = [name in NUMERIC_COLUMNS for name in header]
+        for row in reader:
+            yield [
+                None if value == "" else _to_number(value) if is_numeric else value
+                for value, is_numeric in zip(row, numeric)
+            ]
+
+
+# end _iter_csv_rows()
+
+
+def _record_to_row(record: Dict) -> Sequence:
+    """Orders the values of a record by COLUMNS"""
+
+    row = []
+    for name in COLUMNS:
+        if name in record:
+            row.append(record[name])
+        elif name.endswith(" marks"):
+            # Also accepts the short names A, P and C
+            row.append(record.get(name[0]))
+        else:
+            row.append(None)
+    return row
+
+
+# end _record_to_row()
+
+
+def _iter_jsonl_rows(filename: str) -> Iterator[Sequence]:
+    """Reads the header and rows of a json lines file
+
+    Every line is a json object keyed by the column names, and blank rows
+    between questions are written as empty objects.
+    """
+
+    yield COLUMNS
+    with open(filename, encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield _record_to_row(json.loads(line))
+
+
+# end _iter_jsonl_rows()
+
+
+def _iter_parquet_rows(filename: str) -> Iterator[Sequence]:
+    """Reads the header and rows of a parquet file one batch at a time"""
+
+    import pyarrow.parquet as pq
+
+    yield COLUMNS
+    parquet_file = pq.ParquetFile(filename)
+    for batch in parquet_file.iter_batches():
+        for record in batch.to_pylist():
+            yield _record_to_row(record)
+
+
+# end _iter_parquet_rows()
+
+
+def _iter_xlsx_rows(filename: str) -> Iterator[Sequence]:
+    """Reads the header and rows of the first sheet of a workbook"""
+
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+# end _iter_xlsx_rows()
+
+
+def iter_questions(filename: str) -> Iterator[MultipleChoiceQuestion]:
+    """Reads the questions from file one at a time
+
+    The file is read one row at a time instead of being loaded at once,
+    which keeps the memory use flat regardless of the size of the question
+    bank. Workbooks are opened in read only mode, and .csv, .jsonl and
+    .parquet files are supported as well.
+
+    Args:
+        filename (str): The filename of the question bank
+
+    Returns:
+        An iterator over the questions in the first sheet.
+    """
+
+    readers = {
+        ".csv": _iter_csv_rows,
+        ".jsonl": _iter_jsonl_rows,
+        ".parquet": _iter_parquet_rows,
+    }
+    extension = os.path.splitext(filename)[1].lower()
+    rows = readers.get(extension, _iter_xlsx_rows)(filename)
+    try:
+        header = next(rows, ())
+        yield from iter_rows(header, rows)
+    finally:
+        rows.close()
+
+
+# end iter_questions()
+
+
+def list_sheets(filename: str) -> List[str]:
+    """Lists the names of the sheets in a workbook"""
+
+    if filename.lower().endswith(".xls"):
+        # openpyxl cannot read the old format, which pandas reads with xlrd
+        import pandas as pd
+
+        with pd.ExcelFile(filename) as workbook:
+            return list(workbook.sheet_names)
+
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(filename, read_only=True)
+    try:
+        return list(workbook.sheetnames)
+    finally:
+        workbook.close()
+
+
+# end list_sheets()
+
+
+def _expand_filenames(filenames: Iterable[str]) -> List[str]:
+    """Expands folders into the question banks they contain, sorted by name"""
+
+    expanded = []
+    for filename in filenames:
+        if os.path.isdir(filename):
+            for name in sorted(os.listdir(filename)):
+                # Skips the lock files that excel leaves behind for open workbooks
+                if name.lower().endswith(EXTENSIONS) and not name.startswith("~$"):
+                    expanded.append(os.path.join(filename, name))
+        else:
+            expanded.append(filename)
+    return expanded
+
+
+# end _expand_filenames()
+
+
+def create_from_files(
+    filenames: Iterable[str],
+    all_sheets: bool = False,
+    max_workers: Optional[int] = None,
+) -> QuestionBank:
+    """Creates a single question bank from several workbooks
+
+    Every sheet is parsed on its own in a process pool, so the module and
+    assessment carried over between questions never leak from one sheet
+    into the next. The questions are merged in the order of the files
+    given, folders sorted by filename, and the sheets within each workbook.
+
+    Args:
+        filenames (Iterable[str]): Question banks, or folders of them, to read
+        all_sheets (bool): Reads every sheet of the workbooks instead of only
+            the first one
+        max_workers (int): Number of processes. Defaults to the number of cores.
+
+    Returns:
+        A question bank containing the questions from all the sheets.
+    """
+
+    sources = []
+    for filename in _expand_filenames(filenames):
+        if all_sheets and filename.lower().endswith(WORKBOOK_EXTENSIONS):
+            sheet_names = list_sheets(filename)
+        else:
+            sheet_names = [0]
+        sources.extend((filename, sheet_name) for sheet_name in sheet_names)
+    logger.info("Reading %s sheets", len(sources))
+
+    question_bank = QuestionBank()
+    if len(sources) <= 1 or max_workers == 1:
+        for filename, sheet_name in sources:
+            question_bank.questions.extend(create_from_file(filename, sheet_name).questions)
+        return question_bank
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        # map() returns the results in the order of the sources
+        banks = executor.map(
+            create_from_file,
+            [filename for filename, _ in sources],
+            [sheet_name for _, sheet_name in sources],
+        )
+        for bank in banks:
+            question_bank.questions.extend(bank.questions)
     return question_bank
 
 
-# end create_from_file()
+# end create_from_files()
@@ -0,0 +1,47 @@
+""" Files that alfred keeps between runs, under the home directory """
+
+# Standard imports
+import hashlib
+import os
+from pathlib import Path
+import tempfile
+from typing import Union
+
+
+def alfred_home(*parts: str) -> str:
+    """A location under ~/.alfred, e.g. alfred_home("cache")"""
+    return os.path.join(Path.home(), ".alfred", *parts)
+
+
+def user_digest(username: str) -> str:
+    """Stands for a user in the names of files, so that the username is not on disk"""
+    return hashlib.sha256(username.strip().lower().encode("utf-8")).hexdigest()[:16]
+
+
+def atomic_write(path: str, data: Union[bytes, str]):
+    """Writes a file, so that it is never read partially written
+
+    The data is written to a temporary file in the same folder, which then
+    replaces the file. The temporary file, and so the file written, can only
+    be read by the user. The folder is created if needed.
+
+    Args:
+        path (str): The file to write
+        data (bytes or str): The content. Text is encoded in UTF-8.
+    """
+
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+# end atomic_write()
@@ -0,0 +1,144 @@
+""" On disk cache of the assessments each user can author questions for """
+
+# Standard imports
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Application imports
+from alfred.io.storage import alfred_home, atomic_write
+from alfred.net.driver.mysa import AssessmentData
+
+logger = logging.getLogger(__name__)
+
+
+class AssessmentCache:
+    """Parsed assessment filters of each user, kept for each module
+
+    Each module is fetched and stored on its own, so that a bank with a new
+    module only fetches that module. The entries of a module expire ttl
+    seconds after it was fetched.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        ttl: float = 3600.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        """Constructor
+
+        Args:
+            directory (str): Folder of the cache. Defaults to ~/.alfred/assessments
+            ttl (float): Seconds the assessments of a module are kept for
+            clock (Callable): Returns the current time in seconds
+        """
+
+        self.directory = directory or alfred_home("assessments")
+        self.ttl = ttl
+        self.clock = clock
+
+    # end __init__()
+
+    def _path(self, username: str) -> str:
+        """The file of a user. The username is hashed so that it is not on disk"""
+        digest = hashlib.sha256(username.strip().lower().encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def _load(self, username: str) -> Dict:
+        """Loads the modules of a user"""
+
+        try:
+            with open(self._path(username), encoding="utf-8") as file:
+                return json.load(file).get("modules", {})
+        except (OSError, ValueError):
+            return {}
+
+    # end _load()
+
+    def _save(self, username: str, modules: Dict):
+        """Saves the modules of a user"""
+
+        atomic_write(self._path(username), json.dumps({"modules": modules}))
+
+    # end _save()
+
+    def get(self, username: str, module_codes: Iterable[str]) -> Tuple[AssessmentData, List[str]]:
+        """Gets the cached assessments of modules
+
+        Args:
+            username (str): The user the assessments were fetched for
+            module_codes (Iterable[str]): The modules wanted
+
+        Returns:
+            The assessments of the modules found, and the module codes that
+            are not cached or have expired
+        """
+
+        modules = self._load(username)
+        now = self.clock()
+        assessment_data = AssessmentData()
+        missing = []
+        for module_code in module_codes:
+            cached = modules.get(module_code)
+            if cached is None or now - cached["fetched"] > self.ttl:
+                missing.append(module_code)
+                continue
+            for module, assessment, qtype, module_id, assessment_id in cached["entries"]:
+                assessment_data.module_assessment_map.setdefault((module, assessment), {})[qtype] = (
+                    module_id,
+                    assessment_id,
+                )
+        return assessment_data, missing
+
+    # end get()
+
+    def put(self, username: str, module_codes: Iterable[str], assessment_data: AssessmentData):
+        """Stores the assessments fetched for modules
+
+        Modules without any assessment are stored as well, so that they are
+        not fetched again until they expire.
+        """
+
+        fetched: Dict[str, List] = {module_code: [] for module_code in module_codes}
+        for (module, assessment), entries in assessment_data.module_assessment_map.items():
+            for qtype, (module_id, assessment_id) in entries.items():
+                fetched.setdefault(module, []).append(
+                    [module, assessment, qtype, module_id, assessment_id]
+                )
+
+        modules = self._load(username)
+        now = self.clock()
+        for module_code, entries in fetched.items():
+            modules[module_code] = {"fetched": now, "entries": entries}
+        self._save(username, modules)
+
+    # end put()
+
+    def invalidate(self, username: str, module_codes: Optional[Iterable[str]] = None):
+        """Forgets the assessments of a user
+
+        Args:
+            username (str): The user
+            module_codes (Iterable[str]): The modules to forget. If None,
+                every module of the user is forgotten.
+        """
+
+        if module_codes is None:
+            try:
+                os.remove(self._path(username))
+            except FileNotFoundError:
+                pass
+            return
+        modules = self._load(username)
+        for module_code in module_codes:
+            modules.pop(module_code, None)
+        self._save(username, modules)
+
+    # end invalidate()
+
+
+# end class AssessmentCache
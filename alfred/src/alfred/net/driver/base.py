@@ -4,26 +4,49 @@
 from abc import ABCMeta, abstractmethod
 import logging
 import json
+import os
+import socket
 import traceback
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from alfred.net.driver.session_store import SessionStore
 
 # Third party imports
-import requests
-from selenium import webdriver
-from selenium.common.exceptions import WebDriverException
-from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
-from selenium.webdriver.support.ui import WebDriverWait
-from webdriver_manager.chrome import ChromeDriverManager
+# requests, selenium and webdriver_manager are slow to import, so they are
+# only imported when a browser or session is created.
 
 logger = logging.getLogger(__name__)
 
 
-def get_web_driver():
+# Chrome flags that cut the start up and page load time, as nothing
+# but the login pages is ever shown. They have not been checked against the
+# single sign on pages, which may need images or the background requests, so
+# they are only added when asked for, e.g. with ALFRED_CHROME_LEAN=1.
+AUTOMATION_FLAGS = (
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-component-update",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--no-first-run",
+    "--no-default-browser-check",
+    "--mute-audio",
+    "--blink-settings=imagesEnabled=false",
+)
+
+
+def get_web_driver(**options):
     """Helper function to detect the browser and load the driver
 
     Currently we only support chrome driver for Alfred as only
     chrome has the ability to log network message, which is required
     for us to be able to extract out the session key for subsequent
     communication.
+
+    Args:
+        options: Passed on to the function creating the driver, e.g.
+            headless or user_data_dir for create_chrome_driver()
     """
 
     supported_driver_map = {"Chrome": create_chrome_driver}
@@ -32,12 +55,11 @@ def get_web_driver():
     for key, driver_func in supported_driver_map.items():
         try:
             logger.info("Creating driver for %s", key)
-            driver = driver_func()
+            driver = driver_func(**options)
             return driver
-        except Exception as _:
-            logger.info(traceback.format_stack())
-            traceback.print_stack()
-            logger.info("Driver for %s not detected. Skipping", key)
+        except Exception as exc:
+            logger.debug(traceback.format_exc())
+            logger.error("Driver for %s cannot be created: %s. Skipping", key, exc)
 
     return driver
 
@@ -45,14 +67,134 @@ def get_web_driver():
 # end get_web_driver()
 
 
-def create_chrome_driver():
-    """Creates the chrome driver"""
+def _process_running(pid: int) -> bool:
+    """Whether a process of this host is running"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def profile_in_use(user_data_dir: str) -> bool:
+    """Whether a Chrome profile folder is used by a running Chrome
+
+    Chrome does not start with a profile that another Chrome has open, e.g.
+    that of another run with the same ALFRED_CHROME_PROFILE.
+    """
+
+    # Linux and macOS: a link to the host and process id of the Chrome
+    lock = os.path.join(user_data_dir, "SingletonLock")
+    if os.path.lexists(lock):
+        try:
+            host, _, pid = os.readlink(lock).rpartition("-")
+        except OSError:
+            return True
+        if host == socket.gethostname() and pid.isdigit():
+            # The link is left behind when Chrome crashes
+            return _process_running(int(pid))
+        return True
+
+    # Windows: a file that Chrome keeps open
+    lock = os.path.join(user_data_dir, "lockfile")
+    if os.path.exists(lock):
+        try:
+            with open(lock, "a"):
+                pass
+        except PermissionError:
+            return True
+    return False
+
+
+# end profile_in_use()
+
+
+def chrome_options(
+    headless: Optional[bool] = None,
+    user_data_dir: Optional[str] = None,
+    lean: Optional[bool] = None,
+):
+    """Creates the options of the chrome driver
+
+    Args:
+        headless (bool): Runs chrome without a window, e.g. on a server.
+            Defaults to the ALFRED_HEADLESS environment variable.
+        user_data_dir (str): Profile folder that is kept between runs, so
+            that the cookies of the single sign on and the cache are reused.
+            Defaults to the ALFRED_CHROME_PROFILE environment variable, else
+            a new profile every time.
+        lean (bool): Adds AUTOMATION_FLAGS, which turn off images, extensions
+            and background networking. Defaults to the ALFRED_CHROME_LEAN
+            environment variable, else off.
+
+    Returns:
+        The selenium ChromeOptions
+    """
+
+    from selenium import webdriver
+
+    if headless is None:
+        headless = os.getenv("ALFRED_HEADLESS", "").lower() in ("1", "true", "yes")
+    if user_data_dir is None:
+        user_data_dir = os.getenv("ALFRED_CHROME_PROFILE") or None
+    if lean is None:
+        lean = os.getenv("ALFRED_CHROME_LEAN", "").lower() in ("1", "true", "yes")
+
+    options = webdriver.ChromeOptions()
+    if headless:
+        options.add_argument("--headless=new")
+        options.add_argument("--window-size=1280,1024")
+        # /dev/shm is too small in containers
+        options.add_argument("--disable-dev-shm-usage")
+    if user_data_dir:
+        options.add_argument(f"--user-data-dir={os.path.abspath(os.path.expanduser(user_data_dir))}")
+    if lean:
+        for flag in AUTOMATION_FLAGS:
+            options.add_argument(flag)
+    return options
+
+
+# end chrome_options()
+
+
+def create_chrome_driver(
+    headless: Optional[bool] = None,
+    user_data_dir: Optional[str] = None,
+    lean: Optional[bool] = None,
+):
+    """Creates the chrome driver
+
+    Args:
+        headless (bool): Runs chrome without a window
+        user_data_dir (str): Profile folder that is kept between runs
+        lean (bool): Turns off images, extensions and background networking
+
+    See chrome_options() for the defaults.
+
+    Raises:
+        ValueError: If another Chrome has the profile open
+    """
+
+    profile = user_data_dir or os.getenv("ALFRED_CHROME_PROFILE")
+    if profile and profile_in_use(os.path.abspath(os.path.expanduser(profile))):
+        raise ValueError(
+            f"The Chrome profile {profile} is in use, perhaps by another run. "
+            "Close that Chrome, or use another profile"
+        )
+
+    from selenium import webdriver
+    from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
+    from webdriver_manager.chrome import ChromeDriverManager
+
     cap = DesiredCapabilities.CHROME.copy()
     cap["goog:loggingPrefs"] = {"performance": "ALL"}  # chromedriver 75+
     # We pin the chrome version as 115 has a different location that
     # is not recognized by the webdriver-manager yet
     driver = webdriver.Chrome(
         ChromeDriverManager(version='114.0.5735.90').install(),
+        options=chrome_options(headless, user_data_dir, lean),
         desired_capabilities=cap
     )
     return driver
@@ -62,16 +204,35 @@ def create_chrome_driver():
 
 
 class DriverBase(metaclass=ABCMeta):
-    """This is the base class for all the Drivers"""
+    """This is the base class for all the Drivers
 
-    # Reference to the selenium driver
-    driver = None
+    The browser is only started when it is first used, so that a session
+    restored from a SessionStore never starts it.
+    """
+
+    # Reference to the selenium driver, once started
+    _driver = None
+    # Name of the site in the session store
+    site = None
+    # Passed on to get_web_driver(), e.g. headless or user_data_dir
+    browser_options = {}
+
+    @property
+    def driver(self):
+        """The selenium driver, started on first use"""
+        if self._driver is None:
+            self._driver = get_web_driver(**self.browser_options)
+        return self._driver
+
+    @driver.setter
+    def driver(self, value):
+        self._driver = value
 
     def __del__(self):
         """Destructor"""
-        if self.driver is not None:
+        if self._driver is not None:
             logger.info("Closing driver")
-            self.driver.close()
+            self._driver.close()
 
     @abstractmethod
     def connect(self, username: str, password: str):
@@ -86,9 +247,47 @@ class DriverBase(metaclass=ABCMeta):
     # end is_connected()
 
     def navigate(self, url: str):
-        """Navigates to a particular page"""
+        """Navigates to a particular page, if the browser has been started"""
+        if self._driver is None:
+            logger.info("Not showing %s as the browser was not started", url)
+            return
         self.driver.get(url)
 
+    def probe(self) -> bool:
+        """Checks with a cheap request that the session is still logged in"""
+        return False
+
+    def restore_session(self, username: str, store: "SessionStore") -> bool:
+        """Logs in with the session saved for the user, without the browser
+
+        Args:
+            username (str): The user
+            store (SessionStore): Where the sessions were saved
+
+        Returns:
+            Whether the saved session is still logged in
+        """
+
+        session = store.load(self.site, username)
+        if session is None:
+            return False
+        self.session = session
+        if self.probe():
+            logger.info("Logged in with the saved session")
+            self.username = username
+            return True
+        logger.info("The saved session is no longer logged in")
+        store.delete(self.site, username)
+        self.session = None
+        return False
+
+    # end restore_session()
+
+    def save_session(self, username: str, store: "SessionStore"):
+        """Saves the session of the user, to log in without the browser next time"""
+        if self.session is not None:
+            store.save(self.site, username, self.session)
+
     def _setup_cookies(self):
         """Transfer the cookies to the request session
 
@@ -96,13 +295,17 @@ class DriverBase(metaclass=ABCMeta):
         can use the necessary cookies.
         """
 
+        import requests
+
         # Creates the session and transfer cookies
         self.session = requests.Session()
         selenium_user_agent = self.driver.execute_script("return navigator.userAgent;")
         self.session.headers.update({"user-agent": selenium_user_agent})
         for cookie in self.driver.get_cookies():
+            # The expiry is kept for the session store
             self.session.cookies.set(
-                cookie["name"], cookie["value"], domain=cookie["domain"]
+                cookie["name"], cookie["value"], domain=cookie["domain"],
+                expires=cookie.get("expiry"),
             )
 
     # end _setup_cookies()
@@ -3,18 +3,34 @@
 # Standard imports
 import logging
 import time
+from typing import TYPE_CHECKING, Optional
 
 # Third party imports
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.common.exceptions import NoSuchElementException
+# selenium is only imported when connecting, as it is slow to import
 
 # Application imports
-from alfred.net.driver.base import get_web_driver, DriverBase
+from alfred.net.driver.base import DriverBase
+
+if TYPE_CHECKING:
+    from alfred.net.driver.session_store import SessionStore
 
 logger = logging.getLogger(__name__)
 
+# MyLEO logs in with the email address, which staff usually leave out
+EMAIL_DOMAIN = "@rp.edu.sg"
+
+
+def myleo_username(username: str) -> str:
+    """The username to log in to MyLEO with, i.e. the email address"""
+
+    username = username.strip()
+    if not username.endswith(EMAIL_DOMAIN):
+        username = f"{username}{EMAIL_DOMAIN}"
+    return username
+
+
+# end myleo_username()
+
 
 class MyLeoDriver(DriverBase):
     """Driver class for interacting with MyLeo
@@ -23,30 +39,48 @@ class MyLeoDriver(DriverBase):
     as the connection to the site.
     """
 
-    def __init__(self):
-        """Constructor"""
+    site = "myleo"
+
+    def __init__(self, **browser_options):
+        """Constructor
+
+        Args:
+            browser_options: Passed on to get_web_driver() when the browser
+                is started, e.g. headless=True or user_data_dir
+        """
+        self.browser_options = browser_options
         self.url = "https://myleo.rp.edu.sg"
         self.home_url = "https://myleo.rp.edu.sg/CoreBase/Home/Index"
-        self.driver = get_web_driver()
         self.session = None
 
-    def __del__(self):
-        """Destructor"""
-        if self.driver is not None:
-            logger.info("Closing driver")
-            self.driver.close()
-
-    def connect(self, username: str, password: str) -> bool:
+    def connect(
+        self,
+        username: str,
+        password: str,
+        store: Optional["SessionStore"] = None,
+        restore: bool = True,
+    ) -> bool:
         """Connects to the MyLeo
 
         Args:
             username (str): The username input
             password (str): Password input
+            store (SessionStore): If given, the session saved for the user is
+                used if it is still logged in, without starting the browser.
+                Otherwise the session is saved after logging in.
+            restore (bool): Whether the saved session is tried first. False
+                if restore_session() has failed already.
 
         Returns
             Boolean to indicate whether it is connected or not
         """
 
+        if store is not None and restore and self.restore_session(username, store):
+            return True
+
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import NoSuchElementException
+
         if not self.is_connected():
             self.driver.get(self.url)
             
@@ -67,6 +101,8 @@ class MyLeoDriver(DriverBase):
             if self.is_connected():
                 logger.info("Login successful")
                 self._setup_cookies()
+                if store is not None:
+                    self.save_session(username, store)
                 return True
             else:
                 logger.warning("Cannot log in. Incorrect username or password?")
@@ -75,6 +111,8 @@ class MyLeoDriver(DriverBase):
         # Creates the session and transfer cookies
         logger.info('Is connected')
         self._setup_cookies()
+        if store is not None:
+            self.save_session(username, store)
         return True
 
     # end connect()
@@ -93,6 +131,9 @@ class MyLeoDriver(DriverBase):
             None
         """
 
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+
         username_elt = self.driver.find_element(By.NAME, "loginfmt")
         password_elt = self.driver.find_element(By.NAME, "passwd")
         username_elt.send_keys(username)
@@ -117,6 +158,8 @@ class MyLeoDriver(DriverBase):
         into MyLEO.
         """
 
+        from selenium.common.exceptions import NoSuchElementException
+
         logger.info(f'Going to {self.home_url}')
         self.driver.get(self.home_url)
         # Finds user related elements. Non logged in page should not
@@ -131,3 +174,20 @@ class MyLeoDriver(DriverBase):
         return True
 
     # end is_connected()
+
+    def probe(self) -> bool:
+        """Checks that the session is logged in with the home page
+
+        A session that is not logged in is redirected to the login page.
+        """
+
+        if self.session is None:
+            return False
+        try:
+            response = self.session.get(self.home_url, allow_redirects=False, timeout=10)
+        except OSError as exc:
+            logger.info("Cannot check the session: %s", exc)
+            return False
+        return response.status_code == 200
+
+    # end probe()
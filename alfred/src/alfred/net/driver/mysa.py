@@ -1,26 +1,24 @@
 """ Driver for MySA """
 
 # Standard imports
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
 import logging
 import json
+import math
 import re
-from typing import Dict, List, Tuple
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
 
 # Third party imports
-from selenium import webdriver
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.common.desired_capabilities import DesiredCapabilities
-from selenium.common.exceptions import (
-    ElementClickInterceptedException,
-    NoSuchElementException,
-    TimeoutException
-)
+# selenium is only imported when connecting, as it is slow to import
 
 # Application imports
-from alfred.net.driver.base import get_web_driver, DriverBase
+from alfred.net.driver.base import DriverBase
+from alfred.net.json_stream import JSONReader, iter_items, iter_members
+
+if TYPE_CHECKING:
+    from alfred.net.driver.assessment_cache import AssessmentCache
+    from alfred.net.driver.session_store import SessionStore
 
 logger = logging.getLogger(__name__)
 
@@ -36,6 +34,12 @@ class AssessmentData:
         default_factory=dict
     )
 
+    def merge(self, other: "AssessmentData"):
+        """Adds the entries of another assessment data"""
+
+        for key, entries in other.module_assessment_map.items():
+            self.module_assessment_map.setdefault(key, {}).update(entries)
+
 
 def parse_qtype_fullname(fullname: str):
     """ Helper function to extract the qtype from the full name.
@@ -67,28 +71,110 @@ def parse_assessment_filter(data: Dict) -> AssessmentData:
     for datum in data.get("data", []):
         qtype_fullname = datum.get('qTypeFullName', None)
         qtype = parse_qtype_fullname(qtype_fullname)
-        for entry in datum.get("assessments", []):
-            assessment = entry.get("assessment")
-            assessment_id = entry.get("id")
-            module_code = entry.get("moduleCode")
-            module_id = entry.get("moduleId")
-            makeup = entry.get("makeup", False)
-            # If it is a make up, we need to update assessment to include (Make-up)
-            if makeup:
-                assessment = f"{assessment} (Make-up)"
-            if "authoring_questionbank_edit" in entry.get("permissions", []):
-                key = (module_code, assessment)
-                if key not in assessment_data.module_assessment_map:
-                    assessment_data.module_assessment_map[key] = {}
-                assessment_data.module_assessment_map[key][qtype] = (
-                    module_id,
-                    assessment_id,
-                )
+        add_assessments(assessment_data, qtype, datum.get("assessments", []))
     return assessment_data
 
 # end parse_assessment_filter()
 
 
+def add_assessments(assessment_data: AssessmentData, qtype: str, entries: List[Dict]):
+    """Adds the assessments of a qualification type that questions can be created for
+
+    Args:
+        assessment_data (AssessmentData): The data to add to
+        qtype (str): The qualification type
+        entries (List[Dict]): The assessments in the assessment filter
+    """
+
+    for entry in entries:
+        assessment = entry.get("assessment")
+        assessment_id = entry.get("id")
+        module_code = entry.get("moduleCode")
+        module_id = entry.get("moduleId")
+        makeup = entry.get("makeup", False)
+        # If it is a make up, we need to update assessment to include (Make-up)
+        if makeup:
+            assessment = f"{assessment} (Make-up)"
+        if "authoring_questionbank_edit" in entry.get("permissions", []):
+            key = (module_code, assessment)
+            if key not in assessment_data.module_assessment_map:
+                assessment_data.module_assessment_map[key] = {}
+            assessment_data.module_assessment_map[key][qtype] = (
+                module_id,
+                assessment_id,
+            )
+
+# end add_assessments()
+
+
+class AssessmentFilterParser:
+    """Parses the response of the assessment filter while it is received
+
+    Only the fields needed of each assessment are kept, so the memory used
+    does not grow with the size of the response.
+    """
+
+    # The fields of an assessment used by add_assessments()
+    ENTRY_FIELDS = frozenset(
+        ("assessment", "id", "moduleCode", "moduleId", "makeup", "permissions")
+    )
+
+    def __init__(self):
+        """Constructor"""
+        self.assessment_data = AssessmentData()
+        self.rows = 0  # Number of entries in data, i.e. in the page
+        self.fields: Dict = {}  # The other fields that are not lists, e.g. totalCount
+
+    def parse(self, chunks: Iterable[bytes]) -> AssessmentData:
+        """Parses the response
+
+        Args:
+            chunks (Iterable[bytes]): The response, e.g. response.iter_content()
+
+        Returns:
+            The same data as parse_assessment_filter() of the whole response
+        """
+
+        reader = JSONReader(chunks)
+        for key in iter_members(reader):
+            if key == "data":
+                for _ in iter_items(reader):
+                    self.rows += 1
+                    self._parse_datum(reader)
+            elif reader.peek() in "[{":
+                reader.skip()
+            else:
+                self.fields[key] = reader.value()
+        return self.assessment_data
+
+    # end parse()
+
+    def _parse_datum(self, reader: JSONReader):
+        """Parses the assessments of a qualification type"""
+
+        qtype_fullname = None
+        entries = []
+        for key in iter_members(reader):
+            if key == "qTypeFullName":
+                qtype_fullname = reader.value()
+            elif key == "assessments":
+                # Each assessment is decoded on its own, which is much faster
+                # than reading its fields one at a time
+                for _ in iter_items(reader):
+                    entry = reader.value()
+                    entries.append(
+                        {key: entry[key] for key in self.ENTRY_FIELDS.intersection(entry)}
+                    )
+            else:
+                reader.skip()
+        add_assessments(self.assessment_data, parse_qtype_fullname(qtype_fullname), entries)
+
+    # end _parse_datum()
+
+
+# end class AssessmentFilterParser
+
+
 class MySADriver(DriverBase):
     """Driver class for interacting with MySA2.0
 
@@ -96,25 +182,57 @@ class MySADriver(DriverBase):
     as the connection to the site.
     """
 
-    def __init__(self):
-        """Constructor"""
+    site = "mysa"
+
+    def __init__(self, **browser_options):
+        """Constructor
+
+        Args:
+            browser_options: Passed on to get_web_driver() when the browser
+                is started, e.g. headless=True or user_data_dir
+        """
+        self.browser_options = browser_options
         self.url = "https://mysa.rp.edu.sg"
         self.login_url = "https://mysa.rp.edu.sg/account/account/login"
         self.assessment_url = "https://mysa.rp.edu.sg/authoring/api/assessments/filter"
-        self.driver = get_web_driver()
         self.session = None
-
-    def connect(self, username: str, password: str) -> bool:
+        self.username = None  # Set when connecting, to cache the assessments per user
+
+    def connect(
+        self,
+        username: str,
+        password: str,
+        store: Optional["SessionStore"] = None,
+        restore: bool = True,
+    ) -> bool:
         """Connects to the MySA and authenticates
 
         Args:
             username (str): The username input
             password (str): Password input
+            store (SessionStore): If given, the session saved for the user is
+                used if it is still logged in, without starting the browser.
+                Otherwise the session is saved after logging in.
+            restore (bool): Whether the saved session is tried first. False
+                if restore_session() has failed already.
 
         Returns
             None
         """
 
+        self.username = username
+        if store is not None and restore and self.restore_session(username, store):
+            return True
+
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.common.exceptions import (
+            ElementClickInterceptedException,
+            NoSuchElementException,
+            TimeoutException
+        )
+
         if not self.is_connected():
             self.driver.get(self.login_url)
             username_elt = self.driver.find_element_by_id("userId")
@@ -137,11 +255,18 @@ class MySADriver(DriverBase):
                 logger.info("Login successful")
                 self._setup_cookies()
                 self._setup_auth_token()  # We need this to set Auth token
+                if store is not None:
+                    self.save_session(username, store)
                 return True
             except (NoSuchElementException, TimeoutException):
                 logger.error("Cannot log in. Incorrect username or password?")
                 return False
 
+        # Already logged in, e.g. with the cookies of a persistent profile
+        self._setup_cookies()
+        self._setup_auth_token()
+        if store is not None:
+            self.save_session(username, store)
         return True
 
     # end connect()
@@ -154,6 +279,8 @@ class MySADriver(DriverBase):
         into MyLEO.
         """
 
+        from selenium.common.exceptions import NoSuchElementException
+
         self.driver.get(self.url)
         # Finds user related elements. Non logged in page should not
         # have this
@@ -167,12 +294,52 @@ class MySADriver(DriverBase):
 
     # end is_connected()
 
-    def get_assessments_filter(self, offset: int = 1, limit: int = 999999) -> Dict:
+    def probe(self) -> bool:
+        """Checks that the session is logged in by asking for one assessment"""
+
+        if self.session is None:
+            return False
+        try:
+            response = self.session.post(
+                url=self.assessment_url,
+                json=self._assessments_filter_request(1, 1, None),
+                verify=False,
+                timeout=10,
+            )
+        except OSError as exc:
+            logger.info("Cannot check the session: %s", exc)
+            return False
+        return response.status_code == 200
+
+    # end probe()
+
+    @staticmethod
+    def _assessments_filter_request(
+        offset: int, limit: int, module_codes: Optional[Iterable[str]]
+    ) -> Dict:
+        """The body of a request to the assessment filter"""
+
+        return {
+            "qualificationTypes": [],
+            "moduleCodes": sorted(module_codes) if module_codes is not None else [],
+            "cohorts": [],
+            "assessments": [],
+            "offset": offset,
+            "limit": limit,
+        }
+
+    # end _assessments_filter_request()
+
+    def get_assessments_filter(
+        self, offset: int = 1, limit: int = 999999, module_codes: Optional[Iterable[str]] = None
+    ) -> Dict:
         """Gets the assessment filter for RP MySA 2.0
 
         Args:
             offset (int): Offset for searching the db. Starting from page 1
             limit (int): Number of entries per page.
+            module_codes (Iterable[str]): If given, only the assessments of
+                these modules are requested
 
         Returns:
             Response from the MySA server.
@@ -182,14 +349,7 @@ class MySADriver(DriverBase):
             logger.warning("The driver is not initialized yet")
             return None
 
-        data = {
-            "qualificationTypes": [],
-            "moduleCodes": [],
-            "cohorts": [],
-            "assessments": [],
-            "offset": offset,
-            "limit": limit,
-        }
+        data = self._assessments_filter_request(offset, limit, module_codes)
         response = self.session.post(url=self.assessment_url, json=data, verify=False)
 
         if response.status_code == 200:
@@ -202,5 +362,181 @@ class MySADriver(DriverBase):
 
     # end get_assessments_filter()
 
+    def stream_assessments_filter(
+        self, offset: int = 1, limit: int = 999999, module_codes: Optional[Iterable[str]] = None
+    ) -> Optional[AssessmentFilterParser]:
+        """Gets the assessment filter, parsing the response while it is received
+
+        Unlike get_assessments_filter(), the response is never held in memory
+        as a whole.
+
+        Args:
+            offset (int): Offset for searching the db. Starting from page 1
+            limit (int): Number of entries per page.
+            module_codes (Iterable[str]): If given, only the assessments of
+                these modules are requested
+
+        Returns:
+            The parser, with the assessments in parser.assessment_data, or
+            None if the assessments cannot be retrieved
+        """
+
+        if self.session is None:
+            logger.warning("The driver is not initialized yet")
+            return None
+
+        data = self._assessments_filter_request(offset, limit, module_codes)
+        response = self.session.post(url=self.assessment_url, json=data, verify=False, stream=True)
+        try:
+            if response.status_code != 200:
+                logger.info("Unable to retrieve assessment information")
+                return None
+            parser = AssessmentFilterParser()
+            parser.parse(response.iter_content(chunk_size=65536))
+            return parser
+        finally:
+            response.close()
+
+    # end stream_assessments_filter()
+
+    def _fetch_assessment_pages(
+        self, module_codes: Optional[List[str]], page_size: Optional[int], max_workers: int
+    ) -> Iterator[AssessmentData]:
+        """Gets the assessment filter, parsing each page as it arrives
+
+        The first page gives the total count, then the other pages are
+        requested at the same time.
+
+        Raises:
+            ConnectionError: If a page cannot be retrieved
+        """
+
+        def fetch_page(offset: int) -> AssessmentFilterParser:
+            try:
+                parser = self.stream_assessments_filter(
+                    offset=offset, limit=page_size or 999999, module_codes=module_codes
+                )
+            except (OSError, ValueError) as exc:
+                # The exceptions of requests, such as ChunkedEncodingError
+                # when the response is cut short, are OSError. ValueError is
+                # raised for a malformed response.
+                raise ConnectionError(
+                    f"Unable to retrieve page {offset} of the assessment filter: {exc}"
+                ) from exc
+            if parser is None:
+                raise ConnectionError(f"Unable to retrieve page {offset} of the assessment filter")
+            return parser
+
+        parser = fetch_page(1)
+        yield parser.assessment_data
+        if page_size is None or parser.rows < page_size:
+            return
+
+        total = parser.fields.get("totalCount")
+        if total is None:
+            # Without a count, the pages are requested one after the other
+            # until one is not full
+            offset = 1
+            while parser.rows >= page_size:
+                offset += 1
+                parser = fetch_page(offset)
+                yield parser.assessment_data
+            return
+
+        # The count may be of assessments rather than of rows, which only
+        # requests a few empty pages more
+        pages = math.ceil(total / page_size)
+        logger.info("Getting %s pages of the assessment filter", pages)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(fetch_page, offset) for offset in range(2, pages + 1)]
+            try:
+                for future in as_completed(futures):
+                    yield future.result().assessment_data
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    # end _fetch_assessment_pages()
+
+    def iter_assessment_data(
+        self,
+        module_codes: Optional[Iterable[str]] = None,
+        cache: Optional["AssessmentCache"] = None,
+        page_size: Optional[int] = None,
+        max_workers: int = 4,
+    ) -> Iterator[AssessmentData]:
+        """Gets the assessments of modules, in parts as they arrive
+
+        Args:
+            module_codes (Iterable[str]): The modules of the questions. If
+                None, the assessments of every module are fetched.
+            cache (AssessmentCache): If given, only the modules not cached
+                for the user are fetched, and they are cached
+            page_size (int): If given, the assessment filter is requested in
+                pages of this many entries, several pages at once
+            max_workers (int): Number of pages requested at the same time
+
+        Returns:
+            An iterator over the cached assessments and each page, in the
+            order they arrive
+
+        Raises:
+            ConnectionError: If the assessments cannot be retrieved
+        """
+
+        if module_codes is not None:
+            module_codes = sorted(set(module_codes))
+        if module_codes is None or cache is None or self.username is None:
+            yield from self._fetch_assessment_pages(module_codes, page_size, max_workers)
+            return
+
+        cached, missing = cache.get(self.username, module_codes)
+        yield cached
+        if not missing:
+            logger.info("Using the cached assessments of %s", ", ".join(module_codes))
+            return
+
+        logger.info("Getting the assessments of %s", ", ".join(missing))
+        fetched = AssessmentData()
+        for page in self._fetch_assessment_pages(missing, page_size, max_workers):
+            fetched.merge(page)
+            yield page
+        cache.put(self.username, missing, fetched)
+
+    # end iter_assessment_data()
+
+    def get_assessment_data(
+        self,
+        module_codes: Optional[Iterable[str]] = None,
+        cache: Optional["AssessmentCache"] = None,
+        page_size: Optional[int] = None,
+        max_workers: int = 4,
+    ) -> Optional[AssessmentData]:
+        """Gets the assessments of modules that questions can be created for
+
+        Args:
+            module_codes (Iterable[str]): The modules of the questions. If
+                None, the assessments of every module are fetched.
+            cache (AssessmentCache): If given, only the modules not cached
+                for the user are fetched, and they are cached
+            page_size (int): If given, the assessment filter is requested in
+                pages of this many entries, several pages at once
+            max_workers (int): Number of pages requested at the same time
+
+        Returns:
+            The parsed assessments, or None if they cannot be retrieved
+        """
+
+        assessment_data = AssessmentData()
+        try:
+            for page in self.iter_assessment_data(module_codes, cache, page_size, max_workers):
+                assessment_data.merge(page)
+        except ConnectionError as exc:
+            logger.error("%s", exc)
+            return None
+        return assessment_data
+
+    # end get_assessment_data()
+
 
 # end class MySADriver()
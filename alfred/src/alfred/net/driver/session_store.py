@@ -0,0 +1,256 @@
+""" Encrypted store of the sessions of each user, to log in again without a browser """
+
+# Standard imports
+import base64
+from dataclasses import asdict, dataclass, field
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+# Third party imports
+# cryptography and requests are only imported when a session is saved or
+# loaded. Without cryptography, the sessions are not saved.
+
+# Application imports
+from alfred.io.storage import alfred_home, atomic_write
+
+logger = logging.getLogger(__name__)
+
+# Sessions without a known expiry are kept for a working day
+DEFAULT_MAX_AGE = 8 * 3600.0
+
+
+def token_expiry(authorization: Optional[str]) -> Optional[float]:
+    """The expiry time of a Bearer token, if it is a JWT with one
+
+    The signature is not checked, as the server checks it anyway.
+    """
+
+    if not authorization or not authorization.startswith("Bearer "):
+        return None
+    parts = authorization[len("Bearer "):].split(".")
+    if len(parts) != 3:
+        return None
+    try:
+        payload = parts[1] + "=" * (-len(parts[1]) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+# end token_expiry()
+
+
+@dataclass
+class StoredSession:
+    """The cookies and headers of an authenticated session"""
+
+    cookies: List[Dict] = field(default_factory=list)
+    user_agent: Optional[str] = None
+    authorization: Optional[str] = None
+    expires: float = 0.0  # Time after which the session is not used
+
+    @classmethod
+    def from_session(cls, session, clock: Callable[[], float] = time.time) -> "StoredSession":
+        """Captures a requests session
+
+        The session expires with the first of its cookies or Bearer token
+        to expire, or after DEFAULT_MAX_AGE if none of them has an expiry.
+        """
+
+        cookies = [
+            {
+                "name": cookie.name,
+                "value": cookie.value,
+                "domain": cookie.domain,
+                "path": cookie.path,
+                "expires": cookie.expires,
+                "secure": cookie.secure,
+            }
+            for cookie in session.cookies
+        ]
+        authorization = session.headers.get("Authorization")
+        expiries = [cookie["expires"] for cookie in cookies if cookie["expires"]]
+        expiry = token_expiry(authorization)
+        if expiry is not None:
+            expiries.append(expiry)
+        return cls(
+            cookies=cookies,
+            user_agent=session.headers.get("user-agent"),
+            authorization=authorization,
+            expires=min(expiries) if expiries else clock() + DEFAULT_MAX_AGE,
+        )
+
+    # end from_session()
+
+    def to_session(self):
+        """Creates a requests session with the cookies and headers"""
+
+        import requests
+
+        session = requests.Session()
+        if self.user_agent:
+            session.headers.update({"user-agent": self.user_agent})
+        if self.authorization:
+            session.headers.update({"Authorization": self.authorization})
+        for cookie in self.cookies:
+            session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie["domain"],
+                path=cookie["path"],
+                expires=cookie["expires"],
+                secure=cookie["secure"],
+            )
+        return session
+
+    # end to_session()
+
+
+# end class StoredSession
+
+
+class SessionStore:
+    """Sessions of each user and site, encrypted with Fernet
+
+    The key is taken from the ALFRED_SESSION_KEY environment variable, else
+    from a key file next to the sessions that only the user can read, which
+    is created the first time.
+
+    The key file only keeps the sessions from being read on their own, e.g.
+    from a backup of the sessions. Anyone who can read the files of the
+    user can read the key as well, and log in as the user until the
+    sessions expire. Set ALFRED_SESSION_KEY, e.g. from the OS keyring, so
+    that the key is not on disk.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        key: Optional[bytes] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        """Constructor
+
+        Args:
+            directory (str): Folder of the store. Defaults to ~/.alfred/sessions
+            key (bytes): The Fernet key. Defaults to the environment or key file.
+            clock (Callable): Returns the current time in seconds
+        """
+
+        self.directory = directory or alfred_home("sessions")
+        self.key = key
+        self.clock = clock
+        self.fernet = None
+
+    # end __init__()
+
+    @property
+    def available(self) -> bool:
+        """Whether sessions can be stored, i.e. cryptography is installed"""
+
+        try:
+            import cryptography.fernet  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def _get_fernet(self):
+        """Creates the cipher, and the key file if needed"""
+
+        from cryptography.fernet import Fernet
+
+        if self.fernet is not None:
+            return self.fernet
+        key = self.key or os.getenv("ALFRED_SESSION_KEY", "").encode("ascii") or None
+        if key is None:
+            key_path = os.path.join(self.directory, ".key")
+            try:
+                with open(key_path, "rb") as file:
+                    key = file.read().strip()
+            except FileNotFoundError:
+                os.makedirs(self.directory, exist_ok=True)
+                key = Fernet.generate_key()
+                # Only the user can read the key
+                handle = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+                with os.fdopen(handle, "wb") as file:
+                    file.write(key)
+        self.fernet = Fernet(key)
+        return self.fernet
+
+    # end _get_fernet()
+
+    def _path(self, site: str, username: str) -> str:
+        """The file of a user. The username is hashed so that it is not on disk"""
+        digest = hashlib.sha256(f"{site}/{username.strip().lower()}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.session")
+
+    def save(self, site: str, username: str, session) -> bool:
+        """Saves the session of a user
+
+        Args:
+            site (str): The site, e.g. "mysa" or "myleo"
+            username (str): The user
+            session (requests.Session): The authenticated session
+
+        Returns:
+            Whether the session was saved
+        """
+
+        if not self.available:
+            logger.info("Install cryptography to log in again without the browser")
+            return False
+        stored = StoredSession.from_session(session, self.clock)
+        token = self._get_fernet().encrypt(json.dumps(asdict(stored)).encode("utf-8"))
+        atomic_write(self._path(site, username), token)
+        logger.info("Saved the session until %s", time.ctime(stored.expires))
+        return True
+
+    # end save()
+
+    def load(self, site: str, username: str):
+        """Loads the session of a user, if it has not expired
+
+        Returns:
+            A requests session, or None if there is no session to use
+        """
+
+        if not self.available:
+            return None
+        from cryptography.fernet import InvalidToken
+
+        try:
+            with open(self._path(site, username), "rb") as file:
+                token = file.read()
+        except FileNotFoundError:
+            return None
+        try:
+            stored = StoredSession(**json.loads(self._get_fernet().decrypt(token)))
+        except (InvalidToken, ValueError, TypeError):
+            logger.warning("The saved session cannot be read. Logging in again")
+            self.delete(site, username)
+            return None
+        if stored.expires <= self.clock():
+            logger.info("The saved session has expired")
+            self.delete(site, username)
+            return None
+        return stored.to_session()
+
+    # end load()
+
+    def delete(self, site: str, username: str):
+        """Forgets the session of a user"""
+
+        try:
+            os.remove(self._path(site, username))
+        except FileNotFoundError:
+            pass
+
+    # end delete()
+
+
+# end class SessionStore
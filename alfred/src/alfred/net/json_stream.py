@@ -0,0 +1,202 @@
+""" Incremental reading of JSON documents received in chunks
+
+Only the values asked for are decoded, one at a time, so a large document
+is never held in memory as a whole. For example
+
+    reader = JSONReader(response.iter_content(chunk_size=65536))
+    for key in iter_members(reader):
+        if key == "data":
+            for _ in iter_items(reader):
+                record = reader.value()
+        else:
+            reader.skip()
+"""
+
+# Standard imports
+import codecs
+import json
+import logging
+from typing import Any, Iterable, Iterator, Union
+
+logger = logging.getLogger(__name__)
+
+_DECODER = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+# A number decoded within this many characters of the end of the buffer may
+# continue in the next chunk, as with "1." or "1e-" before the digits
+_NUMBER_TAIL = 3
+
+
+class JSONReader:
+    """Reads the tokens and values of a JSON document from chunks of bytes"""
+
+    def __init__(self, chunks: Iterable[Union[bytes, str]]):
+        """Constructor
+
+        Args:
+            chunks (Iterable): The document in chunks of UTF-8 bytes, or of text
+        """
+
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    # end __init__()
+
+    def _read(self) -> bool:
+        """Appends the next chunk to the buffer, dropping what was read
+
+        Returns:
+            False if there are no more chunks
+        """
+
+        if self.eof:
+            return False
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            self.eof = True
+            text = self.decoder.decode(b"", final=True)
+        elif isinstance(chunk, str):
+            text = chunk
+        else:
+            text = self.decoder.decode(chunk)
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+        return True
+
+    # end _read()
+
+    def peek(self) -> str:
+        """Returns the next character that is not whitespace, without reading it
+
+        Raises:
+            ValueError: If the document ends
+        """
+
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._read():
+                raise ValueError("Unexpected end of the JSON document")
+
+    # end peek()
+
+    def expect(self, char: str):
+        """Reads a character
+
+        Raises:
+            ValueError: If the next character is another one
+        """
+
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} but found {found!r} in the JSON document")
+        self.pos += 1
+
+    # end expect()
+
+    def value(self) -> Any:
+        """Reads and decodes the next value"""
+
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+                number = isinstance(value, (int, float)) and not isinstance(value, bool)
+                if not number or end + _NUMBER_TAIL <= len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._read()
+
+    # end value()
+
+    def skip(self):
+        """Reads the next value without keeping it
+
+        The members or items of an object or array are decoded one at a time.
+        """
+
+        char = self.peek()
+        if char == "{":
+            for _ in iter_members(self):
+                self.value()
+        elif char == "[":
+            for _ in iter_items(self):
+                self.value()
+        else:
+            self.value()
+
+    # end skip()
+
+
+# end class JSONReader
+
+
+def _separator(reader: JSONReader, close: str) -> bool:
+    """Reads the separator after a member or item
+
+    Returns:
+        False if it closes the object or array
+    """
+
+    char = reader.peek()
+    reader.pos += 1
+    if char == close:
+        return False
+    if char != ",":
+        raise ValueError(f"Expected ',' or {close!r} but found {char!r} in the JSON document")
+    return True
+
+
+# end _separator()
+
+
+def iter_members(reader: JSONReader) -> Iterator[str]:
+    """Reads an object, yielding each key
+
+    The value of each key must be read, or skipped, before the next key.
+    """
+
+    reader.expect("{")
+    if reader.peek() == "}":
+        reader.pos += 1
+        return
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise ValueError(f"Expected a key but found {key!r} in the JSON document")
+        reader.expect(":")
+        yield key
+        if not _separator(reader, "}"):
+            return
+
+
+# end iter_members()
+
+
+def iter_items(reader: JSONReader) -> Iterator[int]:
+    """Reads an array, yielding the position of each item
+
+    Each item must be read, or skipped, before the next one.
+    """
+
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    position = 0
+    while True:
+        yield position
+        position += 1
+        if not _separator(reader, "]"):
+            return
+
+
+# end iter_items()
@@ -14,14 +14,29 @@ from tkinter.filedialog import askopenfilename
 
 # Application imports
 from alfred import __version__
+from alfred.action.adaptive import AdaptiveConcurrency
+from alfred.action.journal import UploadJournal
+from alfred.action.manifest import UploadManifest
+from alfred.io.cache import BankCache
+from alfred.io.dedup import drop_duplicates, find_duplicates
 from alfred.io.question import create_from_file
-from alfred.net.driver.myleo import MyLeoDriver
+from alfred.net.driver.myleo import MyLeoDriver, myleo_username
 from alfred.net.driver.mysa import MySADriver
+from alfred.net.driver.session_store import SessionStore
 from alfred.action.upload_myleo import ActionUpload_MCQ2MyLEO
 from alfred.action.upload_mysa import ActionUpload_MCQ2MySA
 
 logger = logging.getLogger(__name__)
 
+# Number of questions posted at the same time. The number starts at
+# UPLOAD_WORKERS and is adjusted to how the server copes, up to
+# MAX_UPLOAD_WORKERS.
+UPLOAD_WORKERS = 4
+MAX_UPLOAD_WORKERS = 32
+# Entries per page of the MySA assessment filter. The pages are requested
+# at the same time, and questions are posted as soon as a page resolves them.
+ASSESSMENT_PAGE_SIZE = 200
+
 
 class QueueHandler(logging.Handler):
     # Handler to put all messages into queue
@@ -43,6 +58,7 @@ class App(tk.Tk):
         super().__init__()
 
         self.question = None
+        self.cache = BankCache()
 
         self.title(f"ALFRED v{__version__}")
 
@@ -132,9 +148,11 @@ class App(tk.Tk):
         """Command to open the file"""
 
         filename = askopenfilename()
-        bank = create_from_file(filename)
-        logger.info("Loaded file %s", filename)
-        logger.info("Questions:\n%s", pformat(asdict(bank)))
+        bank = create_from_file(filename, cache=self.cache)
+        logger.info("Loaded %s questions from %s", len(bank.questions), filename)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Questions:\n%s", pformat(asdict(bank)))
+        find_duplicates(bank.questions).log(bank.questions)
 
         self.question = bank
 
@@ -148,33 +166,49 @@ class App(tk.Tk):
             return
 
         # Displays the username and password dialog in succession
+        username = askstring("Username", "Enter username (without @rp.edu.sg)")
+        if not username:
+            logger.error('No username given')
+            return
+        username = myleo_username(username)
+        logger.info("Username is %s", username)
         driver = MyLeoDriver()
 
-        # Checks to see if I need to connect
-        connected = driver.is_connected()
+        # A saved session does not need the browser, else checks to see
+        # if I need to connect
+        store = SessionStore()
+        connected = driver.restore_session(username, store) or driver.is_connected()
 
         if not connected:
             driver.driver.close()
-            username = askstring("Username", "Enter username (without @rp.edu.sg)")
-            if not username:
-                logger.error('No username given')
-                return
-            if not username.endswith("@rp.edu.sg"):
-                username = f"{username}@rp.edu.sg"
-            logger.info("Username is %s", username)
             password = askstring("Password", "Enter Password", show="*")
             if not password:
                 logger.error('No password given')
                 return
             logger.info("Creating driver for LEO2.0")
             driver = MyLeoDriver()
-            connected = driver.connect(username=username, password=password)
+            # The saved session was tried already
+            connected = driver.connect(
+                username=username, password=password, store=store, restore=False
+            )
 
         if connected:
             # Creates the action and tries to upload the question
             logger.info("Uploading question")
             action = ActionUpload_MCQ2MyLEO()
-            action.run(driver=driver, bank=self.question)
+            # Questions created by an upload that was cut short are skipped
+            journal = UploadJournal("myleo", username=username)
+            try:
+                action.run(
+                    driver=driver,
+                    bank=drop_duplicates(self.question),
+                    manifest=UploadManifest("myleo", username=username),
+                    concurrency=AdaptiveConcurrency(initial=UPLOAD_WORKERS, maximum=MAX_UPLOAD_WORKERS),
+                    journal=journal,
+                    resume=True,
+                )
+            finally:
+                journal.close()
             logger.info("Done")
         else:
             logger.error("Cannot log in. Perhaps incorrect username and password")
@@ -194,19 +228,40 @@ class App(tk.Tk):
             logger.error('No username given')
             return
         logger.info("Username is %s", username)
-        password = askstring("Password", "Enter Password", show="*")
-        if not password:
-            logger.error('No password given')
-            return
 
         logger.info("Creating driver for MySA")
         driver = MySADriver()
+        # A saved session does not need the password nor the browser
+        store = SessionStore()
+        connected = driver.restore_session(username, store)
+        if not connected:
+            password = askstring("Password", "Enter Password", show="*")
+            if not password:
+                logger.error('No password given')
+                return
+            # The saved session was tried already
+            connected = driver.connect(
+                username=username, password=password, store=store, restore=False
+            )
 
-        if driver.connect(username=username, password=password):
+        if connected:
             # Creates the action and tries to upload the question
             logger.info("Uploading question")
             action = ActionUpload_MCQ2MySA()
-            action.run(driver=driver, bank=self.question)
+            # Questions created by an upload that was cut short are skipped
+            journal = UploadJournal("mysa", username=username)
+            try:
+                action.run(
+                    driver=driver,
+                    bank=drop_duplicates(self.question),
+                    manifest=UploadManifest("mysa", username=username),
+                    concurrency=AdaptiveConcurrency(initial=UPLOAD_WORKERS, maximum=MAX_UPLOAD_WORKERS),
+                    page_size=ASSESSMENT_PAGE_SIZE,
+                    journal=journal,
+                    resume=True,
+                )
+            finally:
+                journal.close()
             logger.info("Done")
         else:
             logger.error("Cannot log in. Perhaps incorrect username and password")
@@ -0,0 +1,87 @@
+# Standard imports
+import json
+import logging
+import os
+import time
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.action.upload_myleo import ActionUpload_MCQ2MyLEO
+from alfred.action.upload_mysa import ActionUpload_MCQ2MySA
+from alfred.io.question import MultipleChoiceQuestion
+from support.payloads import myleo_payload, mysa_payload
+
+logger = logging.getLogger(__name__)
+
+NUM_QUESTIONS = 20000
+
+
+def create_questions(num_questions: int):
+    """Creates questions with four options and competency scores"""
+
+    return [
+        MultipleChoiceQuestion(
+            title=f"Q{index}",
+            content=f"What is {index} + 1? Pick the <best> answer & explain",
+            score=1.0,
+            est_time_min=2.0,
+            c_score=1.0,
+            a_score=2.0,
+            answer="B",
+            options={label: f"Option {label} {index}" for label in "ABCD"},
+            module="A3079C",
+        )
+        for index in range(num_questions)
+    ]
+
+
+# end create_questions()
+
+
+def cpu_per_question(func, questions) -> float:
+    """Returns the CPU time of a function in microseconds per question"""
+
+    start = time.process_time()
+    for question in questions:
+        func(question)
+    return (time.process_time() - start) / len(questions) * 1e6
+
+
+# end cpu_per_question()
+
+
+@pytest.mark.skipif(
+    os.getenv("ALFRED_BENCHMARK") is None,
+    reason="Benchmarks only run when ALFRED_BENCHMARK is set",
+)
+def test_serialize_speed():
+    """Compares the serializers with building the dataclasses and encoding them"""
+
+    questions = create_questions(NUM_QUESTIONS)
+    mysa = ActionUpload_MCQ2MySA()
+    myleo = ActionUpload_MCQ2MyLEO()
+    pair = ("A3079C", "CW1")
+
+    timings = {
+        "mysa dataclasses": cpu_per_question(
+            lambda question: json.dumps(mysa_payload(question, pair)).encode("utf-8"), questions
+        ),
+        "mysa serializer": cpu_per_question(
+            lambda question: mysa.serializer.serialize(mysa.serializer.values(question, pair)), questions
+        ),
+        "myleo dataclasses": cpu_per_question(
+            lambda question: json.dumps(myleo_payload(question)).encode("utf-8"), questions
+        ),
+        "myleo serializer": cpu_per_question(
+            lambda question: myleo.serializer.serialize(myleo.serializer.values(question)), questions
+        ),
+    }
+    for name, timing in timings.items():
+        logger.warning("%s: %.1f us per question", name, timing)
+    assert timings["mysa serializer"] < timings["mysa dataclasses"]
+    assert timings["myleo serializer"] < timings["myleo dataclasses"]
+
+
+# end test_serialize_speed()
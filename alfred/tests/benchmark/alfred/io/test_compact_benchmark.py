@@ -0,0 +1,81 @@
+# Standard imports
+import logging
+import os
+import tracemalloc
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.io.compact import ColumnarQuestionBank, compact
+from alfred.io.question import MultipleChoiceQuestion, QuestionBank
+
+logger = logging.getLogger(__name__)
+
+NUM_QUESTIONS = 100000
+
+
+def create_synthetic_bank(num_questions: int) -> QuestionBank:
+    """Creates a bank where every repeated string is its own object, as when parsed"""
+
+    question_bank = QuestionBank()
+    for index in range(num_questions):
+        question = MultipleChoiceQuestion(
+            title=f"Q{index}",
+            score=1.0,
+            est_time_min=2.0,
+            c_score=1.0,
+            content=f"What is {index} + 1?",
+            answer="".join(["B"]),
+            module="".join(["A3079", "C"]),
+            assessment="".join(["CW", "1"]),
+            qtype="".join(["CET (AY2022 ", "Term 4)"]),
+        )
+        for offset, label in enumerate("ABCD"):
+            question.options["".join([label])] = str(index + offset)
+        question_bank.questions.append(question)
+    return question_bank
+
+
+# end create_synthetic_bank()
+
+
+def measure(func, *args):
+    """Returns the result of a function and the memory it still holds"""
+
+    tracemalloc.start()
+    try:
+        result = func(*args)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, size
+
+
+# end measure()
+
+
+@pytest.mark.skipif(
+    os.getenv("ALFRED_BENCHMARK") is None,
+    reason="Benchmarks only run when ALFRED_BENCHMARK is set",
+)
+def test_compact_memory():
+    """Compares the memory of the compact representations with the dataclasses"""
+
+    # The intermediate banks are freed on return, so only the memory held
+    # by each representation is counted
+    _, bank_size = measure(create_synthetic_bank, NUM_QUESTIONS)
+    _, compact_size = measure(lambda: compact(create_synthetic_bank(NUM_QUESTIONS)))
+    _, columnar_size = measure(
+        lambda: ColumnarQuestionBank(create_synthetic_bank(NUM_QUESTIONS).questions)
+    )
+
+    logger.warning(
+        "%s questions: dataclasses %.1f MB, compact %.1f MB, columnar %.1f MB",
+        NUM_QUESTIONS, bank_size / 1e6, compact_size / 1e6, columnar_size / 1e6
+    )
+    assert compact_size < bank_size
+    assert columnar_size < compact_size
+
+
+# end test_compact_memory()
@@ -0,0 +1,45 @@
+# Standard imports
+import logging
+import os
+import time
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.io.dedup import find_duplicates
+from alfred.io.question import MultipleChoiceQuestion
+
+logger = logging.getLogger(__name__)
+
+NUM_QUESTIONS = 100000
+
+
+@pytest.mark.skipif(
+    os.getenv("ALFRED_BENCHMARK") is None,
+    reason="Benchmarks only run when ALFRED_BENCHMARK is set",
+)
+def test_find_duplicates_scale():
+    """Tests that the exact index scales to a large bank"""
+
+    questions = [
+        MultipleChoiceQuestion(
+            title=f"Q{index}",
+            content=f"What is {index % (NUM_QUESTIONS // 2)} + 1?",
+            score=1,
+            answer="A",
+            options={"A": "Calcium", "B": "Oxygen", "C": "Carbon"},
+            module="A3079C",
+            assessment="CW1",
+        )
+        for index in range(NUM_QUESTIONS)
+    ]
+    start = time.perf_counter()
+    report = find_duplicates(questions)
+    elapsed = time.perf_counter() - start
+    logger.warning("Found duplicates in %s questions in %.3fs", NUM_QUESTIONS, elapsed)
+    assert len(report.duplicates) == NUM_QUESTIONS // 2
+    assert elapsed < 1
+
+
+# end test_find_duplicates_scale()
@@ -0,0 +1,117 @@
+# Standard imports
+from dataclasses import asdict
+import logging
+import os
+import time
+
+# Third party imports
+import numpy as np
+import pandas as pd
+import pytest
+
+# Application imports
+from alfred.io.question import MultipleChoiceQuestion, QuestionBank, parse_dataframe
+
+logger = logging.getLogger(__name__)
+
+NUM_ROWS = 100000
+
+
+def create_synthetic_frame(num_rows: int) -> pd.DataFrame:
+    """Creates a question sheet with a question, four choices and a blank row"""
+
+    rows = []
+    question_id = 0
+    while len(rows) < num_rows:
+        # Only every tenth question states its module and assessment
+        carried = question_id % 10 == 0
+        rows.append({
+            "Title": f"Q{question_id}",
+            "Question": f"What is {question_id} + 1?",
+            "Score": 1,
+            "Ans": "B",
+            "Est.time (min)": 2,
+            "C marks": 1,
+            "P marks": np.nan,
+            "A marks": np.nan,
+            "Module Code": f"A{question_id // 100:04d}C" if carried else np.nan,
+            "Assessment Type": "CW1" if carried else np.nan,
+            "Qualification Type": "CET (AY2022 Term 4)" if carried else np.nan,
+        })
+        for offset, label in enumerate("ABCD"):
+            rows.append({"Title": label, "Question": question_id + offset})
+        rows.append({})
+        question_id += 1
+    return pd.DataFrame(rows[:num_rows])
+
+
+# end create_synthetic_frame()
+
+
+def parse_with_iterrows(data: pd.DataFrame) -> QuestionBank:
+    """The row by row parser that parse_dataframe replaces, kept for reference"""
+
+    question_bank = QuestionBank()
+    question = None
+    curr_module = None
+    curr_assessment = None
+    curr_qtype = None
+    for _, row in data.iterrows():
+        if pd.notnull(row.Question) and pd.notnull(row.Score):
+            question = MultipleChoiceQuestion()
+            question_bank.questions.append(question)
+            question.title = row.Title
+            question.content = row.Question
+            question.score = row.Score
+            question.answer = row.Ans
+            question.est_time_min = row["Est.time (min)"]
+            question.a_score = float(row["A marks"]) if not pd.isna(row["A marks"]) else 0
+            question.c_score = float(row["C marks"]) if not pd.isna(row["C marks"]) else 0
+            question.p_score = float(row["P marks"]) if not pd.isna(row["P marks"]) else 0
+            if pd.notnull(row["Module Code"]):
+                curr_module = row["Module Code"]
+            question.module = curr_module
+            if pd.notnull(row["Assessment Type"]):
+                curr_assessment = row["Assessment Type"]
+            question.assessment = curr_assessment
+            if pd.notnull(row["Qualification Type"]):
+                curr_qtype = row["Qualification Type"]
+            question.qtype = curr_qtype
+        elif pd.notnull(row.Question):
+            question.options[row.Title] = str(row.Question)
+        else:
+            question = None
+    return question_bank
+
+
+# end parse_with_iterrows()
+
+
+@pytest.mark.skipif(
+    os.getenv("ALFRED_BENCHMARK") is None,
+    reason="Benchmarks only run when ALFRED_BENCHMARK is set",
+)
+def test_parse_dataframe_speedup(tmp_path):
+    """Compares the columnar parser against iterrows on a 100k row workbook"""
+
+    filename = os.path.join(tmp_path, "synthetic_mcq.xlsx")
+    create_synthetic_frame(NUM_ROWS).to_excel(filename, index=False)
+    data = pd.read_excel(filename)
+
+    start = time.perf_counter()
+    expected = parse_with_iterrows(data)
+    iterrows_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = parse_dataframe(data)
+    columnar_time = time.perf_counter() - start
+
+    logger.warning(
+        "Parsed %s rows: iterrows %.3fs, columnar %.3fs (%.1fx)",
+        NUM_ROWS, iterrows_time, columnar_time, iterrows_time / columnar_time
+    )
+    assert asdict(result) == asdict(expected)
+    assert columnar_time < iterrows_time
+
+
+# end test_parse_dataframe_speedup()
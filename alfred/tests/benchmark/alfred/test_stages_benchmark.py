@@ -0,0 +1,323 @@
+# Standard imports
+import csv
+from datetime import datetime, timezone
+from functools import lru_cache
+import json
+import logging
+import os
+import platform
+import time
+
+# Third party imports
+import pytest
+import requests
+
+# Application imports
+from alfred.action.preflight import AssessmentIndex, preflight
+from alfred.action.upload_myleo import ActionUpload_MCQ2MyLEO
+from alfred.action.upload_mysa import ActionUpload_MCQ2MySA
+from alfred.io.question import MultipleChoiceQuestion, create_from_file
+from alfred.net.driver.assessment_cache import AssessmentCache
+from alfred.net.driver.mysa import (
+    AssessmentFilterParser,
+    MySADriver,
+    parse_assessment_filter,
+    parse_qtype_fullname,
+)
+from support.fake_server import FakeServer, make_assessment_filter, redirect
+
+logger = logging.getLogger(__name__)
+
+# The sizes can be narrowed down, e.g. ALFRED_BENCHMARK_SIZES=1000,10000
+SIZES = [int(size) for size in os.getenv("ALFRED_BENCHMARK_SIZES", "1000,10000,100000").split(",")]
+# Where the timings are written, and the timings of a previous release to
+# compare against. A stage fails if it is slower than TOLERANCE times the
+# baseline.
+OUTPUT = os.getenv("ALFRED_BENCHMARK_OUTPUT", "benchmark_results.json")
+BASELINE = os.getenv("ALFRED_BENCHMARK_BASELINE")
+TOLERANCE = float(os.getenv("ALFRED_BENCHMARK_TOLERANCE", "1.5"))
+
+QTYPE = "CET (AY2022 Term 4)"
+HEADER = [
+    "Title", "Question", "Score", "Ans", "Est.time (min)", "C marks", "P marks", "A marks",
+    "Module Code", "Assessment Type", "Qualification Type",
+]
+QUESTIONS_PER_MODULE = 100
+
+pytestmark = pytest.mark.skipif(
+    os.getenv("ALFRED_BENCHMARK") is None,
+    reason="Benchmarks only run when ALFRED_BENCHMARK is set",
+)
+
+
+def module_code(index: int) -> str:
+    """The module of a question, as named by make_assessment_filter()"""
+    return f"M{index // QUESTIONS_PER_MODULE:04d}C"
+
+
+@lru_cache(maxsize=None)
+def synthetic_questions(size: int):
+    """Creates questions of the modules of the synthetic assessment filter"""
+
+    return [
+        MultipleChoiceQuestion(
+            title=f"Q{index}",
+            content=f"What is {index} + 1? Pick the <best> answer & explain",
+            score=1.0,
+            est_time_min=2.0,
+            c_score=1.0,
+            answer="B",
+            options={label: f"Option {label} {index}" for label in "ABCD"},
+            module=module_code(index),
+            assessment="CW1",
+            qtype=QTYPE,
+        )
+        for index in range(size)
+    ]
+
+
+# end synthetic_questions()
+
+
+def synthetic_rows(size: int):
+    """The rows of a question sheet: a question, four choices and a blank row"""
+
+    for index in range(size):
+        # Only the first question of a module states it, as in the sheets
+        carried = index % QUESTIONS_PER_MODULE == 0
+        yield [
+            f"Q{index}", f"What is {index} + 1?", 1, "B", 2, 1, None, None,
+            module_code(index) if carried else None,
+            "CW1" if carried else None,
+            QTYPE if carried else None,
+        ]
+        for offset, label in enumerate("ABCD"):
+            yield [label, index + offset] + [None] * (len(HEADER) - 2)
+        yield [None] * len(HEADER)
+
+
+# end synthetic_rows()
+
+
+def write_workbook(filename: str, size: int):
+    """Writes a synthetic question bank as a workbook or csv file"""
+
+    if filename.endswith(".csv"):
+        with open(filename, "w", newline="", encoding="utf-8") as file:
+            writer = csv.writer(file)
+            writer.writerow(HEADER)
+            writer.writerows(synthetic_rows(size))
+        return
+
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(HEADER)
+    for row in synthetic_rows(size):
+        sheet.append(row)
+    workbook.save(filename)
+
+
+# end write_workbook()
+
+
+@lru_cache(maxsize=None)
+def synthetic_filter(size: int) -> bytes:
+    """The response of an assessment filter with size assessments"""
+
+    return json.dumps(make_assessment_filter(modules=max(1, size // 2))).encode("utf-8")
+
+
+def timed(func, *args, repeat: int = 1) -> float:
+    """Returns the shortest wall time of a function, in seconds"""
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+# end timed()
+
+
+@pytest.fixture(scope="module")
+def results():
+    """Collects the timings, and writes them to OUTPUT at the end"""
+
+    records = []
+    yield records
+    report = {
+        "created": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": records,
+    }
+    with open(OUTPUT, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+    logger.warning("Benchmark results written to %s", os.path.abspath(OUTPUT))
+
+
+# end results()
+
+
+@lru_cache(maxsize=None)
+def baseline():
+    """The timings of the baseline, by stage and size"""
+
+    if BASELINE is None:
+        return {}
+    with open(BASELINE, encoding="utf-8") as file:
+        report = json.load(file)
+    return {(record["stage"], record["size"]): record["seconds"] for record in report["results"]}
+
+
+def record(results, stage: str, size: int, seconds: float, **extra):
+    """Keeps a timing, and fails if it regressed against the baseline"""
+
+    results.append(dict(
+        stage=stage, size=size, seconds=seconds, us_per_question=seconds / size * 1e6, **extra
+    ))
+    logger.warning("%s %s: %.3fs (%.1f us per question)", stage, size, seconds, seconds / size * 1e6)
+    expected = baseline().get((stage, size))
+    # Timings too short to measure reliably are not compared
+    if expected is not None and expected > 0.01:
+        assert seconds <= expected * TOLERANCE, (
+            f"{stage} with {size} questions took {seconds:.3f}s, baseline {expected:.3f}s"
+        )
+
+
+# end record()
+
+
+@pytest.mark.parametrize("extension", [".xlsx", ".csv"])
+@pytest.mark.parametrize("size", SIZES)
+def test_create_from_file(results, tmp_path, size, extension):
+    """Times parsing a question bank"""
+
+    filename = os.path.join(tmp_path, f"synthetic_{size}{extension}")
+    write_workbook(filename, size)
+
+    bank = None
+
+    def parse():
+        nonlocal bank
+        bank = create_from_file(filename)
+
+    record(results, f"create_from_file{extension}", size, timed(parse))
+    assert len(bank.questions) == size
+
+
+# end test_create_from_file()
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_parse_assessment_filter(results, size):
+    """Times parsing the response of the assessment filter"""
+
+    content = synthetic_filter(size)
+    record(
+        results, "parse_assessment_filter", size,
+        timed(lambda: parse_assessment_filter(json.loads(content)), repeat=3),
+        bytes=len(content),
+    )
+
+    def stream():
+        chunks = (content[start:start + 65536] for start in range(0, len(content), 65536))
+        AssessmentFilterParser().parse(chunks)
+
+    record(results, "parse_assessment_filter_stream", size, timed(stream, repeat=3), bytes=len(content))
+
+
+# end test_parse_assessment_filter()
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_parse_qtype_fullname(results, size):
+    """Times extracting the qualification types"""
+
+    fullnames = [f"{module_code(index)} - Main<br />{QTYPE}" for index in range(size)]
+    record(
+        results, "parse_qtype_fullname", size,
+        timed(lambda: [parse_qtype_fullname(fullname) for fullname in fullnames], repeat=3),
+    )
+
+
+# end test_parse_qtype_fullname()
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_resolve(results, size):
+    """Times checking and resolving the questions against the assessments"""
+
+    questions = synthetic_questions(size)
+    assessment_data = parse_assessment_filter(json.loads(synthetic_filter(size)))
+    report = None
+
+    def resolve():
+        nonlocal report
+        report = preflight(questions, AssessmentIndex(assessment_data))
+
+    record(results, "resolve", size, timed(resolve, repeat=3))
+    assert report.ok
+
+
+# end test_resolve()
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_build_payload(results, size):
+    """Times building the request bodies of both actions"""
+
+    questions = synthetic_questions(size)
+    mysa = ActionUpload_MCQ2MySA()
+    myleo = ActionUpload_MCQ2MyLEO()
+    pair = ("module id", "assessment id")
+
+    def build_mysa():
+        for question in questions:
+            mysa.serializer.serialize(mysa.serializer.values(question, pair))
+
+    def build_myleo():
+        for question in questions:
+            myleo.serializer.serialize(myleo.serializer.values(question))
+
+    record(results, "payload_mysa", size, timed(build_mysa, repeat=3))
+    record(results, "payload_myleo", size, timed(build_myleo, repeat=3))
+
+
+# end test_build_payload()
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_upload_end_to_end(results, tmp_path, size):
+    """Times uploading to the fake server, from the assessment filter on"""
+
+    assessment_filter = make_assessment_filter(modules=max(1, size // QUESTIONS_PER_MODULE))
+    with FakeServer(assessment_filter=assessment_filter) as server:
+        login = server.login("user")
+        driver = MySADriver.__new__(MySADriver)
+        driver.assessment_url = "https://mysa.rp.edu.sg/authoring/api/assessments/filter"
+        driver.username = "user"
+        driver.session = requests.Session()
+        driver.session.cookies.set("session", login["session"])
+        driver.session.headers.update({"Authorization": login["Authorization"]})
+        driver.navigate = lambda url: None
+        redirect(driver, server.url)
+
+        action = redirect(ActionUpload_MCQ2MySA(), server.url)
+        action.assessment_cache = AssessmentCache(directory=str(tmp_path))
+        questions = synthetic_questions(size)
+        seconds = timed(lambda: action.run(driver, questions, max_workers=8))
+
+        summary = action.telemetry.summary()
+        record(
+            results, "upload_end_to_end", size, seconds,
+            throughput=summary["throughput"], p95=summary["p95"],
+        )
+        assert len(server.questions) == size
+
+
+# end test_upload_end_to_end()
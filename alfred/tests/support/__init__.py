@@ -0,0 +1 @@
+""" Helpers shared by the unit tests and the benchmarks """
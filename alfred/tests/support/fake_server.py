@@ -0,0 +1,647 @@
+""" Local stand-in for the MyLEO and MySA 2.0 servers
+
+The server implements the login pages, the cookie and Bearer token that the
+drivers pick up after logging in, the assessment filter, and the APIs that
+create and look up questions. Latency, errors and throttling can be injected
+for each API, so that the uploads can be load tested without production.
+
+The lookup of questions (GET /authoring/api/questions) is an assumption,
+as the filters that the real API honours are not known. It filters by every
+field given, which is only how ActionUploadBase.find_existing() would like
+it to behave.
+
+Usage, from the tests folder:
+    python -m support.fake_server --port 8000 --latency 0.05 --error-rate 0.01
+
+In code:
+
+    with FakeServer(profile=FaultProfile(latency=0.05, max_rate=100)) as server:
+        action = ActionUpload_MCQ2MySA()
+        redirect(action, server.url)
+        ...
+"""
+
+# Standard imports
+import argparse
+from collections import Counter
+from dataclasses import dataclass
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import random
+import secrets
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import parse_qs, urlsplit
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# The production sites, replaced by the url of the fake server by redirect()
+PRODUCTION_URLS = ("https://mysa.rp.edu.sg", "https://myleo.rp.edu.sg")
+
+# Permission needed to create questions in an assessment
+EDIT_PERMISSION = "authoring_questionbank_edit"
+
+
+@dataclass
+class FaultProfile:
+    """Latency and faults injected into the responses of an API
+
+    The latency is drawn from a log-normal distribution with the given
+    median, which is constant if latency_sigma is 0.
+    """
+
+    latency: float = 0.0  # Median latency, in seconds
+    latency_sigma: float = 0.0  # Shape of the log-normal distribution
+    error_rate: float = 0.0  # Fraction of requests that fail with error_status
+    error_status: int = 503
+    # Fraction of the questions that are created, but answered with 502, as
+    # when a proxy times out
+    lost_rate: float = 0.0
+    throttle_rate: float = 0.0  # Fraction of requests answered with 429
+    max_rate: Optional[float] = None  # Requests per second beyond which 429 is answered
+    retry_after: Optional[int] = None  # Retry-After header of the 429 responses
+
+
+# end class FaultProfile
+
+
+class _RateLimit:
+    """Token bucket that tells whether a request is within the rate"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.capacity = max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+# end class _RateLimit
+
+
+def make_assessment_filter(
+    modules: int = 10,
+    assessments: Sequence[str] = ("CW1", "CWF"),
+    qtypes: Sequence[str] = ("CET (AY2022 Term 4)",),
+    editable: bool = True,
+) -> Dict:
+    """Creates the response of an assessment filter
+
+    There is an entry in data for each module and qualification type, as in
+    the responses of MySA. The ids are the same every time.
+
+    Args:
+        modules (int): Number of modules, with codes M0000C, M0001C, ...
+        assessments (Sequence[str]): The assessments of each module
+        qtypes (Sequence[str]): The qualification types of each module
+        editable (bool): Whether questions can be created in the assessments
+
+    Returns:
+        The response, as decoded from JSON
+    """
+
+    permissions = ["authoring_home_navigator_view", "authoring_assessmentdetails_view"]
+    if editable:
+        permissions.append(EDIT_PERMISSION)
+
+    data = []
+    for number in range(modules):
+        module_code = f"M{number:04d}C"
+        module_id = str(uuid.uuid5(uuid.NAMESPACE_URL, module_code))
+        for qtype in qtypes:
+            data.append({
+                "qTypeFullName": f"{module_code} - Main<br />{qtype}",
+                "assessments": [
+                    {
+                        "id": str(uuid.uuid5(uuid.NAMESPACE_URL, f"{module_code}/{qtype}/{assessment}")),
+                        "isMock": False,
+                        "assessment": assessment,
+                        "makeup": False,
+                        "moduleCode": module_code,
+                        "moduleId": module_id,
+                        "paperList": [],
+                        "deliverableList": [],
+                        "permissions": permissions,
+                    }
+                    for assessment in assessments
+                ],
+            })
+    return {
+        "moduleCodeList": [f"M{number:04d}C" for number in range(modules)],
+        "assessmentList": list(assessments),
+        "totalCount": len(data),
+        "data": data,
+    }
+
+
+# end make_assessment_filter()
+
+
+def redirect(target: Any, base_url: str) -> Any:
+    """Points the urls of a driver or action to the fake server
+
+    Every attribute that is a url of MySA or MyLEO is replaced, keeping the
+    path, e.g. https://mysa.rp.edu.sg/authoring/api/questions becomes
+    http://127.0.0.1:8000/authoring/api/questions.
+
+    Returns:
+        The target
+    """
+
+    for name, value in list(vars(target).items()):
+        if isinstance(value, str):
+            for url in PRODUCTION_URLS:
+                if value.startswith(url):
+                    setattr(target, name, base_url.rstrip("/") + value[len(url):])
+    return target
+
+
+# end redirect()
+
+
+_LOGIN_PAGE = """<html><body>
+<form method="post" action="{action}">
+<input id="{user_id}" name="username"/>
+<input id="{password_id}" name="password" type="password"/>
+<button id="{button_id}" type="submit">Sign in</button>
+</form>
+</body></html>"""
+
+# Calls an API with the Bearer token, so that the drivers can find the
+# token in the performance log of the browser
+_MYSA_HOME_PAGE = """<html><body>
+<div id="userinfo">{username}</div>
+<div id="favoriteLinksContainerId"></div>
+<script>fetch("/authoring/api/me", {{headers: {{"Authorization": "Bearer {token}"}}}});</script>
+</body></html>"""
+
+_MYLEO_HOME_PAGE = """<html><body>
+<div id="nav-user-dropdown">{username}</div>
+</body></html>"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """Handles the requests to the fake server"""
+
+    # Keeps the connections alive, as the servers do
+    protocol_version = "HTTP/1.1"
+    # The headers and body are written separately, which Nagle's algorithm
+    # would hold back until the client acknowledges, about 40ms later
+    disable_nagle_algorithm = True
+
+    # (method, path) -> (name of the route, whether it is an API)
+    routes = {
+        ("GET", "/"): ("home", False),
+        ("GET", "/account/account/login"): ("mysa_login_page", False),
+        ("POST", "/account/account/login"): ("mysa_login", False),
+        ("POST", "/adfs/login"): ("myleo_login", False),
+        ("GET", "/CoreBase/Home/Index"): ("myleo_home", False),
+        ("GET", "/authoring/api/me"): ("me", False),
+        ("POST", "/authoring/api/assessments/filter"): ("filter", True),
+        ("POST", "/authoring/api/questions"): ("questions", True),
+        ("GET", "/authoring/api/questions"): ("lookup", True),
+        ("POST", "/industrystandard/api/v1/quiz/question/createquestion"): ("createquestion", True),
+    }
+
+    def log_message(self, format: str, *args):
+        logger.debug("%s " + format, self.address_string(), *args)
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def dispatch(self, method: str):
+        """Calls the handler of the route, after injecting the faults"""
+
+        fake: FakeServer = self.server.fake
+        parts = urlsplit(self.path)
+        self.query = parse_qs(parts.query)
+        length = int(self.headers.get("Content-Length") or 0)
+        self.body = self.rfile.read(length) if length else b""
+
+        route = self.routes.get((method, parts.path))
+        if route is None:
+            self.send_json(404, {"message": "Not found"})
+            return
+        name, is_api = route
+        fake.count(name)
+        profile = fake.profile_for(name)
+        self.lost = False
+        if is_api and not self.inject_faults(fake, name, profile):
+            return
+        getattr(self, f"handle_{name}")(fake)
+
+    # end dispatch()
+
+    def inject_faults(self, fake: "FakeServer", name: str, profile: FaultProfile) -> bool:
+        """Delays the response and answers with an error or 429 if drawn
+
+        Returns:
+            False if the response has been sent already
+        """
+
+        delay = fake.draw_latency(profile)
+        if delay > 0:
+            time.sleep(delay)
+
+        limit = fake.rate_limit(name, profile)
+        if (limit is not None and not limit.allow()) or fake.draw(profile.throttle_rate):
+            fake.count("throttled")
+            headers = {}
+            if profile.retry_after is not None:
+                headers["Retry-After"] = str(profile.retry_after)
+            self.send_json(429, {"message": "Too many requests"}, headers)
+            return False
+        if fake.draw(profile.error_rate):
+            fake.count("errors")
+            self.send_json(profile.error_status, {"message": "Injected error"})
+            return False
+        self.lost = fake.draw(profile.lost_rate)
+        return True
+
+    # end inject_faults()
+
+    def send_body(self, status: int, body: bytes, content_type: str, headers: Optional[Dict] = None):
+        """Sends a response"""
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, data: Any, headers: Optional[Dict] = None):
+        self.send_body(status, json.dumps(data).encode("utf-8"), "application/json", headers)
+
+    def send_html(self, page: str, headers: Optional[Dict] = None):
+        self.send_body(200, page.encode("utf-8"), "text/html; charset=utf-8", headers)
+
+    def send_redirect(self, location: str, headers: Optional[Dict] = None):
+        self.send_body(302, b"", "text/plain", dict(headers or {}, Location=location))
+
+    def session(self) -> Optional[Dict]:
+        """The session of the cookie, if logged in"""
+
+        cookie = SimpleCookie(self.headers.get("Cookie", ""))
+        if "session" not in cookie:
+            return None
+        return self.server.fake.sessions.get(cookie["session"].value)
+
+    def authorized(self, bearer: bool) -> bool:
+        """Checks the cookie, and the Bearer token if needed, else answers 401"""
+
+        session = self.session()
+        if session is not None and (
+            not bearer or self.headers.get("Authorization") == f"Bearer {session['token']}"
+        ):
+            return True
+        self.send_json(401, {"message": "Unauthorized"})
+        return False
+
+    def json_body(self) -> Optional[Dict]:
+        """The JSON body of the request, else answers 400"""
+
+        try:
+            data = json.loads(self.body)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            self.send_json(400, {"message": "Body is not a JSON object"})
+            return None
+        return data
+
+    def login(self, fake: "FakeServer", location: str, login_page: str):
+        """Logs in with the form, setting the session cookie"""
+
+        form = parse_qs(self.body.decode("utf-8"))
+        username = form.get("username", [""])[0]
+        password = form.get("password", [""])[0]
+        if fake.users.get(username) != password:
+            self.send_redirect(login_page)
+            return
+        cookie = fake.create_session(username)
+        self.send_redirect(location, {"Set-Cookie": f"session={cookie}; Path=/; HttpOnly"})
+
+    # Pages
+
+    def handle_home(self, fake: "FakeServer"):
+        session = self.session()
+        if session is None:
+            self.send_html(_LOGIN_PAGE.format(
+                action="/adfs/login", user_id="userNameInput",
+                password_id="passwordInput", button_id="submitButton",
+            ))
+        else:
+            self.send_html(_MYSA_HOME_PAGE.format(username=session["username"], token=session["token"]))
+
+    def handle_mysa_login_page(self, fake: "FakeServer"):
+        self.send_html(_LOGIN_PAGE.format(
+            action="/account/account/login", user_id="userId",
+            password_id="password", button_id="submitForm",
+        ))
+
+    def handle_mysa_login(self, fake: "FakeServer"):
+        self.login(fake, "/", "/account/account/login")
+
+    def handle_myleo_login(self, fake: "FakeServer"):
+        self.login(fake, "/CoreBase/Home/Index", "/")
+
+    def handle_myleo_home(self, fake: "FakeServer"):
+        session = self.session()
+        if session is None:
+            self.send_redirect("/")
+        else:
+            self.send_html(_MYLEO_HOME_PAGE.format(username=session["username"]))
+
+    # APIs
+
+    def handle_me(self, fake: "FakeServer"):
+        if self.authorized(bearer=True):
+            self.send_json(200, {"username": self.session()["username"]})
+
+    def handle_filter(self, fake: "FakeServer"):
+        if not self.authorized(bearer=True):
+            return
+        request = self.json_body()
+        if request is None:
+            return
+        module_codes = set(request.get("moduleCodes") or [])
+        data = fake.assessment_filter.get("data", [])
+        if module_codes:
+            data = [
+                dict(datum, assessments=assessments)
+                for datum in data
+                for assessments in [[
+                    entry for entry in datum.get("assessments", [])
+                    if entry.get("moduleCode") in module_codes
+                ]]
+                if assessments
+            ]
+        # Offset is the page, starting from 1
+        offset = max(1, int(request.get("offset", 1)))
+        limit = int(request.get("limit", len(data) or 1))
+        page = data[(offset - 1) * limit:offset * limit]
+        self.send_json(200, dict(fake.assessment_filter, totalCount=len(data), data=page))
+
+    def handle_questions(self, fake: "FakeServer"):
+        if not self.authorized(bearer=True):
+            return
+        question = self.json_body()
+        if question is None:
+            return
+        created = fake.create_question("mysa", question)
+        if self.lost:
+            self.send_json(502, {"message": "Bad gateway"})
+        else:
+            self.send_json(201, {"data": {"id": created["id"]}})
+
+    def handle_lookup(self, fake: "FakeServer"):
+        # Assumed, not modelled on the real API: every query parameter is
+        # taken as a filter on the fields of the questions
+        if not self.authorized(bearer=True):
+            return
+        params = {key: values[0] for key, values in self.query.items()}
+        self.send_json(200, {"data": fake.find_questions("mysa", params)})
+
+    def handle_createquestion(self, fake: "FakeServer"):
+        if not self.authorized(bearer=False):
+            return
+        question = self.json_body()
+        if question is None:
+            return
+        created = fake.create_question("myleo", question)
+        if self.lost:
+            self.send_json(502, {"message": "Bad gateway"})
+        else:
+            self.send_json(200, {"id": created["id"]})
+
+
+# end class _Handler
+
+
+class FakeServer:
+    """Fake MyLEO and MySA server, served from a background thread
+
+    The questions created are kept in self.questions, with the site they were
+    created on, and the requests of each route are counted in self.counters.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        profile: Optional[FaultProfile] = None,
+        profiles: Optional[Dict[str, FaultProfile]] = None,
+        users: Optional[Dict[str, str]] = None,
+        assessment_filter: Optional[Dict] = None,
+        seed: Optional[int] = None,
+    ):
+        """Constructor
+
+        Args:
+            host (str): Address to listen on
+            port (int): Port to listen on. With 0 a free port is used.
+            profile (FaultProfile): Faults injected into every API
+            profiles (Dict[str, FaultProfile]): Faults of some of the APIs,
+                by route, e.g. "questions", "lookup", "filter" or
+                "createquestion", instead of profile
+            users (Dict[str, str]): Passwords of the users that can log in.
+                Defaults to user / password.
+            assessment_filter (Dict): The assessments. Defaults to
+                make_assessment_filter().
+            seed (int): Seed of the faults drawn, for repeatable runs
+        """
+
+        self.profile = profile or FaultProfile()
+        self.profiles = profiles or {}
+        self.users = users if users is not None else {"user": "password"}
+        self.assessment_filter = (
+            assessment_filter if assessment_filter is not None else make_assessment_filter()
+        )
+        self.random = random.Random(seed)
+        self.sessions: Dict[str, Dict] = {}
+        self.questions: List[Dict] = []
+        self.counters: Counter = Counter()
+        self.lock = threading.Lock()
+        self.rate_limits: Dict[str, _RateLimit] = {}
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.fake = self
+        self.thread = None
+
+    # end __init__()
+
+    @property
+    def url(self) -> str:
+        """The url of the server, e.g. http://127.0.0.1:8000"""
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeServer":
+        """Serves from a background thread"""
+
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        logger.info("Fake server listening on %s", self.url)
+        return self
+
+    def stop(self):
+        """Stops serving"""
+
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def __enter__(self) -> "FakeServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def count(self, name: str):
+        """Counts a request"""
+        with self.lock:
+            self.counters[name] += 1
+
+    def profile_for(self, name: str) -> FaultProfile:
+        """The faults injected into a route"""
+        return self.profiles.get(name, self.profile)
+
+    def rate_limit(self, name: str, profile: FaultProfile) -> Optional[_RateLimit]:
+        """The rate limit of a route, if any"""
+
+        if profile.max_rate is None:
+            return None
+        with self.lock:
+            if name not in self.rate_limits:
+                self.rate_limits[name] = _RateLimit(profile.max_rate)
+            return self.rate_limits[name]
+
+    def draw(self, rate: float) -> bool:
+        """Draws whether a fault happens"""
+
+        if rate <= 0:
+            return False
+        with self.lock:
+            return self.random.random() < rate
+
+    def draw_latency(self, profile: FaultProfile) -> float:
+        """Draws the latency of a response"""
+
+        if profile.latency <= 0:
+            return 0.0
+        if profile.latency_sigma <= 0:
+            return profile.latency
+        with self.lock:
+            return self.random.lognormvariate(0.0, profile.latency_sigma) * profile.latency
+
+    def create_session(self, username: str) -> str:
+        """Creates a session, returning its cookie"""
+
+        cookie = secrets.token_hex(16)
+        with self.lock:
+            self.sessions[cookie] = {"username": username, "token": secrets.token_hex(16)}
+        return cookie
+
+    def login(self, username: str) -> Dict[str, str]:
+        """Logs in without the pages
+
+        Returns:
+            The cookies and headers of the session, e.g. for
+            requests.Session().cookies.update() and headers.update()
+        """
+
+        cookie = self.create_session(username)
+        return {"session": cookie, "Authorization": f"Bearer {self.sessions[cookie]['token']}"}
+
+    def create_question(self, site: str, question: Dict) -> Dict:
+        """Keeps a question created"""
+
+        with self.lock:
+            created = dict(question, id=str(len(self.questions) + 1), site=site)
+            self.questions.append(created)
+        return created
+
+    def find_questions(self, site: str, params: Dict[str, str]) -> List[Dict]:
+        """The questions created on a site with the given fields
+
+        The real lookup API may ignore some of the fields, see handle_lookup().
+        """
+
+        with self.lock:
+            return [
+                question for question in self.questions
+                if question["site"] == site
+                and all(str(question.get(key)) == value for key, value in params.items())
+            ]
+
+
+# end class FakeServer
+
+
+def main(argv: Optional[List[str]] = None):
+    """Runs the fake server until interrupted"""
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0, help="Median latency in seconds")
+    parser.add_argument("--latency-sigma", type=float, default=0.0, help="Spread of the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--lost-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--max-rate", type=float, default=None, help="Requests per second")
+    parser.add_argument("--modules", type=int, default=10, help="Modules in the assessment filter")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s:%(asctime)s: %(message)s")
+    profile = FaultProfile(
+        latency=args.latency,
+        latency_sigma=args.latency_sigma,
+        error_rate=args.error_rate,
+        lost_rate=args.lost_rate,
+        throttle_rate=args.throttle_rate,
+        max_rate=args.max_rate,
+    )
+    server = FakeServer(
+        host=args.host,
+        port=args.port,
+        profile=profile,
+        assessment_filter=make_assessment_filter(modules=args.modules),
+        seed=args.seed,
+    )
+    logger.info("Log in as user / password on %s", server.url)
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+# end main()
+
+
+if __name__ == "__main__":
+    main()
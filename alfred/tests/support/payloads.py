@@ -0,0 +1,91 @@
+""" Reference payloads, built field by field from the payload dataclasses
+
+The serializers of the actions must give the same request bodies as
+posting these with requests.
+"""
+
+# Standard imports
+from dataclasses import asdict, dataclass
+from html import escape
+import json
+from typing import Dict, Tuple
+
+# Application imports
+from alfred.action import upload_myleo, upload_mysa
+from alfred.io.question import MultipleChoiceQuestion
+
+
+def mysa_payload(question: MultipleChoiceQuestion, mod_assess_pair: Tuple[str, str]) -> Dict:
+    """The payload of a MySA 2.0 question"""
+
+    payload = upload_mysa.Payload()
+    payload.title = question.title
+    payload.score = int(question.score)
+    payload.estimatedTime = int(question.est_time_min)
+    payload.assessmentId = mod_assess_pair[1]
+    payload.moduleCode = question.module
+
+    competency_list = []
+    competency_display_list = []
+    for name, score in (
+        ("Advanced", question.a_score),
+        ("Competent", question.c_score),
+        ("Proficient", question.p_score),
+    ):
+        if score:
+            competency_list.append(name)
+            competency_display_list.append({"displayName": name, "score": score})
+    payload.proficiencyLevel = ";".join(competency_list)
+
+    content = upload_mysa.PayloadContent()
+    content.difficultyScores = competency_display_list
+    answer_id = None
+    for index, (key, option) in enumerate(question.options.items()):
+        content.options.append({"content": upload_mysa.render_options(option), "id": f"choice_{index}"})
+        if question.answer == key:
+            answer_id = f"choice_{index}"
+    content.question = upload_mysa.render_question(question.content)
+
+    scheme = upload_mysa.PayloadMarkingScheme()
+    scheme.correctAnswers.append({"id": answer_id})
+
+    payload.content = json.dumps(asdict(content))
+    payload.markingScheme = json.dumps(asdict(scheme))
+    return asdict(payload)
+
+
+# end mysa_payload()
+
+
+@dataclass
+class ChoiceItem:
+    """Choice item of a MyLEO question"""
+
+    id: str = None
+    answer: str = None
+    isCorrect: bool = False
+
+
+def myleo_payload(question: MultipleChoiceQuestion) -> Dict:
+    """The payload of a MyLEO question"""
+
+    payload = upload_myleo.Payload()
+    payload.title = escape(question.title)
+    payload.question = escape(question.content)
+    payload.selectedType = dict(upload_myleo.SELECTED_TYPE)
+    payload.score = int(question.score)
+
+    content = upload_myleo.PayloadContent()
+    for counter, (option, option_desc) in enumerate(question.options.items(), start=1):
+        item = ChoiceItem(
+            id=f"choice_{counter}",
+            answer=escape(option_desc),
+            isCorrect=option == question.answer,
+        )
+        content.choiceItems.append(asdict(item))
+
+    payload.content = json.dumps(asdict(content))
+    return asdict(payload)
+
+
+# end myleo_payload()
@@ -0,0 +1,104 @@
+""" Stand-ins for the requests session of a driver
+
+StubDriver is its own session, so the actions can post to it as they do
+to driver.session. Tests change how it answers by overriding respond().
+"""
+
+# Standard imports
+import json as json_module
+import threading
+from typing import Dict, List, Optional
+
+
+class StubResponse:
+    """Response of a stub session
+
+    The content is the body encoded as JSON, unless given. It can be read
+    at once, or in chunks like a streamed response.
+    """
+
+    def __init__(
+        self,
+        status_code: int = 200,
+        body=None,
+        content: Optional[bytes] = None,
+        error: Optional[Exception] = None,
+    ):
+        """Constructor
+
+        Args:
+            status_code (int): The status code
+            body: What json() returns
+            content (bytes): The raw content. Defaults to the body as JSON.
+            error (Exception): If given, raised by iter_content() after the
+                content, as when the connection breaks
+        """
+
+        self.status_code = status_code
+        self.body = body if body is not None else {}
+        self.content = content if content is not None else json_module.dumps(self.body).encode("utf-8")
+        self.error = error
+
+    def json(self):
+        return self.body
+
+    def iter_content(self, chunk_size: int = 1):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+        if self.error is not None:
+            raise self.error
+
+    def close(self):
+        pass
+
+
+# end class StubResponse
+
+
+class StubDriver:
+    """Driver whose session keeps what is posted, answering with respond()
+
+    The payloads are decoded from the serialized bodies the actions post,
+    and kept in posts, and the raw bodies in bodies, in the order they were
+    posted.
+    """
+
+    def __init__(self, status_code: int = 200, body=None):
+        """Constructor
+
+        Args:
+            status_code (int): The status code of every response
+            body: The body of every response
+        """
+
+        self.session = self
+        self.status_code = status_code
+        self.body = body
+        self.lock = threading.Lock()
+        self.posts: List[Dict] = []
+        self.bodies: List[bytes] = []
+
+    def post(self, url, json=None, data=None, **kwargs):
+        payload = json_module.loads(data) if data is not None else json
+        with self.lock:
+            self.posts.append(payload)
+            self.bodies.append(data)
+        return self.respond(payload)
+
+    def respond(self, payload: Dict) -> StubResponse:
+        """The response to a payload posted"""
+        return StubResponse(self.status_code, self.body)
+
+    @property
+    def titles(self) -> List[str]:
+        """The titles of the questions posted"""
+        return [payload["title"] for payload in self.posts]
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def navigate(self, url):
+        pass
+
+
+# end class StubDriver
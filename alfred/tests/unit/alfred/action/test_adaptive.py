@@ -0,0 +1,94 @@
+# Standard imports
+import time
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.action.adaptive import AdaptiveConcurrency, percentile
+from alfred.action.upload_myleo import ActionUpload_MCQ2MyLEO
+from alfred.io.question import MultipleChoiceQuestion, QuestionBank
+from support.stubs import StubDriver, StubResponse
+
+
+class ThrottlingDriver(StubDriver):
+    """Driver whose session throttles more than a number of requests at once"""
+
+    def __init__(self, capacity: int):
+        super().__init__()
+        self.capacity = capacity
+        self.in_flight = 0
+
+    def respond(self, payload):
+        with self.lock:
+            self.in_flight += 1
+            throttled = self.in_flight > self.capacity
+        time.sleep(0.002)
+        with self.lock:
+            self.in_flight -= 1
+        return StubResponse(429 if throttled else 200)
+
+
+def test_percentile():
+    """Tests the nearest rank percentiles"""
+
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 100) == 100
+    assert percentile(values, 0) == 1
+    assert percentile([], 50) == 0.0
+
+# end test_percentile()
+
+
+def test_adaptive_concurrency():
+    """Tests the increase and decrease of the limit"""
+
+    concurrency = AdaptiveConcurrency(initial=4, minimum=1, maximum=6)
+    for _ in range(4):
+        concurrency.record(0.1, 200)
+    assert concurrency.limit == 5
+    for _ in range(17):
+        concurrency.record(0.1, 200)
+    assert concurrency.limit == 6
+
+    # A burst of throttled responses only cuts the limit once
+    for _ in range(6):
+        concurrency.record(0.01, 429)
+    assert concurrency.limit == 3
+    assert concurrency.history[-1].reason == "6/6 responses throttled"
+
+    # So does a latency spike
+    for _ in range(3):
+        concurrency.record(1.0, 200)
+    assert concurrency.limit == 1
+    assert "p95 latency" in concurrency.history[-1].reason
+    assert [change.limit for change in concurrency.history] == [4, 5, 6, 3, 1]
+
+    with pytest.raises(ValueError):
+        AdaptiveConcurrency(initial=10, maximum=5)
+
+# end test_adaptive_concurrency()
+
+
+def test_adaptive_upload():
+    """Tests that an upload backs off when the server throttles it"""
+
+    bank = QuestionBank(questions=[
+        MultipleChoiceQuestion(
+            title=f"Q{index}", content="What?", score=1, answer="A", options={"A": "1"}
+        )
+        for index in range(200)
+    ])
+
+    concurrency = AdaptiveConcurrency(initial=16, maximum=32)
+    action = ActionUpload_MCQ2MyLEO()
+    action.run(driver=ThrottlingDriver(capacity=4), bank=bank, concurrency=concurrency)
+
+    assert [result.title for result in action.results] == [f"Q{index}" for index in range(200)]
+    assert concurrency.history[1].limit == 8
+    assert "throttled" in concurrency.history[1].reason
+    assert min(change.limit for change in concurrency.history) <= 4
+
+# end test_adaptive_upload()
@@ -0,0 +1,161 @@
+# Standard imports
+import asyncio
+import socket
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.action.async_upload import DEFAULT_RATES, AsyncUploader, HostRateLimiter, TokenBucket
+from alfred.action.base import UploadJob
+from alfred.action.retry import RetryPolicy
+from alfred.action.upload_myleo import ActionUpload_MCQ2MyLEO
+from alfred.io.question import MultipleChoiceQuestion, QuestionBank
+
+
+class FakeClock:
+    """Clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_token_bucket():
+    """Tests that requests beyond the burst wait for the refill"""
+
+    clock = FakeClock()
+    bucket = TokenBucket(rate=10, capacity=2, clock=clock)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    # Each request borrows against the refill, so they are spaced out
+    assert bucket.reserve() == pytest.approx(0.1)
+    assert bucket.reserve() == pytest.approx(0.2)
+
+    # The bucket refills but never beyond its capacity
+    clock.now = 10
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1)
+
+# end test_token_bucket()
+
+
+def test_host_rate_limiter():
+    """Tests that every host has its own bucket"""
+
+    limiter = HostRateLimiter(rates={"mysa.rp.edu.sg": 5}, default_rate=None)
+    mysa = limiter.bucket("https://mysa.rp.edu.sg/authoring/api/questions")
+    assert mysa.rate == 5
+    assert limiter.bucket("https://mysa.rp.edu.sg/other") is mysa
+    assert limiter.bucket("https://myleo.rp.edu.sg/api") is None
+
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+    # The sites are limited unless told otherwise
+    limiter = AsyncUploader().rate_limiter
+    for host, rate in DEFAULT_RATES.items():
+        assert limiter.bucket(f"https://{host}/api").rate == rate
+    assert limiter.bucket("http://127.0.0.1/createquestion") is None
+
+# end test_host_rate_limiter()
+
+
+def test_async_upload():
+    """Tests posting questions from an event loop with the session of a driver"""
+
+    requests = pytest.importorskip("requests")
+    web = pytest.importorskip("aiohttp.web")
+
+    state = {"in_flight": 0, "max_in_flight": 0, "auth": set(), "cookies": set()}
+
+    async def create_question(request):
+        state["in_flight"] += 1
+        state["max_in_flight"] = max(state["max_in_flight"], state["in_flight"])
+        state["auth"].add(request.headers.get("Authorization"))
+        state["cookies"].add(request.cookies.get("session"))
+        payload = await request.json()
+        await asyncio.sleep(0.01)
+        state["in_flight"] -= 1
+        number = int(payload["title"][1:])
+        if number % 3 == 0:
+            return web.json_response({"error": "failed"}, status=500)
+        return web.json_response({"data": {"id": number}})
+
+    class Driver:
+        def __init__(self):
+            self.session = requests.Session()
+            self.session.headers.update({"Authorization": "Bearer token"})
+            self.session.cookies.set("session", "secret", domain="127.0.0.1")
+
+        def navigate(self, url):
+            pass
+
+    async def main():
+        app = web.Application()
+        app.router.add_post("/createquestion", create_question)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = runner.addresses[0][1]
+
+        bank = QuestionBank(questions=[
+            MultipleChoiceQuestion(
+                title=f"Q{index}", content="What?", score=1, answer="A", options={"A": "1"}
+            )
+            for index in range(60)
+        ])
+        action = ActionUpload_MCQ2MyLEO()
+        action.create_api = f"http://127.0.0.1:{port}/createquestion"
+        uploader = AsyncUploader(max_in_flight=16)
+        try:
+            # The action runs its own event loop
+            await asyncio.get_running_loop().run_in_executor(
+                None, lambda: action.run(driver=Driver(), bank=bank, uploader=uploader)
+            )
+        finally:
+            await runner.cleanup()
+        return action.results
+
+    results = asyncio.run(main())
+    assert [result.title for result in results] == [f"Q{index}" for index in range(60)]
+    assert sum(result.success for result in results) == 40
+    assert all(result.status_code == 500 for result in results[::3])
+    assert results[1].response_id == "1"
+    assert 1 < state["max_in_flight"] <= 16
+    assert state["auth"] == {"Bearer token"}
+    assert state["cookies"] == {"secret"}
+
+# end test_async_upload()
+
+
+def test_async_upload_refused():
+    """Tests that a connection that cannot be opened is retried without a lookup"""
+
+    requests = pytest.importorskip("requests")
+    pytest.importorskip("aiohttp")
+
+    # A port that nothing listens on
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    class Driver:
+        session = requests.Session()
+
+    action = ActionUpload_MCQ2MyLEO()
+    action.create_api = f"http://127.0.0.1:{port}/createquestion"
+    action.retry = RetryPolicy(max_attempts=3, base_delay=0)
+    job = UploadJob(index=0, question=MultipleChoiceQuestion(title="Q0"), payload={"title": "Q0"})
+
+    # MyLEO has no lookup API, so only requests that were never sent are retried
+    [result] = AsyncUploader().upload(action, Driver(), [job])
+    assert not result.success
+    assert not result.sent
+    assert result.attempts == 3
+
+# end test_async_upload_refused()
@@ -0,0 +1,78 @@
+# Standard imports
+import random
+import time
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.action.concurrent import map_as_completed
+from alfred.action.upload_myleo import ActionUpload_MCQ2MyLEO
+from alfred.io.question import MultipleChoiceQuestion, QuestionBank
+from support.stubs import StubDriver, StubResponse
+
+
+class FailingDriver(StubDriver):
+    """Driver whose session fails every third question after a random delay"""
+
+    def __init__(self):
+        super().__init__()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def respond(self, payload):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(random.uniform(0, 0.01))
+        with self.lock:
+            self.in_flight -= 1
+        number = int(payload["title"][1:])
+        return StubResponse(500 if number % 3 == 0 else 200, {"id": "1"})
+
+
+def test_map_as_completed():
+    """Tests that each result comes as soon as it completes"""
+
+    consumed = []
+
+    def items():
+        for index in range(100):
+            consumed.append(index)
+            yield index
+
+    def slow_square(value):
+        # The first item is the slowest, so it does not hold back the others
+        time.sleep(0.2 if value == 0 else random.uniform(0, 0.005))
+        return value * value
+
+    results = map_as_completed(slow_square, items(), max_workers=4)
+    first = next(results)
+    assert first != 0
+    # Only a bounded number of items are read ahead
+    assert len(consumed) <= 9
+    assert sorted([first] + list(results)) == [index * index for index in range(100)]
+
+# end test_map_as_completed()
+
+
+def test_concurrent_upload():
+    """Tests uploading with several workers"""
+
+    bank = QuestionBank(questions=[
+        MultipleChoiceQuestion(
+            title=f"Q{index}", content="What?", score=1, answer="A", options={"A": "1"}
+        )
+        for index in range(60)
+    ])
+
+    driver = FailingDriver()
+    action = ActionUpload_MCQ2MyLEO()
+    action.run(driver=driver, bank=bank, max_workers=16)
+
+    assert driver.max_in_flight > 1
+    assert [result.title for result in action.results] == [f"Q{index}" for index in range(60)]
+    assert sum(result.success for result in action.results) == 40
+    assert all(result.status_code == 500 for result in action.results[::3])
+
+# end test_concurrent_upload()
@@ -0,0 +1,191 @@
+# Standard imports
+import sqlite3
+import time
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.action.base import UploadJob, UploadResult
+from alfred.action.journal import UploadJournal
+from alfred.action.retry import RetryPolicy
+from alfred.action.upload_mysa import ActionUpload_MCQ2MySA
+from alfred.io.question import MultipleChoiceQuestion, question_fingerprint
+from support.stubs import StubDriver, StubResponse
+
+
+class CrashingDriver(StubDriver):
+    """Driver whose session stores the questions and crashes after a number of posts
+
+    The crash happens after the question is stored, as when the app dies
+    while waiting for the response.
+    """
+
+    def __init__(self, crash_after=None, slow=(), timeout=()):
+        super().__init__()
+        self.crash_after = crash_after
+        self.slow = slow  # Titles of the questions answered late
+        self.timeout = timeout  # Titles of the questions that time out once stored
+        self.stored = []
+
+    def respond(self, payload):
+        if payload["title"] in self.slow:
+            time.sleep(0.2)
+        self.stored.append(dict(payload, id=f"id{len(self.stored)}"))
+        if len(self.posts) == self.crash_after:
+            raise KeyboardInterrupt()
+        if payload["title"] in self.timeout:
+            raise TimeoutError("timed out")
+        return StubResponse(201, {"data": {"id": f"id{len(self.stored) - 1}"}})
+
+    def get(self, url, params=None, **kwargs):
+        items = [
+            item for item in self.stored
+            if all(item[field] == value for field, value in params.items())
+        ]
+        return StubResponse(200, items)
+
+
+def create_jobs(action: ActionUpload_MCQ2MySA, count: int):
+    """Creates the jobs of a number of questions"""
+
+    for index in range(count):
+        question = MultipleChoiceQuestion(
+            title=f"Q{index}", content="What?", score=1, est_time_min=1, answer="A",
+            options={"A": "1"}, module="C100",
+        )
+        payload = action.serializer.values(question, ("C100", "A1"))
+        yield UploadJob(
+            index=index,
+            question=question,
+            payload=payload,
+            fingerprint=question_fingerprint(question),
+            body=action.serializer.serialize(payload),
+        )
+
+
+def test_journal(tmp_path):
+    """Tests the entries of the journal"""
+
+    path = str(tmp_path / "journal.sqlite3")
+    journal = UploadJournal("mysa", path=path)
+    jobs = list(create_jobs(ActionUpload_MCQ2MySA(), 3))
+    for job in jobs:
+        journal.start(job)
+    journal.record(UploadResult(index=0, title="Q0", success=True, fingerprint=jobs[0].fingerprint))
+    journal.record(UploadResult(index=1, title="Q1", fingerprint=jobs[1].fingerprint))
+
+    assert journal.confirmed() == {jobs[0].fingerprint}
+    assert journal.in_doubt() == {jobs[2].fingerprint}
+    # Each target and each user has their own entries
+    assert UploadJournal("myleo", path=path).confirmed() == set()
+    assert UploadJournal("mysa", path=path, username="bob").confirmed() == set()
+    journal.close()
+
+    connection = sqlite3.connect(path)
+    assert connection.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0] == 5
+
+    # Users are told apart without their names on disk
+    journal = UploadJournal("mysa", path=path, username="Alice")
+    journal.start(jobs[0])
+    journal.record(UploadResult(index=0, title="Q0", success=True, fingerprint=jobs[0].fingerprint))
+    assert UploadJournal("mysa", path=path, username="alice ").confirmed() == {jobs[0].fingerprint}
+    assert UploadJournal("mysa", path=path, username="bob").confirmed() == set()
+    assert "alice" not in str(connection.execute("SELECT * FROM entries").fetchall()).lower()
+
+    # Finishing forgets the questions settled, but not those in doubt
+    journal.start(jobs[1])
+    journal.record(UploadResult(
+        index=1, title="Q1", fingerprint=jobs[1].fingerprint, in_doubt=True
+    ))
+    journal.finish()
+    assert journal.confirmed() == set()
+    assert journal.in_doubt() == {jobs[1].fingerprint}
+    journal.close()
+
+# end test_journal()
+
+
+def test_resume(tmp_path):
+    """Tests resuming an upload that crashed"""
+
+    path = str(tmp_path / "journal.sqlite3")
+    action = ActionUpload_MCQ2MySA()
+    driver = CrashingDriver(crash_after=4)
+    journal = UploadJournal("mysa", path=path)
+    with pytest.raises(KeyboardInterrupt):
+        action.upload(driver, create_jobs(action, 10), journal=journal, resume=True)
+    journal.close()
+
+    # Q3 was created before the crash, so it is found instead of posted again
+    driver.crash_after = None
+    journal = UploadJournal("mysa", path=path)
+    assert len(journal.confirmed()) == 3
+    assert len(journal.in_doubt()) == 1
+    results = action.upload(driver, create_jobs(action, 10), journal=journal, resume=True)
+    assert [result.title for result in results] == [f"Q{index}" for index in range(3, 10)]
+    assert all(result.success for result in results)
+    assert results[0].response_id == "id3"
+    assert driver.titles == [f"Q{index}" for index in range(10)]
+    # The upload ran to the end, so the next one starts afresh
+    assert journal.confirmed() == set()
+    assert journal.in_doubt() == set()
+
+# end test_resume()
+
+
+def test_journal_as_completed(tmp_path):
+    """Tests that each question is journaled as soon as it completes"""
+
+    path = str(tmp_path / "journal.sqlite3")
+    action = ActionUpload_MCQ2MySA()
+    journal = UploadJournal("mysa", path=path)
+    recorded = []
+    record = journal.record
+    journal.record = lambda result: (recorded.append(result.title), record(result))
+    results = action.upload(
+        CrashingDriver(slow=("Q0",)), create_jobs(action, 6), max_workers=4, journal=journal
+    )
+    journal.close()
+    assert [result.title for result in results] == [f"Q{index}" for index in range(6)]
+
+    # The slow first question did not hold back the others
+    assert recorded[-1] == "Q0"
+
+# end test_journal_as_completed()
+
+
+def test_resume_in_doubt(tmp_path):
+    """Tests that a question whose post failed ambiguously is not posted again blindly"""
+
+    path = str(tmp_path / "journal.sqlite3")
+    action = ActionUpload_MCQ2MySA()
+    action.retry = RetryPolicy(max_attempts=3, base_delay=0)
+    # Without a lookup API, nothing tells whether Q1 was created
+    action.lookup_api = None
+    driver = CrashingDriver(timeout=("Q1",))
+    journal = UploadJournal("mysa", path=path, username="alice")
+    results = action.upload(driver, create_jobs(action, 3), journal=journal, resume=True)
+    assert [result.success for result in results] == [True, False, True]
+    assert results[1].in_doubt
+    assert journal.in_doubt() == {results[1].fingerprint}
+
+    # Resuming leaves it alone, however many times
+    driver.timeout = ()
+    for _ in range(2):
+        results = action.upload(driver, create_jobs(action, 3), journal=journal, resume=True)
+        assert [result.success for result in results] == [True, False, True]
+        assert results[1].error.startswith("In doubt")
+    assert driver.titles.count("Q1") == 1
+
+    # With a lookup, it is found instead of posted again
+    action.lookup_api = action.create_api
+    action.lookup_filtered = True
+    results = action.upload(driver, create_jobs(action, 3), journal=journal, resume=True)
+    assert results[1].success
+    assert driver.titles.count("Q1") == 1
+    assert journal.in_doubt() == set()
+    journal.close()
+
+# end test_resume_in_doubt()
@@ -0,0 +1,48 @@
+# Standard imports
+import os
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.action.manifest import UploadManifest
+from alfred.action.upload_myleo import ActionUpload_MCQ2MyLEO
+from alfred.io.question import MultipleChoiceQuestion, QuestionBank
+from support.stubs import StubDriver
+
+
+def test_upload_manifest(tmp_path):
+    """Tests that only new or changed questions are uploaded again"""
+
+    bank = QuestionBank(questions=[
+        MultipleChoiceQuestion(
+            title=f"Q{index}", content="What?", score=1, answer="A", options={"A": "1"}
+        )
+        for index in range(3)
+    ])
+
+    driver = StubDriver()
+    action = ActionUpload_MCQ2MyLEO()
+    action.run(driver=driver, bank=bank, manifest=UploadManifest("myleo", str(tmp_path)))
+    assert len(driver.posts) == 3
+    assert os.path.exists(os.path.join(tmp_path, "myleo.json"))
+
+    # Only the changed question is uploaded on the next run
+    bank.questions[1].options["A"] = "2"
+    driver = StubDriver()
+    manifest = UploadManifest("myleo", str(tmp_path))
+    assert len(manifest) == 3
+    action.run(driver=driver, bank=bank, manifest=manifest)
+    assert driver.titles == ["Q1"]
+
+    # Other targets have their own manifest
+    assert len(UploadManifest("mysa", str(tmp_path))) == 0
+
+    # And so do other users
+    manifest = UploadManifest("myleo", str(tmp_path), username="staff1")
+    manifest.add("fingerprint")
+    manifest.save()
+    assert len(UploadManifest("myleo", str(tmp_path), username="STAFF1")) == 1
+    assert len(UploadManifest("myleo", str(tmp_path), username="staff2")) == 0
+
+# end test_upload_manifest()
@@ -0,0 +1,201 @@
+# Standard imports
+import json
+import os
+from pathlib import Path
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.action.preflight import AssessmentIndex, preflight, resolve_pages
+from alfred.action.upload_mysa import ActionUpload_MCQ2MySA
+from alfred.io.question import MultipleChoiceQuestion
+from alfred.net.driver.assessment_cache import AssessmentCache
+from alfred.net.driver.mysa import AssessmentData, parse_assessment_filter
+
+
+def create_question(**kwargs) -> MultipleChoiceQuestion:
+    """Creates a valid question, overriding the given fields"""
+
+    values = dict(
+        title="Q1",
+        content="What is 1 + 1?",
+        score=1.0,
+        est_time_min=1.0,
+        answer="B",
+        options={"A": "1", "B": "2"},
+        module="A3079C",
+        assessment="CW1",
+    )
+    values.update(kwargs)
+    return MultipleChoiceQuestion(**values)
+
+
+def test_preflight():
+    """Tests checking a bank against the assessment filter"""
+
+    data_filename = os.path.join(
+        Path(__file__).parents[3],
+        "resources",
+        "alfred",
+        "net",
+        "driver",
+        "assessment_filter.json",
+    )
+    with open(data_filename) as file:
+        index = AssessmentIndex(parse_assessment_filter(json.load(file)))
+
+    questions = [
+        create_question(),
+        create_question(title="Q2", qtype="CET (AY2022 Term 4)", assessment="CWF"),
+        create_question(title="Q3", module="A9999C"),
+        create_question(title="Q4", qtype="PFP (AY2022 Semester 2)"),
+        create_question(title="Q5", answer="E"),
+        create_question(title="Q6", score=float("nan")),
+        create_question(title="Q7", est_time_min="two"),
+    ]
+    report = preflight(iter(questions), index)
+
+    assert report.total == 7
+    assert not report.ok
+    assert [planned.index for planned in report.plan] == [0, 1]
+    assert report.plan[0].mod_assess_pair == (
+        "e6ce681e-9dae-40a9-9ba6-5be34713962f",
+        "19fd8729-8da5-4deb-81b1-5deeb018b0ec",
+    )
+    assert report.plan[1].mod_assess_pair[1] == "93a8a05d-5079-4127-977b-bfacb8d91d4b"
+
+    messages = {issue.title: issue.message for issue in report.issues}
+    assert "cannot be found" in messages["Q3"]
+    assert "QType PFP (AY2022 Semester 2) not found" in messages["Q4"]
+    assert "Answer 'E'" in messages["Q5"]
+    assert "Score" in messages["Q6"]
+    assert "Estimated time" in messages["Q7"]
+
+    # Without a qualification type the assessment must be unique
+    assessment_data = AssessmentData({
+        ("A3079C", "CW1"): {"CET (AY2022 Term 4)": ("m1", "a1"), "PFP": ("m1", "a2")}
+    })
+    with pytest.raises(ValueError, match="more than 1 entry"):
+        AssessmentIndex(assessment_data).resolve(create_question())
+
+# end test_preflight()
+
+
+def test_resolve_pages():
+    """Tests resolving the questions as the pages of the filter arrive"""
+
+    questions = [
+        create_question(),
+        create_question(title="Q2", qtype="PFP"),
+        create_question(title="Q3", module="A9999C"),
+        create_question(title="Q4", answer="E"),
+        create_question(title="Q5", qtype="CET", assessment="CWF"),
+    ]
+    pages = [
+        AssessmentData({("A3079C", "CW1"): {"PFP": ("m1", "a2")}}),
+        AssessmentData({("A3079C", "CW1"): {"CET": ("m1", "a1")}}),
+        AssessmentData({("A3079C", "CWF"): {"CET": ("m1", "a3")}}),
+    ]
+    resolved = []
+
+    def arrive():
+        for page in pages:
+            yield page
+            resolved.append([planned.question.title for planned in report.plan])
+
+    report = preflight(questions)
+    assessment_data = AssessmentData()
+    planned = list(resolve_pages(report, arrive(), assessment_data))
+
+    # Q2 is resolved by the first page, before the others have arrived
+    assert resolved == [["Q2"], ["Q2"], ["Q2", "Q5"]]
+    assert [item.question.title for item in planned] == ["Q2", "Q5"]
+    assert report.total == 5
+    assert [issue.title for issue in report.issues] == ["Q1", "Q3", "Q4"]
+    # Q1 has no qualification type, and the second page made it ambiguous
+    assert "more than 1 entry" in report.issues[0].message
+    assert assessment_data.module_assessment_map[("A3079C", "CW1")] == {
+        "PFP": ("m1", "a2"), "CET": ("m1", "a1")
+    }
+
+# end test_resolve_pages()
+
+
+class AssessmentDriver:
+    """Driver that returns the given assessments, one call after another"""
+
+    def __init__(self, responses):
+        self.username = "user"
+        self.responses = list(responses)
+        self.requests = []
+
+    def get_assessment_data(self, module_codes=None, cache=None):
+        self.requests.append(sorted(module_codes))
+        data = self.responses.pop(0)
+        cache.put(self.username, module_codes, data)
+        return data
+
+    def navigate(self, url):
+        pass
+
+
+def test_resolve_misses(tmp_path):
+    """Tests fetching the cached modules again when questions do not resolve"""
+
+    def stale():
+        return AssessmentData({("A3079C", "CW1"): {"CET": ("m1", "a1")}})
+
+    fresh = AssessmentData({
+        ("A3079C", "CW1"): {"CET": ("m1", "a1")},
+        ("A3079C", "CWF"): {"CET": ("m1", "a3")},
+    })
+    action = ActionUpload_MCQ2MySA()
+    action.assessment_cache = AssessmentCache(directory=str(tmp_path))
+    action.assessment_cache.put("user", ["A3079C"], stale())
+    driver = AssessmentDriver([stale(), fresh])
+    questions = [create_question(), create_question(title="Q2", assessment="CWF")]
+
+    assert action.run(driver, questions, dry_run=str(tmp_path / "bodies.jsonl"))
+    # The cached module was fetched again, and both questions were resolved
+    assert driver.requests == [["A3079C"], ["A3079C"]]
+    assert len(action.results) == 2
+
+    # A module that was not cached is not fetched again
+    action.assessment_cache.invalidate("user")
+    driver = AssessmentDriver([stale()])
+    assert action.run(driver, questions, dry_run=str(tmp_path / "bodies.jsonl"))
+    assert driver.requests == [["A3079C"]]
+    assert len(action.results) == 1
+
+# end test_resolve_misses()
+
+
+class PagedAssessmentDriver(AssessmentDriver):
+    """Driver that returns the given pages, then fails"""
+
+    def iter_assessment_data(self, module_codes=None, cache=None, page_size=None):
+        yield from self.responses
+        raise ConnectionError("Unable to retrieve page 2 of the assessment filter")
+
+
+def test_paged_run_failure(tmp_path, caplog):
+    """Tests that a paged run fails when no page of the filter arrived"""
+
+    action = ActionUpload_MCQ2MySA()
+    action.assessment_cache = AssessmentCache(directory=str(tmp_path))
+    questions = [create_question(qtype="CET"), create_question(title="Q2", assessment="CWF")]
+    dry_run = str(tmp_path / "bodies.jsonl")
+
+    # Only the cached modules, without assessments, arrived
+    driver = PagedAssessmentDriver([AssessmentData()])
+    assert not action.run(driver, questions, page_size=10, dry_run=dry_run)
+    assert "Unable to retrieve assessment information" in caplog.text
+    assert "cannot be found" not in caplog.text
+
+    # The questions of the pages that arrived are still uploaded
+    driver = PagedAssessmentDriver([AssessmentData({("A3079C", "CW1"): {"CET": ("m1", "a1")}})])
+    assert action.run(driver, questions, page_size=10, dry_run=dry_run)
+    assert [result.title for result in action.results] == ["Q1"]
+
+# end test_paged_run_failure()
@@ -0,0 +1,174 @@
+# Standard imports
+from typing import List
+
+# Third party imports
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError, ProtocolError
+
+# Application imports
+from alfred.action.base import UploadJob
+from alfred.action.retry import RetryPolicy, never_sent
+from alfred.action.upload_mysa import ActionUpload_MCQ2MySA
+from alfred.io.question import MultipleChoiceQuestion
+from support.stubs import StubDriver, StubResponse
+
+
+class FlakySession(StubDriver):
+    """Session answering with the given outcomes in turn
+
+    Each outcome is a status code, or an exception to raise. A question is
+    stored when the outcome is 201, or when the server fails after storing
+    it.
+    """
+
+    def __init__(
+        self,
+        outcomes: List,
+        stored_on_failure: bool = False,
+        lookup_status: int = 200,
+        filtered: bool = True,
+    ):
+        super().__init__()
+        self.outcomes = list(outcomes)
+        self.stored_on_failure = stored_on_failure
+        self.lookup_status = lookup_status
+        self.filtered = filtered
+        self.stored = []
+        self.lookups = 0
+
+    def respond(self, payload):
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            if self.stored_on_failure:
+                self.stored.append(dict(payload, id=f"id{len(self.stored)}"))
+            raise outcome
+        if outcome == 201 or (outcome >= 500 and self.stored_on_failure):
+            self.stored.append(dict(payload, id=f"id{len(self.stored)}"))
+        return StubResponse(outcome, {"data": {"id": f"id{len(self.stored) - 1}"}})
+
+    def get(self, url, params=None, **kwargs):
+        self.lookups += 1
+        items = [
+            item for item in self.stored
+            if not self.filtered or all(item[field] == value for field, value in params.items())
+        ]
+        return StubResponse(self.lookup_status, {"data": {"items": items}})
+
+
+def refused() -> requests.exceptions.ConnectionError:
+    """The error of requests when the connection is refused"""
+
+    return requests.exceptions.ConnectionError(
+        MaxRetryError(None, "/authoring/api/questions", NewConnectionError(None, "Connection refused"))
+    )
+
+
+def create_job(action: ActionUpload_MCQ2MySA) -> UploadJob:
+    """Creates the job of a question for the action"""
+
+    question = MultipleChoiceQuestion(
+        title="Q1", content="What?", score=1, est_time_min=1, answer="A",
+        options={"A": "1"}, module="C100",
+    )
+    payload = action.serializer.values(question, ("C100", "A1"))
+    return UploadJob(
+        index=0, question=question, payload=payload, body=action.serializer.serialize(payload)
+    )
+
+
+def test_retry_policy():
+    """Tests which failures are retried and how long to wait"""
+
+    policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=3)
+    assert policy.should_retry(None, 1)
+    assert policy.should_retry(429, 2)
+    assert not policy.should_retry(429, 3)
+    assert not policy.should_retry(400, 1)
+    assert all(0 <= policy.delay(attempt) <= 3 for attempt in range(1, 10))
+    assert not policy.is_ambiguous(429)
+    assert policy.is_ambiguous(502)
+    assert policy.is_ambiguous(None)
+    assert not policy.is_ambiguous(None, sent=False)
+
+    # Only the connections that could not be opened were never sent
+    assert never_sent(refused())
+    assert never_sent(requests.exceptions.ConnectTimeout("connect timed out"))
+    assert not never_sent(requests.exceptions.ReadTimeout("read timed out"))
+    assert not never_sent(requests.exceptions.ConnectionError(ProtocolError("Connection aborted")))
+    assert not never_sent(ConnectionResetError("reset"))
+
+# end test_retry_policy()
+
+
+@pytest.mark.parametrize(
+    "outcomes, stored_on_failure, lookup_status, posts, lookups, success",
+    [
+        # Turned away, so posted again without a lookup
+        ([429, 201], False, 200, 2, 0, True),
+        # The connection could not be opened, so posted again without a lookup
+        ([refused(), 201], False, 200, 2, 0, True),
+        # Connection reset before the question was stored
+        ([ConnectionResetError("reset"), 201], False, 200, 2, 1, True),
+        # Timed out after the question was stored
+        ([TimeoutError("timed out"), 201], True, 200, 1, 1, True),
+        ([503, 201], True, 200, 1, 1, True),
+        # The lookup cannot tell, so the question is not posted again
+        ([500, 201], False, 500, 1, 1, False),
+        # Not retried
+        ([400, 201], False, 200, 1, 0, False),
+        # Gives up after max_attempts
+        ([429, 429, 429, 201], False, 200, 3, 0, False),
+    ],
+)
+def test_post_payload_retries(outcomes, stored_on_failure, lookup_status, posts, lookups, success):
+    """Tests that transient failures are retried without creating duplicates"""
+
+    action = ActionUpload_MCQ2MySA()
+    action.lookup_filtered = True
+    action.retry = RetryPolicy(max_attempts=3, base_delay=0)
+    driver = FlakySession(outcomes, stored_on_failure, lookup_status)
+
+    result = action.post_payload(driver, create_job(action))
+    assert result.success == success
+    assert len(driver.posts) == posts
+    assert driver.lookups == lookups
+    assert result.attempts == posts
+    assert len(driver.stored) == (1 if success else 0)
+    if success:
+        assert result.response_id == "id0"
+
+# end test_post_payload_retries()
+
+
+def test_find_existing_uncertain():
+    """Tests that a question not found is left in doubt unless the lookup is trusted"""
+
+    action = ActionUpload_MCQ2MySA()
+    action.retry = RetryPolicy(max_attempts=3, base_delay=0)
+
+    # The lookup API is not known to filter, so a miss is not trusted
+    driver = FlakySession([ConnectionResetError("reset"), 201])
+    result = action.post_payload(driver, create_job(action))
+    assert not result.success
+    assert (len(driver.posts), driver.lookups) == (1, 1)
+
+    # Other questions in the response show that the filters were ignored
+    action.lookup_filtered = True
+    driver = FlakySession([201], filtered=False)
+    driver.stored.append({"title": "Other", "moduleCode": "C100", "assessmentId": "A1"})
+    with pytest.raises(LookupError):
+        action.find_existing(driver, create_job(action))
+
+    # Without a lookup API, only the questions turned away are posted again
+    action.lookup_api = None
+    driver = FlakySession([503, 201])
+    assert not action.post_payload(driver, create_job(action)).success
+    assert len(driver.posts) == 1
+    driver = FlakySession([429, 201])
+    assert action.post_payload(driver, create_job(action)).success
+    driver = FlakySession([refused(), 201])
+    assert action.post_payload(driver, create_job(action)).success
+    assert len(driver.posts) == 2
+
+# end test_find_existing_uncertain()
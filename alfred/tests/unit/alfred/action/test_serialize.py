@@ -0,0 +1,127 @@
+# Standard imports
+from dataclasses import asdict, dataclass, field
+import json
+import random
+from typing import Dict, List
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.action import upload_myleo, upload_mysa
+from alfred.action.serialize import PayloadTemplate, RawJSON
+from alfred.action.upload_myleo import ActionUpload_MCQ2MyLEO
+from alfred.action.upload_mysa import ActionUpload_MCQ2MySA
+from alfred.io.question import MultipleChoiceQuestion
+from support.payloads import myleo_payload, mysa_payload
+
+# Text with characters that need escaping in html or JSON
+SAMPLES = [
+    "What is 1 + 1?",
+    'Pick the "best" <answer> & explain',
+    "Line\nbreak\tand tab \\ backslash",
+    "Unicode: café, 日本語, emoji 😀",
+    "",
+]
+
+
+@dataclass
+class Sample:
+    """Payload with fields of every type"""
+
+    name: str = None
+    count: int = 0
+    ratio: float = 0.5
+    flag: bool = False
+    items: List[str] = field(default_factory=list)
+    extra: Dict = field(default_factory=dict)
+    missing: str = None
+
+
+def create_questions(count: int) -> List[MultipleChoiceQuestion]:
+    """Creates questions with random text, scores and options"""
+
+    generator = random.Random(0)
+    questions = []
+    for index in range(count):
+        options = {
+            label: generator.choice(SAMPLES) + str(index)
+            for label in "ABCDE"[:generator.randint(1, 5)]
+        }
+        questions.append(MultipleChoiceQuestion(
+            title=generator.choice([f"Q{index}", generator.choice(SAMPLES)]),
+            content=generator.choice(SAMPLES),
+            score=generator.choice([1, 2.0, 5]),
+            est_time_min=generator.choice([1, 3.0]),
+            c_score=generator.choice([None, 0, 1, 2.5]),
+            p_score=generator.choice([None, 1]),
+            a_score=generator.choice([None, 3]),
+            answer=generator.choice(list(options) + ["Z"]),
+            options=options,
+            module="A3079C",
+        ))
+    return questions
+
+
+# end create_questions()
+
+
+def test_payload_template():
+    """Tests that the template renders the same text as json.dumps"""
+
+    template = PayloadTemplate(Sample, ("name", "ratio", "items"), constants={"extra": {"a": [1]}})
+    values = {"name": 'Say "hi" 😀', "ratio": 1.25, "items": ["x", "y"]}
+    expected = json.dumps(asdict(Sample(extra={"a": [1]}, **values)))
+    assert template.render(values) == expected
+    assert template.render(dict(values, items=RawJSON('["x", "y"]'))) == expected
+
+    with pytest.raises(ValueError):
+        PayloadTemplate(Sample, ("unknown",))
+
+# end test_payload_template()
+
+
+def test_serializers():
+    """Tests that the request bodies are the same as requests gives, byte for byte"""
+
+    requests = pytest.importorskip("requests")
+
+    def request_body(payload: Dict) -> bytes:
+        request = requests.Request("POST", "https://example.com", json=payload)
+        return request.prepare().body
+
+    mysa = ActionUpload_MCQ2MySA()
+    myleo = ActionUpload_MCQ2MyLEO()
+    for question in create_questions(200):
+        expected = request_body(mysa_payload(question, ("M1", "A1")))
+        assert mysa.serializer.serialize(mysa.serializer.values(question, ("M1", "A1"))) == expected
+
+        expected = request_body(myleo_payload(question))
+        assert myleo.serializer.serialize(myleo.serializer.values(question)) == expected
+
+# end test_serializers()
+
+
+def test_orjson_backend():
+    """Tests that a backend giving bytes, such as orjson, gives the same payloads"""
+
+    orjson = pytest.importorskip("orjson")
+
+    def decode(payload: Dict) -> Dict:
+        # orjson does not put spaces after the separators, so the payloads
+        # are compared decoded, with the JSON text inside them as well
+        payload = dict(payload)
+        for name in ("content", "markingScheme"):
+            if name in payload:
+                payload[name] = json.loads(payload[name])
+        return payload
+
+    mysa = upload_mysa.PayloadSerializer(dumps=orjson.dumps)
+    myleo = upload_myleo.PayloadSerializer(dumps=orjson.dumps)
+    for question in create_questions(50):
+        body = mysa.serialize(mysa.values(question, ("M1", "A1")))
+        assert decode(json.loads(body)) == decode(mysa_payload(question, ("M1", "A1")))
+        body = myleo.serialize(myleo.values(question))
+        assert decode(json.loads(body)) == decode(myleo_payload(question))
+
+# end test_orjson_backend()
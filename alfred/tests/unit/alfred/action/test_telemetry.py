@@ -0,0 +1,94 @@
+# Standard imports
+import logging
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.action.retry import RetryPolicy
+from alfred.action.telemetry import Histogram, UploadTelemetry
+from alfred.action.upload_myleo import ActionUpload_MCQ2MyLEO
+from alfred.io.question import MultipleChoiceQuestion, QuestionBank
+from support.stubs import StubDriver, StubResponse
+
+
+class ThrottlingDriver(StubDriver):
+    """Driver whose session throttles every fourth post"""
+
+    def respond(self, payload):
+        return StubResponse(429 if len(self.posts) % 4 == 0 else 200, {"id": 1})
+
+
+def test_histogram():
+    """Tests the percentiles estimated from the buckets"""
+
+    histogram = Histogram()
+    assert histogram.percentile(50) == 0.0
+    for value in range(1, 1001):
+        histogram.record(value / 1000)
+    assert histogram.count == 1000
+    assert histogram.maximum == 1.0
+    # Within the width of a bucket
+    assert histogram.percentile(50) == pytest.approx(0.5, rel=0.2)
+    assert histogram.percentile(99) == pytest.approx(0.99, rel=0.2)
+    assert histogram.percentile(100) == 1.0
+
+    histogram.record(1000.0)
+    assert histogram.percentile(100) == 1000.0
+
+# end test_histogram()
+
+
+def test_disabled_telemetry():
+    """Tests that nothing is recorded when disabled"""
+
+    telemetry = UploadTelemetry(enabled=False)
+    telemetry.start()
+    telemetry.count("created")
+    telemetry.record(0.1, 200, 10, 10)
+    assert telemetry.counters == {}
+    assert telemetry.latency.count == 0
+
+# end test_disabled_telemetry()
+
+
+def test_upload_telemetry(caplog):
+    """Tests the telemetry of an upload"""
+
+    bank = QuestionBank(questions=[
+        MultipleChoiceQuestion(
+            title=f"Q{index}", content="What?", score=1, answer="A", options={"A": "1"}
+        )
+        for index in range(30)
+    ])
+    action = ActionUpload_MCQ2MyLEO()
+    action.retry = RetryPolicy(base_delay=0)
+
+    with caplog.at_level(logging.INFO):
+        action.run(driver=ThrottlingDriver(), bank=bank)
+    # The bodies are not logged at INFO
+    assert not any("Posting question:" in record.message for record in caplog.records)
+    assert any("Latency p50" in record.message for record in caplog.records)
+
+    summary = action.telemetry.summary()
+    assert summary["counters"]["created"] == 30
+    assert summary["counters"]["retries"] == 9
+    assert summary["counters"]["status_429"] == 9
+    assert summary["counters"]["requests"] == 39
+    # The retries are sent again
+    sizes = [
+        len(action.serializer.serialize(action.serializer.values(question)))
+        for question in bank.questions
+    ]
+    assert sum(sizes) < summary["bytes_sent"] <= sum(sizes) + 9 * max(sizes)
+    assert summary["bytes_received"] == 39 * len(b'{"id": 1}')
+    assert summary["throughput"] > 0
+
+    # Every question is logged when sampled
+    caplog.clear()
+    action.telemetry.sample_rate = 1.0
+    with caplog.at_level(logging.INFO):
+        action.run(driver=ThrottlingDriver(), bank=bank)
+    assert sum("Posting question:" in record.message for record in caplog.records) == 39
+
+# end test_upload_telemetry()
@@ -0,0 +1,38 @@
+# Standard imports
+import json
+import os
+from pathlib import Path
+
+# Third party imports
+
+# Application imports
+from alfred.cli.dry_run import main
+
+
+def test_dry_run(tmp_path, monkeypatch):
+    """Tests writing the request bodies of a workbook from the command line"""
+
+    # The parsed bank is not cached in the home directory
+    monkeypatch.setattr(Path, "home", lambda: tmp_path)
+    resources = os.path.join(Path(__file__).parents[3], "resources", "alfred")
+    bank = os.path.join(resources, "io", "question", "sample_mcq.xlsx")
+
+    output = str(tmp_path / "myleo.jsonl")
+    assert main([bank, "--target", "myleo", "--output", output]) == 0
+    with open(output, encoding="utf-8") as file:
+        records = [json.loads(line) for line in file]
+    assert records
+    assert all(record["url"].startswith("https://myleo.rp.edu.sg/") for record in records)
+
+    # MySA resolves the assessments from a saved filter, without logging in
+    output = str(tmp_path / "mysa.jsonl")
+    assessment_filter = os.path.join(resources, "net", "driver", "assessment_filter.json")
+    assert main([
+        bank, "--target", "mysa", "--output", output, "--assessment-filter", assessment_filter
+    ]) == 0
+    with open(output, encoding="utf-8") as file:
+        records = [json.loads(line) for line in file]
+    assert len(records) == 3
+    assert all(record["fields"]["assessmentId"] for record in records)
+
+# end test_dry_run()
@@ -0,0 +1,68 @@
+# Standard imports
+import json
+import logging
+import os
+from pathlib import Path
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.action.upload_myleo import ActionUpload_MCQ2MyLEO
+from alfred.action.upload_mysa import ActionUpload_MCQ2MySA
+from alfred.cli.replay import read_jobs, replay
+from alfred.io.question import MultipleChoiceQuestion, QuestionBank
+from support.stubs import StubDriver
+
+
+def test_dry_run_and_replay(tmp_path, caplog):
+    """Tests writing the request bodies offline and posting them later"""
+
+    data_filename = os.path.join(
+        Path(__file__).parents[3],
+        "resources",
+        "alfred",
+        "net",
+        "driver",
+        "assessment_filter.json",
+    )
+    with open(data_filename) as file:
+        assessment_filter = json.load(file)
+
+    bank = QuestionBank(questions=[
+        MultipleChoiceQuestion(
+            title=f"Q{index}", content="What is 1 + 1?", score=1, est_time_min=1,
+            answer="B", options={"A": "1", "B": "2"}, module="A3079C", assessment="CW1",
+        )
+        for index in range(5)
+    ])
+
+    # No driver is needed for a dry run
+    filename = str(tmp_path / "mysa.jsonl")
+    action = ActionUpload_MCQ2MySA()
+    with caplog.at_level(logging.INFO):
+        assert action.run(None, bank, assessment_filter=assessment_filter, dry_run=filename)
+    assert not any(result.success for result in action.results)
+    assert "5 request bodies written" in caplog.text
+    assert "Questions created" not in caplog.text
+
+    with open(filename, encoding="utf-8") as file:
+        records = [json.loads(line) for line in file]
+    assert [record["title"] for record in records] == [f"Q{index}" for index in range(5)]
+    assert records[0]["url"] == action.create_api
+    assert records[0]["fields"]["assessmentId"] == action.index.resolve(bank.questions[0])[1]
+    expected = [
+        action.serializer.serialize(action.serializer.values(question, action.index.resolve(question)))
+        for question in bank.questions
+    ]
+
+    driver = StubDriver(status_code=201)
+    results = replay(ActionUpload_MCQ2MySA(), driver, filename, max_workers=2)
+    assert all(result.success for result in results)
+    assert driver.bodies == expected
+
+    # The bodies are only posted to the target they were written for
+    with pytest.raises(ValueError):
+        list(read_jobs(filename, ActionUpload_MCQ2MyLEO().create_api))
+
+# end test_dry_run_and_replay()
@@ -0,0 +1,63 @@
+# Standard imports
+import os
+from pathlib import Path
+import shutil
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.io.cache import BankCache
+from alfred.io.question import create_from_file
+
+
+def test_bank_cache(tmp_path):
+    """Tests storing and evicting entries"""
+
+    source = os.path.join(tmp_path, "source.txt")
+    with open(source, "w") as file:
+        file.write("version 1")
+
+    cache = BankCache(directory=os.path.join(tmp_path, "cache"), max_bytes=1024)
+    key = cache.key(source, 1)
+    assert cache.get(key) is None
+    cache.put(key, {"questions": [1, 2, 3]})
+    assert cache.get(key) == {"questions": [1, 2, 3]}
+
+    # The key changes along with the content and the other parts
+    assert cache.key(source, 2) != key
+    with open(source, "w") as file:
+        file.write("version 2")
+    assert cache.key(source, 1) != key
+
+    # An entry stored under another key is never served
+    shutil.copy(cache._path(key), cache._path(cache.key(source, 1)))
+    assert cache.get(cache.key(source, 1)) is None
+
+    # Old entries are evicted once the cache is full
+    os.utime(cache._path(key), (0, 0))
+    cache.put("large", os.urandom(900))
+    assert cache.get(key) is None
+    assert cache.get("large") is not None
+
+# end test_bank_cache()
+
+
+def test_create_from_file_cache(tmp_path):
+    """Tests that the cached question bank is the same as the parsed one"""
+
+    sample_filename = os.path.join(
+        Path(__file__).parents[3],
+        "resources",
+        "alfred",
+        "io",
+        "question",
+        "sample_mcq_1.0.2.xlsx",
+    )
+
+    cache = BankCache(directory=str(tmp_path))
+    question_bank = create_from_file(sample_filename, cache=cache)
+    assert len(os.listdir(tmp_path)) == 1
+    assert create_from_file(sample_filename, cache=cache) == question_bank
+
+# end test_create_from_file_cache()
@@ -0,0 +1,61 @@
+# Standard imports
+from dataclasses import asdict
+import os
+from pathlib import Path
+import pickle
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.io.compact import ColumnarQuestionBank, CompactMultipleChoiceQuestion, compact
+from alfred.io.question import MultipleChoiceQuestion, create_from_file
+
+
+def test_compact():
+    """Tests that the compact questions keep the attributes of the questions"""
+
+    sample_filename = os.path.join(
+        Path(__file__).parents[3],
+        "resources",
+        "alfred",
+        "io",
+        "question",
+        "sample_mcq_1.0.2.xlsx",
+    )
+    question_bank = create_from_file(sample_filename)
+
+    compact_bank = compact(question_bank)
+    assert [asdict(question) for question in compact_bank.questions] == [
+        asdict(question) for question in question_bank.questions
+    ]
+    first, second = compact_bank.questions[:2]
+    assert not hasattr(first, "__dict__")
+    assert first.module is second.module
+    assert pickle.loads(pickle.dumps(first)) == first
+
+    columnar_bank = ColumnarQuestionBank(question_bank.questions)
+    assert len(columnar_bank.questions) == 3
+    assert list(columnar_bank.questions) == compact_bank.questions
+    assert columnar_bank.questions[-1] == compact_bank.questions[2]
+    assert len(columnar_bank.modules.categories) == 1
+
+    # Defaults are the same as the multiple choice question
+    assert CompactMultipleChoiceQuestion().options == {}
+    assert CompactMultipleChoiceQuestion().options is not CompactMultipleChoiceQuestion().options
+
+# end test_compact()
+
+
+def test_columnar_blanks():
+    """Tests that blank fields are read back as None rather than nan"""
+
+    question = MultipleChoiceQuestion(title="Q1", score=None, options={"A": "1"})
+    bank = ColumnarQuestionBank([question, MultipleChoiceQuestion(module=float("nan"))])
+    first, second = bank.questions
+    assert first.module is None and first.assessment is None and first.qtype is None
+    assert first.score is None
+    assert second.module is None
+    assert len(bank.modules.categories) == 1
+
+# end test_columnar_blanks()
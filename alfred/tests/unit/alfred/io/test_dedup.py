@@ -0,0 +1,58 @@
+# Standard imports
+import logging
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.io.dedup import drop_duplicates, find_duplicates, normalize_text
+from alfred.io.question import MultipleChoiceQuestion, QuestionBank
+
+logger = logging.getLogger(__name__)
+
+
+def create_question(title: str, content: str, module: str = "A3079C", **options) -> MultipleChoiceQuestion:
+    """Creates a question with the options A, B and C"""
+
+    return MultipleChoiceQuestion(
+        title=title,
+        content=content,
+        score=1,
+        answer="A",
+        options=options or {"A": "Calcium", "B": "Oxygen", "C": "Carbon"},
+        module=module,
+        assessment="CW1",
+    )
+
+
+def test_find_duplicates():
+    """Tests finding exact and near duplicates"""
+
+    assert normalize_text("  Calculate the\n molar  MASS ") == "calculate the molar mass"
+
+    questions = [
+        create_question("Q1", "Calculate the molar mass of calcium oxide (CaO)."),
+        create_question("Q2", "Calculate  the molar mass of CALCIUM oxide (CaO). "),
+        create_question("Q3", "Calculate the molar mass of calcium oxide (CaO)", module="A3289C"),
+        create_question(
+            "Q4",
+            "Calculate the molar mass of calcium oxide (CaO).",
+            A="Oxygen", B="Calcium", C="Carbon",
+        ),
+        create_question("Q5", "Calculate the molar mass of solid calcium oxide (CaO)."),
+        create_question("Q6", "Which element is a noble gas?"),
+    ]
+
+    # Q3 goes to another module, and Q4 has a different answer
+    report = find_duplicates(questions)
+    assert report.groups == [[0, 1]]
+    assert report.duplicates == [1]
+
+    report = find_duplicates(questions, near=True)
+    assert report.groups == [[0, 1, 4]]
+
+    bank = drop_duplicates(QuestionBank(questions=questions), near=True)
+    assert [question.title for question in bank.questions] == ["Q1", "Q3", "Q4", "Q6"]
+
+# end test_find_duplicates()
+
@@ -1,13 +1,28 @@
 # Standard imports
+import csv
+import json
 import logging
 import os
 from pathlib import Path
+import subprocess
+import sys
 
 # Third party imports
+import numpy as np
+import pandas as pd
 import pytest
 
 # Application imports
-from alfred.io.question import create_from_file
+from alfred.io.question import (
+    COLUMNS,
+    create_from_file,
+    create_from_files,
+    iter_questions,
+    iter_rows,
+    list_sheets,
+    parse_dataframe,
+    question_fingerprint,
+)
 
 
 def test_create_from_file():
@@ -76,3 +91,229 @@ def test_create_from_file():
     assert question_bank.questions[2].p_score in (1, 0)
 
 # end test_create_from_file()
+
+
+def test_parse_dataframe():
+    """Tests the columnar parsing of a dataframe"""
+
+    data = pd.DataFrame({
+        "Title": ["Q1", "A", "B", np.nan, "Q2", "A", "B", "Q3", "A", np.nan, "C"],
+        "Question": ["One", 1, 2, np.nan, "Two", 3, 4, "Three", 5, np.nan, 6],
+        "Score": [1, np.nan, np.nan, np.nan, 2, np.nan, np.nan, 3, np.nan, np.nan, np.nan],
+        "Ans": ["A", np.nan, np.nan, np.nan, "B", np.nan, np.nan, "A", np.nan, np.nan, np.nan],
+        "Est.time (min)": [1, np.nan, np.nan, np.nan, 2, np.nan, np.nan, 3, np.nan, np.nan, np.nan],
+        "A": [1, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan],
+        "C": [np.nan, np.nan, np.nan, np.nan, 1, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan],
+        "P": [np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, 1, np.nan, np.nan, np.nan],
+        "Module Code": ["A3079C", np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, "A3289C",
+                        np.nan, np.nan, np.nan],
+        "Assessment Type": ["CW1", "CW2", np.nan, np.nan, np.nan, np.nan, np.nan, np.nan,
+                            np.nan, np.nan, np.nan],
+    })
+
+    question_bank = parse_dataframe(data)
+    assert len(question_bank.questions) == 3
+    first, second, third = question_bank.questions
+    assert first.options == {"A": "1", "B": "2"}
+    assert (first.a_score, first.c_score, first.p_score) == (1, 0, 0)
+    assert (second.a_score, second.c_score, second.p_score) == (0, 1, 0)
+    assert (third.a_score, third.c_score, third.p_score) == (0, 0, 1)
+
+    # Module and assessment only carry over from question rows
+    assert (first.module, first.assessment) == ("A3079C", "CW1")
+    assert (second.module, second.assessment) == ("A3079C", "CW1")
+    assert (third.module, third.assessment) == ("A3289C", "CW1")
+    assert third.qtype is None
+
+    # A blank row ends the choices of a question
+    assert third.options == {"A": "5"}
+
+# end test_parse_dataframe()
+
+
+def test_iter_questions():
+    """Tests that streaming the questions gives the same result as loading them"""
+
+    for version in ("1.0.1", "1.0.2", "1.0.3"):
+        sample_filename = os.path.join(
+            Path(__file__).parents[3],
+            "resources",
+            "alfred",
+            "io",
+            "question",
+            f"sample_mcq_{version}.xlsx",
+        )
+        questions = iter_questions(sample_filename)
+        assert not isinstance(questions, list)
+        assert list(questions) == create_from_file(sample_filename).questions
+
+    # Questions are yielded once the row after their last choice is read
+    header = ("Title", "Question", "Score", "Ans", "Est.time (min)", "A", "C", "P")
+    rows = iter([
+        ("Q1", "One", 1, "A", 1, None, 1, None),
+        ("A", "1"),
+        (None, None),
+        ("Q2", "Two", 1, "A", 1, None, None, None),
+    ])
+    questions = iter_rows(header, rows)
+    first = next(questions)
+    assert first.options == {"A": "1"}
+    assert first.c_score == 1
+    assert next(rows, None) is not None
+
+# end test_iter_questions()
+
+
+def test_create_from_files(tmp_path):
+    """Tests loading several sheets and workbooks into one question bank"""
+
+    columns = ["Title", "Question", "Score", "Ans", "Est.time (min)", "A", "C", "P",
+               "Module Code", "Assessment Type"]
+    first_sheet = pd.DataFrame(
+        [["Q1", "One", 1, "A", 1, 1, np.nan, np.nan, "A3079C", "CW1"],
+         ["A", "1", np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan]],
+        columns=columns,
+    )
+    second_sheet = pd.DataFrame(
+        [["Q2", "Two", 1, "A", 1, 1, np.nan, np.nan, np.nan, np.nan],
+         ["A", "2", np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan]],
+        columns=columns,
+    )
+    workbook = os.path.join(tmp_path, "modules.xlsx")
+    with pd.ExcelWriter(workbook) as writer:
+        first_sheet.to_excel(writer, sheet_name="A3079C", index=False)
+        second_sheet.to_excel(writer, sheet_name="A3289C", index=False)
+
+    sample_folder = os.path.join(
+        Path(__file__).parents[3],
+        "resources",
+        "alfred",
+        "io",
+        "question",
+    )
+
+    question_bank = create_from_files([workbook, sample_folder], all_sheets=True, max_workers=2)
+    assert len(question_bank.questions) == 14
+    assert [question.title for question in question_bank.questions[:2]] == ["Q1", "Q2"]
+    # The module does not carry over from the previous sheet
+    assert question_bank.questions[1].module is None
+    assert question_bank.questions[2:5] == create_from_file(
+        os.path.join(sample_folder, "sample_mcq.xlsx")
+    ).questions
+
+    # Only the first sheet is read by default
+    question_bank = create_from_files([workbook])
+    assert [question.title for question in question_bank.questions] == ["Q1"]
+
+# end test_create_from_files()
+
+
+def test_list_sheets_xls(monkeypatch):
+    """Tests that the sheets of an old .xls workbook are listed with pandas"""
+
+    class ExcelFile:
+        sheet_names = ["A3079C", "A3289C"]
+
+        def __init__(self, filename):
+            assert filename == "modules.xls"
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc_info):
+            pass
+
+    # Reading a real .xls file needs xlrd, which is not a dependency
+    monkeypatch.setattr(pd, "ExcelFile", ExcelFile)
+    assert list_sheets("modules.xls") == ["A3079C", "A3289C"]
+
+# end test_list_sheets_xls()
+
+
+def test_create_from_text_files(tmp_path):
+    """Tests reading question banks from csv, json lines and parquet files"""
+
+    sample_filename = os.path.join(
+        Path(__file__).parents[3],
+        "resources",
+        "alfred",
+        "io",
+        "question",
+        "sample_mcq_1.0.2.xlsx",
+    )
+    expected = create_from_file(sample_filename)
+
+    records = []
+    for question in expected.questions:
+        records.append({
+            "Title": question.title,
+            "Question": question.content,
+            "Score": question.score,
+            "Ans": question.answer,
+            "Est.time (min)": question.est_time_min,
+            "C marks": question.c_score or None,
+            "P marks": question.p_score or None,
+            "A marks": question.a_score or None,
+            "Module Code": question.module,
+            "Assessment Type": question.assessment,
+            "Qualification Type": question.qtype,
+        })
+        for label, option in question.options.items():
+            records.append({"Title": label, "Question": option})
+        records.append({})
+
+    csv_filename = os.path.join(tmp_path, "bank.csv")
+    with open(csv_filename, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=COLUMNS)
+        writer.writeheader()
+        writer.writerows(records)
+
+    jsonl_filename = os.path.join(tmp_path, "bank.jsonl")
+    with open(jsonl_filename, "w") as file:
+        for record in records:
+            file.write(json.dumps(record) + "\n")
+
+    parquet_filename = os.path.join(tmp_path, "bank.parquet")
+    pd.DataFrame(records, columns=COLUMNS).to_parquet(parquet_filename)
+
+    for filename in (csv_filename, jsonl_filename, parquet_filename):
+        assert create_from_file(filename) == expected
+        assert list(iter_questions(filename)) == expected.questions
+
+    # The text formats are read without importing pandas
+    script = (
+        "import sys\n"
+        "from alfred.io.question import create_from_file\n"
+        f"assert len(create_from_file({csv_filename!r}).questions) == 3\n"
+        f"assert len(create_from_file({jsonl_filename!r}).questions) == 3\n"
+        "assert 'pandas' not in sys.modules\n"
+    )
+    subprocess.run([sys.executable, "-c", script], check=True, cwd=Path(__file__).parents[4] / "src")
+
+# end test_create_from_text_files()
+
+
+def test_question_fingerprint():
+    """Tests that the fingerprint only changes with the content"""
+
+    sample_filename = os.path.join(
+        Path(__file__).parents[3],
+        "resources",
+        "alfred",
+        "io",
+        "question",
+        "sample_mcq_1.0.2.xlsx",
+    )
+    loaded = create_from_file(sample_filename).questions
+    streamed = list(iter_questions(sample_filename))
+
+    # The readers return ints or floats but the fingerprints are the same
+    assert streamed[0].score == 1 and loaded[0].score == 1.0
+    fingerprints = [question_fingerprint(question) for question in loaded]
+    assert fingerprints == [question_fingerprint(question) for question in streamed]
+    assert len(set(fingerprints)) == 3
+
+    streamed[0].options["A"] = "17"
+    assert question_fingerprint(streamed[0]) != fingerprints[0]
+
+# end test_question_fingerprint()
@@ -0,0 +1,36 @@
+# Standard imports
+import os
+from pathlib import Path
+
+# Third party imports
+
+# Application imports
+from alfred.io.storage import alfred_home, atomic_write
+
+
+def test_alfred_home(monkeypatch, tmp_path):
+    """Tests the locations under the home directory"""
+
+    monkeypatch.setattr(Path, "home", lambda: tmp_path)
+    assert alfred_home("cache") == os.path.join(tmp_path, ".alfred", "cache")
+
+# end test_alfred_home()
+
+
+def test_atomic_write(tmp_path):
+    """Tests writing text and bytes, and that no temporary file is left"""
+
+    path = os.path.join(tmp_path, "new", "entry.json")
+    atomic_write(path, "café")
+    with open(path, encoding="utf-8") as file:
+        assert file.read() == "café"
+
+    atomic_write(path, b"\x00\x01")
+    with open(path, "rb") as file:
+        assert file.read() == b"\x00\x01"
+    assert os.listdir(os.path.dirname(path)) == ["entry.json"]
+    if os.name == "posix":
+        # Only the user can read the sessions and the manifests
+        assert os.stat(path).st_mode & 0o777 == 0o600
+
+# end test_atomic_write()
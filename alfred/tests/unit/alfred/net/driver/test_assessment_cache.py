@@ -0,0 +1,124 @@
+# Standard imports
+import json
+from pathlib import Path
+import os
+
+# Third party imports
+
+# Application imports
+from alfred.net.driver.assessment_cache import AssessmentCache
+from alfred.net.driver.mysa import MySADriver, parse_assessment_filter
+from support.stubs import StubResponse
+
+
+def load_assessment_filter():
+    """Loads the response of the assessment filter in the resources"""
+
+    data_filename = os.path.join(
+        Path(__file__).parents[4],
+        "resources",
+        "alfred",
+        "net",
+        "driver",
+        "assessment_filter.json",
+    )
+    with open(data_filename) as file:
+        return json.load(file)
+
+
+class FakeClock:
+    """Clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class StubSession:
+    """Session that keeps the filters requested, and filters by module"""
+
+    def __init__(self):
+        self.requests = []
+        self.data = load_assessment_filter()
+
+    def post(self, url, json=None, **kwargs):
+        self.requests.append(json)
+        module_codes = json["moduleCodes"]
+        data = [
+            dict(datum, assessments=[
+                entry for entry in datum["assessments"]
+                if not module_codes or entry["moduleCode"] in module_codes
+            ])
+            for datum in self.data["data"]
+        ]
+        return StubResponse(200, {"data": data})
+
+
+def test_assessment_cache(tmp_path):
+    """Tests storing, expiring and invalidating the assessments of modules"""
+
+    clock = FakeClock()
+    cache = AssessmentCache(directory=str(tmp_path), ttl=60, clock=clock)
+    assessment_data = parse_assessment_filter(load_assessment_filter())
+
+    data, missing = cache.get("user", ["A3079C"])
+    assert missing == ["A3079C"]
+    assert data.module_assessment_map == {}
+
+    # Modules without assessments are cached as well
+    cache.put("user", ["A3079C", "Z0000Z"], assessment_data)
+    data, missing = cache.get("USER", ["A3079C", "Z0000Z"])
+    assert missing == []
+    assert data.module_assessment_map == {
+        key: entries
+        for key, entries in assessment_data.module_assessment_map.items()
+        if key[0] == "A3079C"
+    }
+    assert "user" not in "".join(os.listdir(tmp_path))
+
+    # Other users have their own cache
+    assert cache.get("other", ["A3079C"])[1] == ["A3079C"]
+
+    clock.now += 61
+    assert cache.get("user", ["A3079C"])[1] == ["A3079C"]
+
+    clock.now -= 61
+    cache.invalidate("user", ["A3079C"])
+    assert cache.get("user", ["A3079C", "Z0000Z"])[1] == ["A3079C"]
+    cache.invalidate("user")
+    assert cache.get("user", ["Z0000Z"])[1] == ["Z0000Z"]
+
+# end test_assessment_cache()
+
+
+def test_get_assessment_data(tmp_path):
+    """Tests that only the modules not cached are requested"""
+
+    driver = MySADriver.__new__(MySADriver)
+    driver.assessment_url = "https://mysa.rp.edu.sg/authoring/api/assessments/filter"
+    driver.session = StubSession()
+    driver.username = "user"
+    cache = AssessmentCache(directory=str(tmp_path))
+    expected = parse_assessment_filter(load_assessment_filter())
+
+    data = driver.get_assessment_data(module_codes={"A3079C"}, cache=cache)
+    assert data.module_assessment_map == expected.module_assessment_map
+    assert len(driver.session.requests) == 1
+    assert driver.session.requests[0]["moduleCodes"] == ["A3079C"]
+
+    # A repeated upload does not request the filter again
+    data = driver.get_assessment_data(module_codes={"A3079C"}, cache=cache)
+    assert data.module_assessment_map == expected.module_assessment_map
+    assert len(driver.session.requests) == 1
+
+    # Only the new module is requested
+    driver.get_assessment_data(module_codes={"A3079C", "B1234C"}, cache=cache)
+    assert driver.session.requests[-1]["moduleCodes"] == ["B1234C"]
+
+    # Without a cache or modules, everything is requested as before
+    driver.get_assessment_data()
+    assert driver.session.requests[-1]["moduleCodes"] == []
+
+# end test_get_assessment_data()
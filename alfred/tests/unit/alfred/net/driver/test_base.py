@@ -1,11 +1,18 @@
 # Standard imports
 import logging
+import os
+import socket
 
 # Third party imports
 import pytest
 
 # Application imports
-from alfred.net.driver.base import get_web_driver
+from alfred.net.driver.base import (
+    AUTOMATION_FLAGS,
+    chrome_options,
+    get_web_driver,
+    profile_in_use,
+)
 
 
 def test_get_web_driver():
@@ -16,3 +23,60 @@ def test_get_web_driver():
 
 
 # end test_get_web_driver()
+
+
+def test_chrome_options(tmp_path, monkeypatch):
+    """Tests the headless, profile and automation flags of chrome"""
+
+    monkeypatch.delenv("ALFRED_HEADLESS", raising=False)
+    monkeypatch.delenv("ALFRED_CHROME_PROFILE", raising=False)
+    monkeypatch.delenv("ALFRED_CHROME_LEAN", raising=False)
+
+    options = chrome_options()
+    assert options.arguments == []
+
+    options = chrome_options(headless=True, user_data_dir=str(tmp_path), lean=True)
+    assert "--headless=new" in options.arguments
+    assert f"--user-data-dir={tmp_path}" in options.arguments
+    assert set(AUTOMATION_FLAGS) <= set(options.arguments)
+
+    # The environment sets the defaults, e.g. on the batch hosts
+    monkeypatch.setenv("ALFRED_HEADLESS", "1")
+    monkeypatch.setenv("ALFRED_CHROME_PROFILE", str(tmp_path))
+    options = chrome_options()
+    assert "--headless=new" in options.arguments
+    assert f"--user-data-dir={tmp_path}" in options.arguments
+    assert "--headless=new" not in chrome_options(headless=False).arguments
+    assert not set(AUTOMATION_FLAGS) & set(options.arguments)
+    monkeypatch.setenv("ALFRED_CHROME_LEAN", "1")
+    assert set(AUTOMATION_FLAGS) <= set(chrome_options().arguments)
+
+
+# end test_chrome_options()
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Chrome locks the profile with a file on Windows")
+def test_profile_in_use(tmp_path, caplog):
+    """Tests that a profile open in another Chrome is detected"""
+
+    lock = tmp_path / "SingletonLock"
+    assert not profile_in_use(str(tmp_path))
+
+    os.symlink(f"{socket.gethostname()}-{os.getpid()}", lock)
+    assert profile_in_use(str(tmp_path))
+    # The driver is not created, and the reason is logged
+    assert get_web_driver(user_data_dir=str(tmp_path)) is None
+    assert "is in use" in caplog.text
+
+    # Left behind by a Chrome that crashed
+    lock.unlink()
+    os.symlink(f"{socket.gethostname()}-999999999", lock)
+    assert not profile_in_use(str(tmp_path))
+
+    # Chrome on another host, with the profile on a shared drive
+    lock.unlink()
+    os.symlink("other-host-1", lock)
+    assert profile_in_use(str(tmp_path))
+
+
+# end test_profile_in_use()
@@ -0,0 +1,11 @@
+# Application imports
+from alfred.net.driver.myleo import myleo_username
+
+
+def test_myleo_username():
+    """Tests that the email domain is added once"""
+
+    assert myleo_username("staff") == "staff@rp.edu.sg"
+    assert myleo_username(" staff@rp.edu.sg ") == "staff@rp.edu.sg"
+
+# end test_myleo_username()
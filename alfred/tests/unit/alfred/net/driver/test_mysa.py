@@ -3,11 +3,19 @@ import logging
 import json
 from pathlib import Path
 import os
+import threading
 
 # Third party imports
+import pytest
 
 # Application imports
-from alfred.net.driver.mysa import parse_assessment_filter, parse_qtype_fullname
+from alfred.net.driver.mysa import (
+    AssessmentFilterParser,
+    MySADriver,
+    parse_assessment_filter,
+    parse_qtype_fullname,
+)
+from support.stubs import StubResponse
 
 
 def test_parse_assessment_filter():
@@ -76,3 +84,98 @@ def test_parse_qtype_fullname():
     fullname = "A1159C - Main<br/>CET (AY2023 Term 2)"
     qtype = parse_qtype_fullname(fullname=fullname)
     assert qtype == 'CET (AY2023 Term 2)'
+
+
+class PagedSession:
+    """Session that returns the rows of the assessment filter one page at a time"""
+
+    def __init__(
+        self, data, with_count: bool = True, failing_offset: int = None, cut=None
+    ):
+        self.data = data
+        self.with_count = with_count
+        self.failing_offset = failing_offset
+        self.cut = cut
+        self.offsets = []
+        self.lock = threading.Lock()
+
+    def post(self, url, json=None, **kwargs):
+        with self.lock:
+            self.offsets.append(json["offset"])
+        if json["offset"] == self.failing_offset and self.cut is None:
+            return StubResponse(500)
+        start = (json["offset"] - 1) * json["limit"]
+        page = dict(self.data, data=self.data["data"][start:start + json["limit"]])
+        if not self.with_count:
+            del page["totalCount"]
+        if json["offset"] == self.failing_offset:
+            # The page is cut short
+            error = self.cut if isinstance(self.cut, Exception) else None
+            response = StubResponse(200, page, error=error)
+            response.content = response.content[:len(response.content) // 2]
+            return response
+        return StubResponse(200, page)
+
+
+@pytest.mark.parametrize("with_count", [True, False])
+def test_get_assessment_data_in_pages(with_count):
+    """Tests retrieving the assessment filter in pages"""
+
+    data_filename = os.path.join(
+        Path(__file__).parents[4],
+        "resources",
+        "alfred",
+        "net",
+        "driver",
+        "assessment_filter.json",
+    )
+    with open(data_filename) as file:
+        data = json.load(file)
+
+    driver = MySADriver.__new__(MySADriver)
+    driver.assessment_url = "https://mysa.rp.edu.sg/authoring/api/assessments/filter"
+    driver.username = None
+    driver.session = PagedSession(data, with_count=with_count)
+
+    result = driver.get_assessment_data(page_size=4)
+    assert result.module_assessment_map == parse_assessment_filter(data).module_assessment_map
+    if with_count:
+        # The count is of assessments rather than rows, so the last pages are empty
+        assert sorted(driver.session.offsets) == list(range(1, 10))
+    else:
+        assert driver.session.offsets == [1, 2, 3, 4, 5]
+
+    # Nothing is returned if a page is missing
+    driver.session = PagedSession(data, with_count=with_count, failing_offset=3)
+    assert driver.get_assessment_data(page_size=4) is None
+
+    # Nor if a page is cut short, whether the connection breaks, as with the
+    # ChunkedEncodingError of requests, or the page merely ends
+    for cut in (IOError("Connection broken"), True):
+        driver.session = PagedSession(data, with_count=with_count, failing_offset=2, cut=cut)
+        assert driver.get_assessment_data(page_size=4) is None
+
+# end test_get_assessment_data_in_pages()
+
+
+@pytest.mark.parametrize("filename", ["assessment_filter.json", "assessment_filter_makeup.json"])
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096, None])
+def test_assessment_filter_parser(filename, chunk_size):
+    """Tests that parsing the response in chunks gives the same map"""
+
+    data_filename = os.path.join(
+        Path(__file__).parents[4], "resources", "alfred", "net", "driver", filename
+    )
+    with open(data_filename, "rb") as file:
+        content = file.read()
+    chunk_size = chunk_size or len(content)
+    chunks = (content[start:start + chunk_size] for start in range(0, len(content), chunk_size))
+
+    parser = AssessmentFilterParser()
+    result = parser.parse(chunks)
+    data = json.loads(content)
+    assert result.module_assessment_map == parse_assessment_filter(data).module_assessment_map
+    assert parser.rows == len(data["data"])
+    assert parser.fields.get("totalCount") == data.get("totalCount")
+
+# end test_assessment_filter_parser()
@@ -0,0 +1,118 @@
+# Standard imports
+import base64
+import json
+import os
+
+# Third party imports
+import pytest
+import requests
+
+# Application imports
+from alfred.net.driver.myleo import MyLeoDriver
+from alfred.net.driver.mysa import MySADriver
+from alfred.net.driver.session_store import DEFAULT_MAX_AGE, SessionStore, token_expiry
+from support.fake_server import FakeServer, redirect
+
+fernet = pytest.importorskip("cryptography.fernet")
+
+
+class FakeClock:
+    """Clock that only moves when told to"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def create_jwt(claims) -> str:
+    """Creates an unsigned JWT with the given claims"""
+
+    def encode(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode("utf-8")).decode("ascii").rstrip("=")
+
+    return f"{encode({'alg': 'none'})}.{encode(claims)}.signature"
+
+
+def test_session_store(tmp_path):
+    """Tests saving, expiring and encrypting the sessions"""
+
+    clock = FakeClock()
+    store = SessionStore(directory=str(tmp_path), clock=clock)
+    session = requests.Session()
+    session.headers.update({"user-agent": "Chrome", "Authorization": "Bearer secret-token"})
+    session.cookies.set("session", "secret-cookie", domain="mysa.rp.edu.sg")
+
+    assert store.load("mysa", "user") is None
+    assert store.save("mysa", "user", session)
+    # Nothing is readable on disk, and the key only by the user
+    for filename in os.listdir(tmp_path):
+        with open(os.path.join(tmp_path, filename), "rb") as file:
+            content = file.read()
+        assert b"secret" not in content and b"user" not in filename.encode()
+    assert os.stat(os.path.join(tmp_path, ".key")).st_mode & 0o077 == 0
+
+    restored = store.load("mysa", "USER")
+    assert restored.headers["Authorization"] == "Bearer secret-token"
+    assert restored.headers["user-agent"] == "Chrome"
+    assert restored.cookies.get("session", domain="mysa.rp.edu.sg") == "secret-cookie"
+    # Each site has its own session
+    assert store.load("myleo", "user") is None
+
+    # Without an expiry, the session is kept for DEFAULT_MAX_AGE
+    clock.now += DEFAULT_MAX_AGE + 1
+    assert store.load("mysa", "user") is None
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".session")]
+
+    # The first cookie or token to expire expires the session
+    session.cookies.set("short", "1", domain="mysa.rp.edu.sg", expires=int(clock.now) + 10)
+    store.save("mysa", "user", session)
+    clock.now += 11
+    assert store.load("mysa", "user") is None
+
+    # Another key cannot read the session
+    session.cookies.clear()
+    store.save("mysa", "user", session)
+    other = SessionStore(directory=str(tmp_path), key=fernet.Fernet.generate_key(), clock=clock)
+    assert other.load("mysa", "user") is None
+
+# end test_session_store()
+
+
+def test_token_expiry():
+    """Tests reading the expiry of a JWT"""
+
+    assert token_expiry(f"Bearer {create_jwt({'exp': 1234})}") == 1234
+    assert token_expiry(f"Bearer {create_jwt({'sub': 'user'})}") is None
+    assert token_expiry("Bearer opaque") is None
+    assert token_expiry(None) is None
+
+# end test_token_expiry()
+
+
+@pytest.mark.parametrize("driver_class", [MySADriver, MyLeoDriver])
+def test_restore_session(tmp_path, driver_class):
+    """Tests logging in with a saved session without starting the browser"""
+
+    with FakeServer() as server:
+        store = SessionStore(directory=str(tmp_path))
+        login = server.login("user")
+        session = requests.Session()
+        session.cookies.set("session", login["session"])
+        session.headers.update({"Authorization": login["Authorization"]})
+        store.save(driver_class.site, "user", session)
+
+        driver = redirect(driver_class(), server.url)
+        assert driver.restore_session("user", store)
+        assert driver._driver is None
+        assert driver.username == "user"
+
+        # A session that the server has ended is forgotten
+        server.sessions.clear()
+        driver = redirect(driver_class(), server.url)
+        assert not driver.restore_session("user", store)
+        assert store.load(driver_class.site, "user") is None
+        assert driver._driver is None
+
+# end test_restore_session()
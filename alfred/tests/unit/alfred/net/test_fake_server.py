@@ -0,0 +1,158 @@
+# Standard imports
+import re
+
+# Third party imports
+import pytest
+import requests
+
+# Application imports
+from alfred.action.retry import RetryPolicy
+from alfred.action.upload_myleo import ActionUpload_MCQ2MyLEO
+from alfred.action.upload_mysa import ActionUpload_MCQ2MySA
+from alfred.io.question import MultipleChoiceQuestion
+from alfred.net.driver.assessment_cache import AssessmentCache
+from alfred.net.driver.mysa import MySADriver
+from support.fake_server import FakeServer, FaultProfile, make_assessment_filter, redirect
+
+
+class SessionDriver:
+    """Driver with a session logged in to the fake server"""
+
+    def __init__(self, server: FakeServer):
+        self.session = requests.Session()
+        login = server.login("user")
+        self.session.cookies.set("session", login["session"])
+        self.session.headers.update({"Authorization": login["Authorization"]})
+
+    def navigate(self, url):
+        pass
+
+
+def create_questions(count: int):
+    """Creates questions of the first module of the fake assessment filter"""
+
+    return [
+        MultipleChoiceQuestion(
+            title=f"Q{index}", content="What is 1 + 1?", score=1, est_time_min=1,
+            answer="B", options={"A": "1", "B": "2"}, module="M0000C", assessment="CW1",
+        )
+        for index in range(count)
+    ]
+
+
+def test_login_flow():
+    """Tests logging in with the form, then calling the APIs with the token"""
+
+    with FakeServer() as server:
+        session = requests.Session()
+        page = session.get(f"{server.url}/account/account/login").text
+        assert 'id="userId"' in page and 'id="submitForm"' in page
+
+        # A wrong password goes back to the login page
+        session.post(f"{server.url}/account/account/login", data={"username": "user", "password": "x"})
+        assert 'id="userinfo"' not in session.get(server.url).text
+        response = session.post(
+            f"{server.url}/authoring/api/assessments/filter", json={"offset": 1, "limit": 10}
+        )
+        assert response.status_code == 401
+
+        session.post(
+            f"{server.url}/account/account/login", data={"username": "user", "password": "password"}
+        )
+        page = session.get(server.url).text
+        assert 'id="userinfo"' in page and 'id="favoriteLinksContainerId"' in page
+        token = re.search(r"Bearer \w+", page).group(0)
+
+        # The cookie alone is not enough for MySA
+        response = session.post(
+            f"{server.url}/authoring/api/assessments/filter", json={"offset": 1, "limit": 10}
+        )
+        assert response.status_code == 401
+        session.headers.update({"Authorization": token})
+        response = session.post(
+            f"{server.url}/authoring/api/assessments/filter",
+            json={"moduleCodes": ["M0001C"], "offset": 1, "limit": 10},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert data["totalCount"] == 1
+        assert {entry["moduleCode"] for entry in data["data"][0]["assessments"]} == {"M0001C"}
+
+        # The MyLEO home page only needs the cookie
+        page = requests.get(
+            f"{server.url}/CoreBase/Home/Index", cookies=session.cookies
+        ).text
+        assert 'id="nav-user-dropdown"' in page
+
+# end test_login_flow()
+
+
+def test_fault_injection():
+    """Tests the errors and throttling injected"""
+
+    profiles = {
+        "questions": FaultProfile(error_rate=1.0, error_status=500),
+        "filter": FaultProfile(max_rate=1, retry_after=3),
+    }
+    with FakeServer(profiles=profiles) as server:
+        driver = SessionDriver(server)
+        response = driver.session.post(f"{server.url}/authoring/api/questions", json={})
+        assert response.status_code == 500
+        assert server.questions == []
+
+        statuses = [
+            driver.session.post(f"{server.url}/authoring/api/assessments/filter", json={}).status_code
+            for _ in range(5)
+        ]
+        assert statuses[0] == 200
+        assert 429 in statuses
+        assert server.counters["throttled"] == statuses.count(429)
+
+# end test_fault_injection()
+
+
+@pytest.mark.parametrize("max_workers", [1, 8])
+def test_upload_to_fake_server(tmp_path, max_workers):
+    """Tests that lost responses and errors do not create duplicates"""
+
+    profile = FaultProfile(latency=0.001, latency_sigma=0.5, error_rate=0.1, lost_rate=0.2)
+    # A failed lookup leaves the question in doubt, so the lookups always answer
+    profiles = {"lookup": FaultProfile(), "filter": FaultProfile()}
+    with FakeServer(
+        profile=profile,
+        profiles=profiles,
+        assessment_filter=make_assessment_filter(modules=3),
+        seed=1,
+    ) as server:
+        driver = MySADriver.__new__(MySADriver)
+        driver.assessment_url = "https://mysa.rp.edu.sg/authoring/api/assessments/filter"
+        driver.username = "user"
+        driver.session = SessionDriver(server).session
+        driver.navigate = lambda url: None
+        redirect(driver, server.url)
+
+        action = redirect(ActionUpload_MCQ2MySA(), server.url)
+        action.assessment_cache = AssessmentCache(directory=str(tmp_path))
+        action.retry = RetryPolicy(max_attempts=10, base_delay=0)
+        # The fake server filters the lookups, which the real API is not
+        # known to do
+        action.lookup_filtered = True
+        questions = create_questions(40)
+        assert action.run(driver, questions, max_workers=max_workers)
+
+        assert all(result.success for result in action.results)
+        created = [question for question in server.questions if question["site"] == "mysa"]
+        assert sorted(question["title"] for question in created) == sorted(
+            question.title for question in questions
+        )
+        assert server.counters["lookup"] > 0
+
+        # The MyLEO API only needs the cookie
+        action = redirect(ActionUpload_MCQ2MyLEO(), server.url)
+        action.retry = RetryPolicy(max_attempts=10, base_delay=0)
+        server.profiles["createquestion"] = FaultProfile()
+        action.run(driver, questions[:5])
+        assert all(result.success for result in action.results)
+        assert sum(question["site"] == "myleo" for question in server.questions) == 5
+
+# end test_upload_to_fake_server()
@@ -0,0 +1,66 @@
+# Standard imports
+import json
+
+# Third party imports
+import pytest
+
+# Application imports
+from alfred.net.json_stream import JSONReader, iter_items, iter_members
+
+
+def test_json_reader():
+    """Tests reading a document split anywhere, even within a character"""
+
+    document = {
+        "name": "café ✓",
+        "count": 12345,
+        "empty": [],
+        "items": [{"a": 1.5, "b": [True, None]}, {}, "x"],
+        "last": -7,
+    }
+    content = json.dumps(document, ensure_ascii=False, indent=1).encode("utf-8")
+    for chunk_size in (1, 2, 3, 5, len(content)):
+        chunks = [content[start:start + chunk_size] for start in range(0, len(content), chunk_size)]
+        reader = JSONReader(chunks)
+        result = {}
+        for key in iter_members(reader):
+            if key == "items":
+                result[key] = []
+                for position in iter_items(reader):
+                    if position == 1:
+                        reader.skip()
+                    else:
+                        result[key].append(reader.value())
+            else:
+                result[key] = reader.value()
+        assert result == dict(document, items=[document["items"][0], "x"])
+
+# end test_json_reader()
+
+
+def test_json_reader_numbers():
+    """Tests reading numbers split between chunks"""
+
+    for chunks, expected in (
+        ([b'{"a": 1.', b'5}'], 1.5),
+        ([b'{"a": 1e', b'5}'], 1e5),
+        ([b'{"a": -1.5E', b'-', b'2 }'], -1.5e-2),
+        ([b'{"a": 12', b'34}'], 1234),
+        ([b'{"a": 7}'], 7),
+    ):
+        reader = JSONReader(chunks)
+        assert [(key, reader.value()) for key in iter_members(reader)] == [("a", expected)]
+
+# end test_json_reader_numbers()
+
+
+def test_json_reader_errors():
+    """Tests that malformed or truncated documents are rejected"""
+
+    for content in (b'{"a": 1', b'{"a": [1, 2}', b'{"a" 1}', b'{1: 2}', b'{"a": "b'):
+        reader = JSONReader([content])
+        with pytest.raises(ValueError):
+            for _ in iter_members(reader):
+                reader.skip()
+
+# end test_json_reader_errors()
@@ -0,0 +1,82 @@
+# Standard imports
+import logging
+import os
+from pathlib import Path
+import subprocess
+import sys
+import time
+
+# Third party imports
+import pytest
+
+logger = logging.getLogger(__name__)
+
+SOURCE_DIR = Path(__file__).parents[4] / "src"
+
+# Budget for importing alfred.ui.gui and for showing the window, in milliseconds
+IMPORT_BUDGET_MS = float(os.getenv("ALFRED_IMPORT_BUDGET_MS", "500"))
+WINDOW_BUDGET_MS = float(os.getenv("ALFRED_WINDOW_BUDGET_MS", "2000"))
+
+# Modules that must only be imported on first use
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "selenium", "webdriver_manager", "requests")
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    """Runs python in a new process so that nothing is imported yet"""
+    return subprocess.run(
+        [sys.executable, *args], cwd=SOURCE_DIR, capture_output=True, text=True, check=True
+    )
+
+
+def test_gui_import_time():
+    """Tests that the gui is quick to import"""
+
+    result = run_python("-X", "importtime", "-c", "import alfred.ui.gui")
+
+    # Each line is 'import time: self [us] | cumulative | imported package'
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == "alfred.ui.gui":
+            cumulative_us = int(fields[1])
+    assert cumulative_us is not None
+    logger.info("alfred.ui.gui imports in %.1f ms", cumulative_us / 1000)
+    assert cumulative_us / 1000 < IMPORT_BUDGET_MS
+
+# end test_gui_import_time()
+
+
+def test_gui_lazy_imports():
+    """Tests that the heavy dependencies are not imported with the gui"""
+
+    script = (
+        "import sys\n"
+        "import alfred.ui.gui\n"
+        f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))\n"
+    )
+    result = run_python("-c", script)
+    assert result.stdout.strip() == ""
+
+# end test_gui_lazy_imports()
+
+
+@pytest.mark.skipif(
+    os.name != "nt" and os.getenv("DISPLAY") is None,
+    reason="No display to show the window on",
+)
+def test_gui_time_to_window():
+    """Tests the time from starting python to the window being shown"""
+
+    script = (
+        "from alfred.ui.gui import App\n"
+        "app = App()\n"
+        "app.wait_visibility()\n"
+        "app.destroy()\n"
+    )
+    start = time.perf_counter()
+    run_python("-c", script)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    logger.info("Window shown in %.1f ms", elapsed_ms)
+    assert elapsed_ms < WINDOW_BUDGET_MS
+
+# end test_gui_time_to_window()